@@ -109,7 +109,8 @@ REST_FRAMEWORK = {  # CFG from rest_framework_json_api DOCs
     'PAGE_SIZE': 10,
     'DEFAULT_AUTHENTICATION_CLASSES': (
         # 'rest_framework.authentication.TokenAuthentication',  # if DJOSER TOKEN is used
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # this one works w/o downgrade pyjwt
+        # simpleJWT JWTAuthentication, the user can be built from the token claims (JWT_CLAIMS_USER)
+        'app_support.authentication.ClaimsJWTAuthentication',  # this one works w/o downgrade pyjwt
 
         # if auth via DRF JWT
         # 'rest_framework_jwt.authentication.JSONWebTokenAuthentication', # need to downgrade pyjwt to 1.7.1
@@ -118,6 +119,9 @@ REST_FRAMEWORK = {  # CFG from rest_framework_json_api DOCs
         'rest_framework.authentication.BasicAuthentication',  # optional
 
     ),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'app_support.throttling.TokenBucketThrottle',  # budgets in APP_SUPPORT_DEFAULTS['THROTTLE_RATES']
+    ),
     'EXCEPTION_HANDLER': (
         # 'rest_framework_json_api.exceptions.exception_handler', if no custom ex handler
         'app_support.exceptions.custom_exception_handler'  # custom ex handler
@@ -135,6 +139,7 @@ REST_FRAMEWORK = {  # CFG from rest_framework_json_api DOCs
 
         'rest_framework_json_api.renderers.JSONRenderer',  # best one
         'rest_framework_json_api.renderers.BrowsableAPIRenderer',  # best one
+        'app_support.renderers.FastJSONRenderer',  # opt-in plain JSON (?format=json) for internal clients
         # 'rest_framework.renderers.JSONRenderer',  # optional
         # 'rest_framework.renderers.StaticHTMLRenderer',  # optional
     ),
@@ -247,7 +252,51 @@ CELERY_BROKER_TRANSPORT_OPTION = {'visibility_timeout': 3600}
 CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
+CELERY_BEAT_SCHEDULE = {
+    'recount-dirty-users': {  # works only if DEFERRED_USER_FIELDS is set
+        'task': 'app_support.celery_tasks.recount_dirty_users',
+        'schedule': float(environ.get('DIRTY_USERS_RECOUNT_INTERVAL', 5)),
+    },
+    'snapshot-backlog': {  # the backlog at the start of the day for the stats (repeated within the day)
+        'task': 'app_support.celery_tasks.snapshot_backlog',
+        'schedule': 60 * 60,
+    },
+}
 
 APP_SUPPORT_DEFAULTS = {
     'TICKETS_COLLECTOR_NAME': environ.get('TICKETS_COLLECTOR_USERNAME', 'tcollector'),
+    'MESSAGES_BATCH_MAX_SIZE': 500,
+    'REDIS_URL': CELERY_BROKER_URL,
+    # if set, users fields are not changed in requests, but recounted by celery beat in background
+    'DEFERRED_USER_FIELDS': bool(int(environ.get('DEFERRED_USER_FIELDS', 0))),
+    'DIRTY_USERS_KEY': 'app_support:dirty_users',
+    'DELETION_CHUNK_SIZE': 1000,  # messages deleted by one query in background deletion
+    'TICKET_CLAIM_TIMEOUT': 15 * 60,  # seconds, a claimed ticket returns to the queue after that
+    # if set, rendered responses of the lists are cached in Redis (invalidated by generations)
+    'RESPONSE_CACHE': bool(int(environ.get('RESPONSE_CACHE', 0))),
+    'RESPONSE_CACHE_TTL': 60,  # seconds
+    'RESPONSE_CACHE_PREFIX': 'app_support:responses',
+    'FRAGMENT_CACHE_SIZE': 10000,  # serialized objects kept by every process, 0 - disabled
+    'STREAM_CHUNK_SIZE': 500,  # rows fetched and serialized at once by the streamed lists (?stream=true)
+    'EXPORTS_DIR': environ.get('EXPORTS_DIR', BASE_DIR / 'exports'),  # files of the background exports
+    'EXPORT_CHUNK_SIZE': 500,  # tickets (with their messages) read at once by the exports
+    'SEARCH_RESULTS_LIMIT': 100,  # tickets given by tickets/search/
+    'STATS_DEFAULT_BUCKETS': 30,  # buckets given by stats/ if the range is not set (30 days, 30 hours)
+    'STATS_MAX_BUCKETS': 1000,  # the longest range of stats/ in buckets of the period
+    # if set, the user of a JWT is built from the token claims (no user query), auth versions are kept in Redis
+    'JWT_CLAIMS_USER': bool(int(environ.get('JWT_CLAIMS_USER', 0))),
+    'VERIFIED_TOKENS_TTL': 30,  # seconds, verified tokens are kept by every process, 0 - disabled
+    'AUTH_VERSIONS_PREFIX': 'app_support:auth_version',
+    # token buckets in Redis per scope and user type, e.g. '60/m' - 60 requests, refilled in a minute, None - no limit
+    # off by default: needs Redis with Lua scripting (turned on by docker-compose)
+    'THROTTLING': bool(int(environ.get('THROTTLING', 0))),
+    'THROTTLE_PREFIX': 'app_support:throttle',
+    'TASK_OWNERS_PREFIX': 'app_support:task_owner',  # requesters of the background tasks
+    'TASK_OWNERS_TTL': 24 * 60 * 60,  # seconds, as long as the celery results are kept
+    'THROTTLE_RATES': {
+        'auth': {'Anonimous': '10/m', 'User': '10/m', 'Support': '20/m', 'Staff': '20/m', 'Superuser': '20/m'},
+        'list': {'Anonimous': '30/m', 'User': '60/m', 'Support': '300/m', 'Staff': '600/m', 'Superuser': None},
+        'detail': {'Anonimous': '60/m', 'User': '120/m', 'Support': '600/m', 'Staff': '1200/m', 'Superuser': None},
+        'write': {'Anonimous': '10/m', 'User': '30/m', 'Support': '120/m', 'Staff': '300/m', 'Superuser': None},
+    },
 }
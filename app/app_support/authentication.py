@@ -0,0 +1,99 @@
+"""
+    JWT authentication without the per-request user query (JWT_CLAIMS_USER setting).
+    Tokens issued by 'obtainjwt/' contain role flags and the user's auth version (see services.auth_claims).
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer,
+                                                  TokenRefreshSerializer)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from app_support.services import auth_claims
+
+logger = logging.getLogger(__name__)
+
+
+class ClaimsUser(SimpleLazyObject):
+    """
+        The user of the verified token: id and role flags are taken from the claims,
+        any other attribute loads the user from the database (once per request).
+    """
+
+    def __init__(self, token, load_user):
+        super().__init__(load_user)
+        claims = {name: token[name] for name in auth_claims.ROLE_CLAIMS}
+        claims.update({
+            'id': token[api_settings.USER_ID_CLAIM],
+            'pk': token[api_settings.USER_ID_CLAIM],
+            'is_active': True,  # deactivation bumps the auth version
+            'is_authenticated': True,
+            'is_anonymous': False,
+        })
+        self.__dict__.update(claims)  # LazyObject.__setattr__ would load the user
+
+    def __bool__(self):
+        return True  # IsAuthenticated checks bool(request.user)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+        JWTAuthentication which (if JWT_CLAIMS_USER is set) builds ClaimsUser from the token claims
+        and checks the auth version in Redis instead of loading the user.
+        Tokens without the claims and Redis errors lead to the default user loading.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = auth_claims.get_verified_token(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            auth_claims.set_verified_token(raw_token, token)
+        return token
+
+    def get_user(self, validated_token):
+        if not settings.APP_SUPPORT_DEFAULTS['JWT_CLAIMS_USER'] or not auth_claims.has_claims(validated_token):
+            return super().get_user(validated_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        try:
+            version = auth_claims.get_version(user_id)
+        except redis.RedisError as error:
+            logger.warning('auth versions are not available, the user is loaded: %s', error)
+            return super().get_user(validated_token)
+        if version != validated_token[auth_claims.VERSION_CLAIM]:
+            raise exceptions.AuthenticationFailed('Token is revoked, obtain a new one.', code='token_revoked')
+        return ClaimsUser(validated_token, lambda: super(ClaimsJWTAuthentication, self).get_user(validated_token))
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+        Adds role flags and the auth version to the tokens.
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        return auth_claims.add_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+        Refresh tokens issued before the auth version was bumped are not accepted.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if auth_claims.has_claims(refresh):
+            try:
+                version = auth_claims.get_version(refresh[api_settings.USER_ID_CLAIM])
+            except redis.RedisError as error:
+                logger.warning('auth versions are not available, the version is not checked: %s', error)
+                version = refresh[auth_claims.VERSION_CLAIM]
+            if version != refresh[auth_claims.VERSION_CLAIM]:
+                raise InvalidToken('Token is revoked, obtain a new one.')
+        return super().validate(attrs)
@@ -5,21 +5,74 @@
 from celery import shared_task
 from django.contrib.auth import get_user_model
 
-from app_support.models import Message, Ticket
+from app_support.services import deletion, dirty_users, exports, stats
 
 User = get_user_model()
 
-AVAILABLE_CLASSES = {
-    'User': User,
-    'Ticket': Ticket,
-    'Message': Message,
+DELETION_FUNCS = {
+    'User': deletion.delete_user,
+    'Ticket': deletion.delete_ticket,
+    'Message': deletion.delete_message,
 }
 
 
+@shared_task(bind=True)
+def delete_object(self, class_name=None, id_to_delete=None):
+    """
+        delete obj from db by id.
+        Ticket messages are deleted in chunks, the progress is saved as PROGRESS task state.
+    """
+    if not (class_name and id_to_delete):
+        return False
+    if class_name == 'Ticket':
+        def report_progress(deleted, total):
+            if self.request.id:  # not called directly
+                self.update_state(state='PROGRESS', meta={'deleted_messages': deleted, 'total_messages': total})
+        return deletion.delete_ticket(id_to_delete, on_progress=report_progress)
+    return DELETION_FUNCS[class_name](id_to_delete)
+
+
 @shared_task
-def delete_object(class_name=None, id_to_delete=None):
+def recount_dirty_users():
+    """
+        Drains the dirty users set and recounts every user once (deferred mode).
+        Not processed ids are returned to the set if something fails.
+    """
+    users_ids = dirty_users.pop_dirty_users()
+    processed_ids = set()
+    try:
+        for user in User.objects.filter(id__in=users_ids):
+            user.update_user_fields()
+            processed_ids.add(user.id)
+    except Exception:
+        dirty_users.mark_users_dirty(set(users_ids) - processed_ids)
+        raise
+    return len(processed_ids)
+
+
+@shared_task
+def snapshot_backlog():
+    """
+        Saves the backlog at the start of the current day for the stats.
+    """
+    return stats.snapshot_backlog()
+
+
+@shared_task(bind=True)
+def export_tickets(self, export_format='ndjson', compress=False, date_from=None, date_to=None, user_id=None):
     """
-        delete obj from db by id
+        Exports tickets with messages to a file named by the task id.
+        The progress is saved as PROGRESS task state, the result contains the file name.
     """
-    if class_name and id_to_delete:
-        AVAILABLE_CLASSES[class_name].objects.filter(id=id_to_delete)[0].delete()
+    def report_progress(exported, total):
+        if self.request.id:  # not called directly
+            self.update_state(state='PROGRESS', meta={'exported_tickets': exported, 'total_tickets': total})
+    return exports.export_tickets(
+        self.request.id,
+        export_format=export_format,
+        compress=compress,
+        on_progress=report_progress,
+        date_from=date_from,
+        date_to=date_to,
+        user_id=user_id,
+    )
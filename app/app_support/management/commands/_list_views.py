@@ -0,0 +1,38 @@
+"""
+    Helpers of the management commands which run the list views code without HTTP.
+"""
+
+from app_support.views import TicketsListView, UsersListView
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIRequestFactory
+
+User = get_user_model()
+
+LIST_VIEWS = {
+    'tickets': TicketsListView,
+    'users': UsersListView,
+}
+
+
+def get_superuser():
+    """
+        Returns a superuser which can use every mode, it is not saved to the database.
+    """
+
+    return User(id=0, username='command', is_superuser=True, is_staff=True, is_support=True)
+
+
+def get_list_view(view_class, params, user):
+    """
+        Returns a view instance with the request, as dispatch() would prepare it.
+    """
+
+    view = view_class()
+    request = APIRequestFactory().get('/', params)
+    view.args, view.kwargs = (), {}
+    view.request = view.initialize_request(request)
+    view.request.user = user
+    view.format_kwarg = None
+    if view_class is UsersListView:
+        view.set_valid_kwargs()  # is called by list(), TicketsListView calls it in filter_queryset
+    return view
@@ -0,0 +1,66 @@
+import random
+import string
+from timeit import Timer
+
+from app_support.services import routes_index
+from django.core.management.base import BaseCommand
+from django.urls import get_resolver
+
+# near-miss paths of the real routes, the rest are random (bots)
+NEAR_MISS_PATHS = [
+    '/api/v1/ticket/12/',
+    '/api/v1/tickets/12',
+    '/api/v1/tickets/12/mesages/',
+    '/api/v1/usres/me/',
+    '/api/v1/tikets/next/',
+]
+
+
+def get_legacy_advice(path):
+    """
+        The former 404 page check: the urls list is rebuilt for every request, only a missing slash is found.
+    """
+
+    urls_list = [value[0][0][0].split('%')[0] for value in get_resolver().reverse_dict.values()]
+    return f'{path[1:]}/' in urls_list
+
+
+class Command(BaseCommand):
+    """
+        Compares the cost of the 404 page advice: the former urls list rebuilding
+        and the routes index (trie) lookup with edit distance suggestions.
+        The building of the index (once per process) is measured separately.
+    """
+
+    help = 'Benchmark the 404 page route suggestions with and without the routes index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paths', type=int, default=1000, help='Random paths (1000 by default).')
+        parser.add_argument('--repeat', type=int, default=5, help='Measurements per variant.')
+
+    def handle(self, *args, **options):
+        random.seed(0)
+        paths = NEAR_MISS_PATHS + [self.get_random_path() for _ in range(options['paths'])]
+        resolver = get_resolver()
+        build_timer = Timer(lambda: routes_index.RoutesIndex.from_resolver(resolver))
+        build_seconds = min(build_timer.repeat(options['repeat'], number=1))
+        index = routes_index.get_routes_index()
+
+        variants = {
+            'urls list (former)': lambda: [get_legacy_advice(path) for path in paths],
+            'routes index': lambda: [index.suggest(path) for path in paths],
+        }
+        self.stdout.write(f'index building: {build_seconds * 1000:.2f} ms (once per process)')
+        self.stdout.write(f'{"variant":<22}{"us/404":>10}')
+        for name, function in variants.items():
+            seconds = min(Timer(function).repeat(options['repeat'], number=1))
+            self.stdout.write(f'{name:<22}{seconds / len(paths) * 10**6:>10.1f}')
+        for path in NEAR_MISS_PATHS:
+            self.stdout.write(f'{path} -> {index.suggest(path)}')
+
+    def get_random_path(self):
+        segments = [
+            ''.join(random.choices(string.ascii_lowercase + string.digits, k=random.randint(2, 10)))
+            for _ in range(random.randint(1, 4))
+        ]
+        return f'/api/v1/{"/".join(segments)}/'
@@ -0,0 +1,82 @@
+from timeit import Timer
+
+from app_support.management.commands._list_views import LIST_VIEWS, get_list_view, get_superuser
+from app_support.models import Message, Ticket
+from app_support.renderers import FastJSONRenderer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.response import Response
+from rest_framework_json_api.renderers import JSONRenderer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+        Compares rendering time of the JSON:API renderer and FastJSONRenderer for every serializer mode.
+        The list data is serialized once, only renderer.render() is measured (the best of the repeats).
+        If there are not enough rows in the database, the missing ones are created and rolled back at the end.
+    """
+
+    help = 'Benchmark the list renderers (JSON:API vs fast JSON) per serializer mode.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', choices=list(LIST_VIEWS.keys()), default='tickets')
+        parser.add_argument('--rows', type=int, default=300, help='Rows in the list (300 by default).')
+        parser.add_argument('--messages', type=int, default=5, help='Messages of every created ticket.')
+        parser.add_argument('--repeat', type=int, default=5, help='Measurements per renderer.')
+
+    def handle(self, *args, **options):
+        view_class = LIST_VIEWS[options['view']]
+        renderers = [JSONRenderer(), FastJSONRenderer()]
+        app_settings = settings.APP_SUPPORT_DEFAULTS
+        response_cache_setting, app_settings['RESPONSE_CACHE'] = app_settings['RESPONSE_CACHE'], False
+
+        try:
+            with transaction.atomic():
+                self.fill_db(view_class, options['rows'], options['messages'])
+                self.stdout.write(f'{"mode":<10}{"renderer":<20}{"ms/render":>12}{"KB":>10}')
+                for mode in view_class.serializer_modes:
+                    view = get_list_view(view_class, {'mode': mode, 'limit': options['rows']}, get_superuser())
+                    queryset = view.filter_queryset(view.get_queryset())
+                    data = view.get_serializer(list(queryset), many=True).data
+                    for renderer in renderers:
+                        seconds, size = self.measure(renderer, view, data, options['repeat'])
+                        self.stdout.write(
+                            f'{mode:<10}{renderer.__class__.__name__:<20}{seconds * 1000:>12.2f}{size / 1024:>10.1f}'
+                        )
+                transaction.set_rollback(True)  # the created rows are not needed
+        finally:
+            app_settings['RESPONSE_CACHE'] = response_cache_setting
+
+    def fill_db(self, view_class, rows, messages_count):
+        """
+            Creates the missing rows (users or tickets with messages) with bulk inserts.
+        """
+
+        missing = rows - view_class.queryset.count()
+        if missing <= 0:
+            return
+        if view_class.queryset.model is User:
+            User.objects.bulk_create([
+                User(username=f'benchmark{i}', email=f'benchmark{i}@benchmark.benchmark') for i in range(missing)
+            ])
+            return
+        user = User.objects.create(username='benchmark', email='benchmark@benchmark.benchmark')
+        tickets = Ticket.objects.bulk_create([Ticket(opened_by=user, ticket_theme='1') for _ in range(missing)])
+        Message.objects.bulk_create([
+            Message(linked_ticket=ticket, linked_user=user, body='benchmark message ' * 5)
+            for ticket in tickets for _ in range(messages_count)
+        ])
+
+    def measure(self, renderer, view, data, repeat):
+        """
+            Returns the best time of renderer.render() in seconds and the size of the rendered content.
+        """
+
+        context = {'view': view, 'request': view.request, 'response': Response(data), 'args': (), 'kwargs': {}}
+        content = renderer.render(data, renderer.media_type, context)
+        seconds = min(Timer(lambda: renderer.render(data, renderer.media_type, context)).repeat(repeat, number=1))
+        return seconds, len(content)
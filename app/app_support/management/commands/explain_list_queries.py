@@ -0,0 +1,138 @@
+import re
+
+from app_support.management.commands._list_views import LIST_VIEWS, get_list_view, get_superuser
+from app_support.views_pagination import KeysetPagination
+from django.core.management.base import BaseCommand, CommandError
+
+# filters which are used by the support queue
+LIST_FILTERS = {
+    'tickets': [
+        {},
+        {'is_answered': 'false', 'is_closed': 'false'},
+        {'is_closed': 'false'},
+        {'opened_by': '1'},
+        {'answerer_id': '1'},
+    ],
+    'users': [
+        {},
+        {'is_support': 'true'},
+    ],
+}
+
+# plan lines of postgresql / sqlite which mean that the index is not used for the query
+FULL_SCAN_PATTERNS = (r'Seq Scan on', r'\bSCAN \w+$')
+SORT_PATTERNS = (r'Sort Key', r'USE TEMP B-TREE FOR ORDER BY')
+
+
+class Command(BaseCommand):
+    """
+        Prints EXPLAIN for every query shape of the list views:
+        filters x 'order=' variants x modes, page number and keyset (cursor) pagination.
+        Shapes with a full table scan followed by a sort are marked as warnings.
+    """
+
+    help = 'Print EXPLAIN of the list views queries (tickets and users lists).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view', choices=list(LIST_VIEWS.keys()), action='append', dest='views',
+            help='List view to explain (all views by default).',
+        )
+        parser.add_argument(
+            '--mode', action='append', dest='modes',
+            help='Serializer mode to explain (basic by default).',
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Run EXPLAIN ANALYZE (postgresql only).',
+        )
+        parser.add_argument(
+            '--warnings-only', action='store_true',
+            help='Print only the shapes with a full table scan and a sort.',
+        )
+
+    def handle(self, *args, **options):
+        self.user = get_superuser()
+        self.explain_options = {'analyze': True} if options['analyze'] else {}
+        self.warnings_only = options['warnings_only']
+        explained_sql = set()
+        warnings_count = 0
+
+        for view_name in options['views'] or LIST_VIEWS.keys():
+            view_class, filters = LIST_VIEWS[view_name], LIST_FILTERS[view_name]
+            for mode in options['modes'] or ['basic']:
+                if mode not in view_class.serializer_modes:
+                    raise CommandError(f'mode <{mode}> is not in {list(view_class.serializer_modes.keys())}')
+                for order in self.get_order_variants(view_class.list_ordering):
+                    for filter_kwargs in filters:
+                        params = {'mode': mode, **filter_kwargs}
+                        if order:
+                            params['order'] = order
+                        for title, queryset in self.get_query_shapes(view_class, params):
+                            sql = str(queryset.query)
+                            if sql in explained_sql:
+                                continue
+                            explained_sql.add(sql)
+                            warnings_count += self.print_plan(f'{view_name} {title}', queryset)
+
+        self.stdout.write(f'{len(explained_sql)} query shapes explained, {warnings_count} warnings.')
+
+    def get_order_variants(self, list_ordering):
+        """
+            Returns '' (default ordering) and every signed 'order=' value.
+        """
+
+        variants = ['']
+        for name in list_ordering:
+            variants.extend([name, f'-{name}'])
+        return variants
+
+    def get_query_shapes(self, view_class, params):
+        """
+            Yields (title, queryset) of the page number page and of the first two keyset pages.
+        """
+
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        view = get_list_view(view_class, params, self.user)
+        queryset = view.filter_queryset(view.get_queryset())
+        yield f'?{query}', queryset[:view.paginator.page_size]
+
+        view = get_list_view(view_class, {**params, 'cursor': ''}, self.user)
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = KeysetPagination()
+        paginator.model = queryset.model
+        paginator.key_fields = paginator.get_key_fields(view.list_ordering)
+        queryset = queryset.order_by(*paginator.get_order_by())
+        yield f'?{query}&cursor=', queryset[:paginator.page_size + 1]
+
+        position = queryset.values_list(*[name for name, _ in paginator.key_fields]).first()
+        if position is not None:
+            queryset = queryset.filter(paginator.get_after_position_filter(position))
+            yield f'?{query}&cursor=<next>', queryset[:paginator.page_size + 1]
+
+    def get_plan_warnings(self, plan):
+        lines = plan.splitlines()
+        warnings = []
+        if any(re.search(pattern, line) for pattern in FULL_SCAN_PATTERNS for line in lines):
+            warnings.append('full table scan')
+        if any(re.search(pattern, line) for pattern in SORT_PATTERNS for line in lines):
+            warnings.append('sort')
+        return warnings
+
+    def print_plan(self, title, queryset):
+        """
+            Prints the plan of the query. Returns 1 if it is a warning (full scan and sort), else 0.
+        """
+
+        plan = queryset.explain(**self.explain_options)
+        warnings = self.get_plan_warnings(plan)
+        is_warning = len(warnings) == 2
+        if self.warnings_only and not is_warning:
+            return 0
+
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(plan)
+        if is_warning:
+            self.stdout.write(self.style.WARNING(f'WARNING: {" and ".join(warnings)}'))
+        self.stdout.write('')
+        return int(is_warning)
@@ -0,0 +1,15 @@
+from app_support.services import stats
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+        Recounts the support rollups (stats/ endpoint) from the tickets and messages,
+        e.g. after the data was created without the rollups hooks (bulk_create, raw SQL).
+    """
+
+    help = 'Rebuild the hourly and daily support metrics rollups.'
+
+    def handle(self, *args, **options):
+        events_count = stats.rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'The rollups are rebuilt ({events_count} events).'))
@@ -0,0 +1,25 @@
+from app_support.services import response_cache
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+        Prints the lists response cache counters (hits, misses, hit rate, invalidations) for tuning.
+    """
+
+    help = 'Print the list responses cache statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counters after printing.',
+        )
+
+    def handle(self, *args, **options):
+        if not response_cache.is_enabled():
+            self.stdout.write(self.style.WARNING('The response cache is disabled (RESPONSE_CACHE=0).'))
+        for name, value in response_cache.get_stats().items():
+            self.stdout.write(f'{name}: {value}')
+        if options['reset']:
+            response_cache.reset_stats()
+            self.stdout.write('The counters are reset.')
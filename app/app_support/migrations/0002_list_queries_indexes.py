@@ -0,0 +1,57 @@
+# Generated by Django 4.0 on 2026-10-18 16:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(fields=['unanswered_since', 'id'], name='user_unanswered_since_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appuser',
+            index=models.Index(fields=['is_support', 'unanswered_since', 'id'], name='user_support_unanswered_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['linked_ticket', 'id'], name='message_ticket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['user_question_date', 'id'], name='ticket_question_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('is_answered', False), ('is_closed', False)), fields=['user_question_date', 'id'], name='ticket_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['opened_by', 'user_question_date', 'id'], name='ticket_owner_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['answerer_id', 'user_question_date', 'id'], name='ticket_answerer_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['is_closed', 'user_question_date', 'id'], name='ticket_closed_question_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['ticket_theme', 'id'], name='ticket_theme_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('is_answered', False)), fields=['opened_by', 'user_question_date'], name='ticket_owner_unanswered_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0002_list_queries_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='claimed_by_id',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
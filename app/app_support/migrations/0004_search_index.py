@@ -0,0 +1,122 @@
+"""
+    Full-text search index over Message.body, Ticket.staff_note and ticket_theme (its label).
+    postgresql: stored generated tsvector columns with GIN indexes (kept up to date by the database).
+    sqlite: FTS5 external content tables, kept up to date by triggers.
+    Note for sqlite: the triggers are dropped when django remakes the table (some AlterField),
+    such migration must run CREATE_SQLITE_TRIGGERS again.
+"""
+
+from django.db import migrations
+
+SEARCH_CONFIG = 'simple'  # no stemming and stop words, error codes are kept as they are
+
+# frozen copy of models_const.TICKET_THEMES
+TICKET_THEMES = (
+    ('1', 'product'),
+    ('2', 'soft'),
+    ('3', 'security'),
+    ('4', 'other'),
+)
+
+
+def get_theme_label_sql(column):
+    cases = ' '.join(f"WHEN '{value}' THEN '{label}'" for value, label in TICKET_THEMES)
+    return f"CASE {column} {cases} ELSE '' END"
+
+
+POSTGRESQL_FORWARD = [
+    f"""
+    ALTER TABLE app_support_message ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', body)) STORED
+    """,
+    'CREATE INDEX message_search_idx ON app_support_message USING GIN (search_vector)',
+    f"""
+    ALTER TABLE app_support_ticket ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        to_tsvector('{SEARCH_CONFIG}', {get_theme_label_sql('ticket_theme')} || ' ' || staff_note)
+    ) STORED
+    """,
+    'CREATE INDEX ticket_search_idx ON app_support_ticket USING GIN (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'ALTER TABLE app_support_message DROP COLUMN search_vector',
+    'ALTER TABLE app_support_ticket DROP COLUMN search_vector',
+]
+
+CREATE_SQLITE_TRIGGERS = [
+    """
+    CREATE TRIGGER app_support_message_fts_insert AFTER INSERT ON app_support_message BEGIN
+        INSERT INTO app_support_message_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    """
+    CREATE TRIGGER app_support_message_fts_delete AFTER DELETE ON app_support_message BEGIN
+        INSERT INTO app_support_message_fts(app_support_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+    END
+    """,
+    """
+    CREATE TRIGGER app_support_message_fts_update AFTER UPDATE OF body ON app_support_message BEGIN
+        INSERT INTO app_support_message_fts(app_support_message_fts, rowid, body) VALUES ('delete', old.id, old.body);
+        INSERT INTO app_support_message_fts(rowid, body) VALUES (new.id, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_support_ticket_fts_insert AFTER INSERT ON app_support_ticket BEGIN
+        INSERT INTO app_support_ticket_fts(rowid, ticket_theme, staff_note)
+        VALUES (new.id, {get_theme_label_sql('new.ticket_theme')}, new.staff_note);
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_support_ticket_fts_delete AFTER DELETE ON app_support_ticket BEGIN
+        INSERT INTO app_support_ticket_fts(app_support_ticket_fts, rowid, ticket_theme, staff_note)
+        VALUES ('delete', old.id, {get_theme_label_sql('old.ticket_theme')}, old.staff_note);
+    END
+    """,
+    f"""
+    CREATE TRIGGER app_support_ticket_fts_update AFTER UPDATE OF ticket_theme, staff_note ON app_support_ticket BEGIN
+        INSERT INTO app_support_ticket_fts(app_support_ticket_fts, rowid, ticket_theme, staff_note)
+        VALUES ('delete', old.id, {get_theme_label_sql('old.ticket_theme')}, old.staff_note);
+        INSERT INTO app_support_ticket_fts(rowid, ticket_theme, staff_note)
+        VALUES (new.id, {get_theme_label_sql('new.ticket_theme')}, new.staff_note);
+    END
+    """,
+]
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE app_support_message_fts USING fts5("
+    "body, content='app_support_message', content_rowid='id')",
+    "CREATE VIRTUAL TABLE app_support_ticket_fts USING fts5("
+    "ticket_theme, staff_note, content='app_support_ticket', content_rowid='id')",
+    'INSERT INTO app_support_message_fts(rowid, body) SELECT id, body FROM app_support_message',
+    'INSERT INTO app_support_ticket_fts(rowid, ticket_theme, staff_note) '
+    f"SELECT id, {get_theme_label_sql('ticket_theme')}, staff_note FROM app_support_ticket",
+    *CREATE_SQLITE_TRIGGERS,
+]
+SQLITE_BACKWARD = [
+    *[
+        f'DROP TRIGGER IF EXISTS app_support_{table}_fts_{event}'
+        for table in ['message', 'ticket'] for event in ['insert', 'delete', 'update']
+    ],
+    'DROP TABLE app_support_message_fts',
+    'DROP TABLE app_support_ticket_fts',
+]
+
+
+def run_vendor_sql(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0003_ticket_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_vendor_sql({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run_vendor_sql({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.0 on 2026-10-18 16:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupportRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'hour'), ('day', 'day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('ticket_theme', models.CharField(
+                    choices=[('1', 'product'), ('2', 'soft'), ('3', 'security'), ('4', 'other')], max_length=255,
+                )),
+                ('agent_id', models.PositiveIntegerField(default=0)),
+                ('opened_tickets', models.IntegerField(default=0)),
+                ('closed_tickets', models.IntegerField(default=0)),
+                ('close_seconds', models.BigIntegerField(default=0)),
+                ('first_responses', models.IntegerField(default=0)),
+                ('first_response_seconds', models.BigIntegerField(default=0)),
+                ('answers', models.IntegerField(default=0)),
+                ('backlog_delta', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['period', 'bucket', 'ticket_theme', 'agent_id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='supportrollup',
+            constraint=models.UniqueConstraint(
+                fields=('period', 'bucket', 'ticket_theme', 'agent_id'), name='rollup_key',
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.0 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0005_support_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(
+                condition=models.Q(('claimed_by_id__isnull', False)),
+                fields=['claimed_by_id'],
+                name='ticket_claimed_by_idx',
+            ),
+        ),
+    ]
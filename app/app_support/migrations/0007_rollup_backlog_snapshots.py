@@ -0,0 +1,26 @@
+# Generated by Django 4.0 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_support', '0006_ticket_claimed_by_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportrollup',
+            name='backlog_start',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='supportrollup',
+            index=models.Index(
+                condition=models.Q(('backlog_start__isnull', False)),
+                fields=['ticket_theme', 'bucket'],
+                name='rollup_backlog_snapshot_idx',
+            ),
+        ),
+    ]
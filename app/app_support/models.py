@@ -1,11 +1,25 @@
 from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
-from django.db.models import Min
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Least
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from app_support import models_const
+from app_support.services import auth_claims, dirty_users, response_cache
+
+
+def saved_fields_names(model_obj, excluded_fields):
+    """
+        Returns names of all concrete (non-pk) fields of model_obj, except excluded_fields.
+        Can be used as save(update_fields=...) value.
+    """
+
+    return [
+        field.name for field in model_obj._meta.concrete_fields
+        if not field.primary_key and field.name not in excluded_fields
+    ]
 
 
 class AppUserManager(BaseUserManager):
@@ -62,8 +76,19 @@ class AppUser(AbstractUser):
     tickets_messages = models.IntegerField(default=0, editable=False)
     objects = AppUserManager()
 
+    # maintained by update_user_fields() and apply_fields_deltas() only, save() never writes them
+    counter_fields = ['tickets_messages', 'opened_tickets_count', 'unanswered_since']
+    # a change of these fields makes the issued tokens invalid (see services.auth_claims)
+    auth_fields = ['is_active', 'is_superuser', 'is_staff', 'is_support', 'password']
+
     class Meta:
         ordering = ['unanswered_since', 'id']
+        indexes = [
+            # users list orderings (see UsersListView.list_ordering)
+            models.Index(fields=['unanswered_since', 'id'], name='user_unanswered_since_idx'),
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+            models.Index(fields=['is_support', 'unanswered_since', 'id'], name='user_support_unanswered_idx'),
+        ]
 
     @property
     def max_not_answered_seconds(self):
@@ -77,25 +102,144 @@ class AppUser(AbstractUser):
             delta = round((timezone.now() - self.unanswered_since).total_seconds())
         return delta
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+            Remembers the loaded auth fields values (to find out their changes in save()).
+        """
+
+        instance = super().from_db(db, field_names, values)
+        instance.loaded_auth_values = instance.get_auth_values()
+        return instance
+
+    def get_auth_values(self):
+        return [self.__dict__.get(name) for name in self.auth_fields]  # deferred fields are not loaded
+
     def save(self, *args, **kwargs):
         """
-            Also updates last_changes field
+            Also updates last_changes field.
+            Counter fields of an existing user are not rewritten (they are changed by deltas).
+            Changed roles, password or activity revoke the issued tokens.
         """
 
         self.last_changes = timezone.now()
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = saved_fields_names(self, self.counter_fields)
         super().save(*args, **kwargs)  # call the actual save method
+        response_cache.invalidate('users', 'tickets')  # screen name is shown in the tickets lists
+        auth_values = self.get_auth_values()
+        if getattr(self, 'loaded_auth_values', auth_values) != auth_values:
+            auth_claims.bump_version(self.id)
+        self.loaded_auth_values = auth_values
 
     def __str__(self):
         return self.get_screen_name()
 
+    def delete(self, *args, **kwargs):
+        """
+            Hands over tickets and messages to the tickets collector before calling the default method.
+        """
+
+        with transaction.atomic():
+            self.hand_over_to_tickets_collector()
+            response_cache.invalidate('users', 'tickets')
+            auth_claims.bump_version(self.id)
+            return super().delete(*args, **kwargs)
+
+    def hand_over_to_tickets_collector(self):
+        """
+            Moves all tickets and messages of the user to the tickets collector
+            with one UPDATE for each table, the collector fields are changed by deltas.
+        """
+
+        tickets_info = self.tickets.aggregate(
+            tickets=Count('id'),
+            opened_tickets=Count('id', filter=Q(is_closed=False)),
+            new_question_date=Min('user_question_date', filter=Q(is_answered=False)),
+        )
+        if not tickets_info.pop('tickets') and not self.messages.exists():
+            return  # nothing to hand over, the collector is not even needed
+        collector_id = get_tickets_collector_id()
+        if collector_id == self.id:
+            return
+        moved_messages = Message.objects.filter(linked_user=self.id).update(linked_user=collector_id)
+        # last_changes - for the validators and the lists caches (the owner is shown)
+        Ticket.objects.filter(opened_by=self.id).update(opened_by=collector_id, last_changes=timezone.now())
+        AppUser.apply_fields_deltas({collector_id: dict(tickets_info, messages=moved_messages)})
+
+    @classmethod
+    def apply_fields_deltas(cls, users_deltas):
+        """
+            Delta-based alternative to update_user_fields().
+            Changes the counter fields of several users with one UPDATE (atomic F() increments).
+            users_deltas: {user_id: {
+                'messages': [int] tickets_messages delta,
+                'opened_tickets': [int] opened_tickets_count delta,
+                'new_question_date': [datetime] a question date of a ticket which became unanswered,
+                'dropped_question_date': [datetime] a question date which is not waiting for an answer anymore,
+            }}
+            Returns count of updated rows.
+            In the deferred mode users are only marked dirty (recounted later by Celery).
+        """
+
+        if not users_deltas:
+            return 0
+        if dirty_users.is_deferred_mode():
+            dirty_users.mark_users_dirty(users_deltas.keys())
+            return len(users_deltas)
+        messages_whens, opened_tickets_whens, question_date_whens = [], [], []
+        for user_id, deltas in users_deltas.items():
+            if deltas.get('messages'):
+                messages_whens.append(When(id=user_id, then=F('tickets_messages') + deltas['messages']))
+            if deltas.get('opened_tickets'):
+                opened_tickets_whens.append(
+                    When(id=user_id, then=F('opened_tickets_count') + deltas['opened_tickets'])
+                )
+            unanswered_since = cls.get_unanswered_since_expression(
+                deltas.get('new_question_date'),
+                deltas.get('dropped_question_date'),
+            )
+            if unanswered_since is not None:
+                question_date_whens.append(When(id=user_id, then=unanswered_since))
+
+        updates = {'last_changes': timezone.now()}
+        if messages_whens:
+            updates['tickets_messages'] = Case(*messages_whens, default=F('tickets_messages'))
+        if opened_tickets_whens:
+            updates['opened_tickets_count'] = Case(*opened_tickets_whens, default=F('opened_tickets_count'))
+        if question_date_whens:
+            updates['unanswered_since'] = Case(*question_date_whens, default=F('unanswered_since'))
+        response_cache.invalidate('users')
+        return cls.objects.filter(id__in=list(users_deltas.keys())).update(**updates)
+
+    @staticmethod
+    def get_unanswered_since_expression(new_question_date=None, dropped_question_date=None):
+        """
+            Returns an expression for the new unanswered_since value (or None if it is unchanged).
+            The earliest question date is searched again only if the dropped date was the earliest one,
+            otherwise the new date is compared with the current value.
+        """
+
+        expression = None
+        if new_question_date:
+            new_date = Value(new_question_date, output_field=models.DateTimeField())
+            expression = Least(Coalesce(F('unanswered_since'), new_date), new_date)
+        if dropped_question_date:
+            expression = Case(
+                When(unanswered_since=dropped_question_date, then=get_earliest_question_date_subquery()),
+                default=expression if expression is not None else F('unanswered_since'),
+            )
+        return expression
+
     def update_user_fields(self):
         """
-            This method will mostly called when some Ticket/Message fields values changed /new created.
-            Recalculates some related AppUser fields as tickets_messages
+            Full recount of the related AppUser fields (tickets_messages etc).
+            Mostly the fields are changed by apply_fields_deltas(),
+            this method is for the rare cases when the deltas are unknown.
         """
 
         self.tickets_messages = self.messages.count()
-        self.current_opened_tickets_count = self.tickets.filter(is_closed=False).count()
+        self.opened_tickets_count = self.tickets.filter(is_closed=False).count()
         unanswered_since = (
             self.tickets.exclude(
                 user_question_date=None
@@ -109,7 +253,7 @@ class AppUser(AbstractUser):
             self.unanswered_since = unanswered_since
         else:
             self.unanswered_since = None
-        self.save()
+        self.save(update_fields=self.counter_fields + ['last_changes'])
 
     def get_screen_name(self):
         """
@@ -117,30 +261,67 @@ class AppUser(AbstractUser):
             Add postfix to screen name according User's status.
         """
 
+        return self.build_screen_name(
+            self.id, self.username, self.screen_name, self.hide_private_info, self.is_staff, self.is_support,
+        )
+
+    @staticmethod
+    def build_screen_name(user_id, username, screen_name, hide_private_info, is_staff, is_support):
+        """
+            get_screen_name() of the fields values (can be used without model instances).
+        """
+
         tail = ''
-        if self.is_staff:
+        if is_staff:
             tail = ' (admin)'
-        elif self.is_support:
+        elif is_support:
             tail = ' (support)'
-        if self.screen_name:
-            screen_name = self.screen_name
-        elif not self.hide_private_info:
-            screen_name = self.username
-        else:
-            screen_name = f'user (id #{self.id})'
+        if not screen_name:
+            screen_name = username if not hide_private_info else f'user (id #{user_id})'
         return screen_name+tail
 
 
+# {username: id} of the tickets collector, the cached id is validated on every use
+tickets_collector_id_cache = {}
+
+
+def get_tickets_collector_id():
+    """
+        Returns an id of the user,
+        which collects all tickets for deleted users (created if necessary).
+        The cached id is checked by a cheap query (the collector could be deleted or recreated
+        by another process), the user is searched again if it is not valid.
+    """
+
+    username = settings.APP_SUPPORT_DEFAULTS['TICKETS_COLLECTOR_NAME']
+    collector_id = tickets_collector_id_cache.get(username)
+    if collector_id is None or not AppUser.objects.filter(id=collector_id, username=username).exists():
+        collector_id = AppUser.objects.get_or_create(username=username)[0].id
+        tickets_collector_id_cache[username] = collector_id
+    return collector_id
+
+
 def get_current_tc_user_object():
     """
-        Returns an user-object,
-        which collects all tickets for deleted users.
+        on_delete=SET() value for tickets and messages of deleted users.
+        Returns the tickets collector id (an object is not needed to set a foreign key).
     """
 
-    user_object = AppUser.objects.get_or_create(
-        username=settings.APP_SUPPORT_DEFAULTS['TICKETS_COLLECTOR_NAME']
-    )[0]
-    return user_object
+    return get_tickets_collector_id()
+
+
+def get_earliest_question_date_subquery():
+    """
+        Returns a subquery with the earliest unanswered question date of the outer user.
+    """
+
+    return Subquery(
+        Ticket.objects.filter(
+            opened_by=OuterRef('pk'),
+            is_answered=False,
+            user_question_date__isnull=False,
+        ).order_by('user_question_date').values('user_question_date')[:1]
+    )
 
 
 class Ticket(models.Model):
@@ -170,9 +351,55 @@ class Ticket(models.Model):
     user_question_date = models.DateTimeField(blank=True, null=True, editable=False)
     closed_by_id = models.PositiveIntegerField(blank=True, null=True, editable=False)
     messages_count = models.PositiveIntegerField(default=0, editable=False)
+    # support user who took the ticket from the queue (see services/tickets_claim.py)
+    claimed_by_id = models.PositiveIntegerField(blank=True, null=True, editable=False)
+    claimed_until = models.DateTimeField(blank=True, null=True, editable=False)
+
+    # maintained by F() deltas, save() never writes it for an existing ticket
+    counter_fields = ['messages_count']
+    # changed by the tickets queue only, save() never writes them for an existing ticket
+    claim_fields = ['claimed_by_id', 'claimed_until']
+    # the owner's fields and the support rollups deltas are calculated from the changes of these fields
+    tracked_fields = ['opened_by_id', 'is_closed', 'ticket_theme', 'is_answered', 'user_question_date']
 
     class Meta:
         ordering = ['id', 'ticket_theme', 'user_question_date', 'last_changes', 'is_answered']
+        indexes = [
+            # tickets list: default ordering and the support queue (unanswered open tickets)
+            models.Index(fields=['user_question_date', 'id'], name='ticket_question_date_idx'),
+            models.Index(
+                fields=['user_question_date', 'id'],
+                condition=Q(is_answered=False, is_closed=False),
+                name='ticket_queue_idx',
+            ),
+            # tickets list filters (see TicketsListView.filter_fields) with the default ordering
+            models.Index(fields=['opened_by', 'user_question_date', 'id'], name='ticket_owner_question_idx'),
+            models.Index(fields=['answerer_id', 'user_question_date', 'id'], name='ticket_answerer_question_idx'),
+            models.Index(fields=['is_closed', 'user_question_date', 'id'], name='ticket_closed_question_idx'),
+            models.Index(fields=['ticket_theme', 'id'], name='ticket_theme_idx'),
+            # tickets claimed by a support user (see services/tickets_claim.py), few rows
+            models.Index(
+                fields=['claimed_by_id'],
+                condition=Q(claimed_by_id__isnull=False),
+                name='ticket_claimed_by_idx',
+            ),
+            # the earliest unanswered question of a user (get_earliest_question_date_subquery)
+            models.Index(
+                fields=['opened_by', 'user_question_date'],
+                condition=Q(is_answered=False),
+                name='ticket_owner_unanswered_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+            Remembers the loaded values of the tracked fields.
+        """
+
+        instance = super().from_db(db, field_names, values)
+        instance.remember_tracked_fields()
+        return instance
 
     @property
     def not_answered_time(self):
@@ -184,67 +411,230 @@ class Ticket(models.Model):
             return int((timezone.now() - self.user_question_date).total_seconds())
         return 0
 
+    def remember_tracked_fields(self, names=None):
+        """
+            Saves current values of the tracked fields (deferred fields are skipped).
+            names - only these fields are remembered again (the others keep their values).
+        """
+
+        values = {name: self.__dict__[name] for name in names or self.tracked_fields if name in self.__dict__}
+        self.tracked_values = values if names is None else {**getattr(self, 'tracked_values', {}), **values}
+
+    def is_in_backlog(self, values=None):
+        """
+            Returns True if the ticket is open and its question is waiting for an answer.
+            values - tracked fields values to check instead of the current ones.
+        """
+
+        state = {
+            name: (values or {}).get(name, getattr(self, name))
+            for name in ['is_closed', 'is_answered', 'user_question_date']
+        }
+        return not state['is_closed'] and not state['is_answered'] and state['user_question_date'] is not None
+
+    def get_backlog_events(self, was_in_backlog, old_theme, moment):
+        """
+            Returns SupportRollup.apply_deltas() events of the backlog change.
+        """
+
+        events = []
+        if was_in_backlog:
+            events.append((moment, old_theme, None, {'backlog_delta': -1}))
+        if self.is_in_backlog():
+            events.append((moment, self.ticket_theme, None, {'backlog_delta': 1}))
+        return events
+
+    def get_answers_events(self, new_messages, is_first_response):
+        """
+            Returns SupportRollup.apply_deltas() events of the agents messages.
+            is_first_response - the ticket had no answerer before new_messages.
+        """
+
+        events = []
+        for message in new_messages:
+            if message.linked_user_id == self.opened_by_id:
+                continue
+            deltas = {'answers': 1}
+            if is_first_response:
+                deltas['first_responses'] = 1
+                deltas['first_response_seconds'] = int((message.creation_date - self.creation_date).total_seconds())
+                is_first_response = False
+            events.append((message.creation_date, self.ticket_theme, message.linked_user_id, deltas))
+        return events
+
     def save(self, *args, **kwargs):
         """
             Changes last_changes field value before call super.save().
-            After calling the default method, edits and saves the dependent User fields.
+            Counter and claim fields of an existing ticket are not rewritten (they are changed by UPDATE).
+            After calling the default method, applies the dependent User fields and support rollups deltas.
         """
 
+        adding = self._state.adding
         self.last_changes = timezone.now()  # update 'last_update' field before saving
+        if not adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = saved_fields_names(self, self.counter_fields + self.claim_fields)
         super().save(*args, **kwargs)  # call the actual save method
-        self.opened_by.update_user_fields()
+        response_cache.invalidate('tickets')
+        self.update_rollups(adding)
+        self.update_owner_fields(adding)
+
+    def update_rollups(self, adding=False):
+        """
+            Applies the support rollups deltas according to the tracked fields changes:
+            an opened ticket, a closed one (the agent is closed_by_id) and the backlog change.
+        """
+
+        tracked_values = {} if adding else getattr(self, 'tracked_values', {})
+        events = self.get_backlog_events(
+            not adding and self.is_in_backlog(tracked_values),
+            tracked_values.get('ticket_theme', self.ticket_theme),
+            self.last_changes,
+        )
+        if adding:
+            events.append((self.creation_date, self.ticket_theme, None, {'opened_tickets': 1}))
+        if self.is_closed and not tracked_values.get('is_closed', not adding):
+            events.append((self.last_changes, self.ticket_theme, self.closed_by_id, {
+                'closed_tickets': 1,
+                'close_seconds': int((self.last_changes - self.creation_date).total_seconds()),
+            }))
+        SupportRollup.apply_deltas(events)
+
+    def get_unanswered_question_date(self, values=None):
+        """
+            Returns the question date which is waiting for an answer (counted in the owner's unanswered_since)
+            or None. values - tracked fields values to check instead of the current ones.
+        """
+
+        values = values or {}
+        if values.get('is_answered', self.is_answered):
+            return None
+        return values.get('user_question_date', self.user_question_date)
+
+    def update_owner_fields(self, adding=False):
+        """
+            Applies the owner's fields deltas according to the tracked fields changes:
+            opened tickets and the question date (e.g. is_answered changed by the admin).
+            Reassignment of a ticket is a rare case, both users are recounted completely.
+        """
+
+        tracked_values = {} if adding else getattr(self, 'tracked_values', {})
+        old_owner_id = tracked_values.get('opened_by_id', self.opened_by_id)
+        if not adding and old_owner_id != self.opened_by_id:
+            for user in AppUser.objects.filter(id__in=[old_owner_id, self.opened_by_id]):
+                user.update_user_fields()
+        else:
+            owner_deltas = {'opened_tickets': 0}
+            if adding:
+                owner_deltas['opened_tickets'] = 0 if self.is_closed else 1
+            elif tracked_values.get('is_closed', self.is_closed) != self.is_closed:
+                owner_deltas['opened_tickets'] = -1 if self.is_closed else 1
+            old_question_date = None if adding else self.get_unanswered_question_date(tracked_values)
+            new_question_date = self.get_unanswered_question_date()
+            if old_question_date != new_question_date:
+                owner_deltas['new_question_date'] = new_question_date
+                owner_deltas['dropped_question_date'] = old_question_date
+            AppUser.apply_fields_deltas({self.opened_by_id: owner_deltas})
+        self.remember_tracked_fields()
 
     def delete(self, *args, **kwargs):
         """
-            After calling the default method, edits and saves the dependent User fields.
+            After calling the default method, applies the dependent User fields deltas:
+            messages of every author and opened tickets/question date of the owner.
+            The ticket leaves the backlog of the support rollups (other metrics are history).
         """
 
-        user = self.opened_by
+        users_deltas = {
+            item['linked_user']: {'messages': -item['messages']}
+            for item in self.messages.order_by().values('linked_user').annotate(messages=Count('id'))
+        }
+        owner_deltas = users_deltas.setdefault(self.opened_by_id, {})
+        owner_deltas['opened_tickets'] = 0 if self.is_closed else -1
+        owner_deltas['dropped_question_date'] = self.user_question_date
+        was_in_backlog = self.is_in_backlog()
         res = super().delete(*args, **kwargs)
-        user.update_user_fields()  # dont forget to update_user_fields
+        response_cache.invalidate('tickets')
+        AppUser.apply_fields_deltas(users_deltas)  # dont forget to update user fields
+        if was_in_backlog:
+            SupportRollup.apply_deltas([(timezone.now(), self.ticket_theme, None, {'backlog_delta': -1})])
         return res
 
-    def update_related_ticket_fields(self, message_obj=None):
+    def update_related_ticket_fields(self, message_obj=None, new_messages=None):
         """
             This method will mostly called when some Message objects created/deleted.
-            Recalculates related ticket fields:
-                - was current ticket answered after some changes
+            Updates related ticket fields (was current ticket answered after some changes)
+            and the dependent User fields and support rollups.
+            A new message (message_obj) or a batch of new_messages is applied as a delta,
+            the ticket state is derived from the last new message.
+            Otherwise ticket fields are recalculated by the last message.
         """
 
-        qrst = self.messages.all().order_by('-id')
-        self.messages_count = qrst.count()
-
         if message_obj:
-            if message_obj.linked_user.id == self.opened_by.id:
-                self.user_question_date = timezone.now()
+            new_messages = [message_obj]
+        dropped_question_date = self.user_question_date
+        was_in_backlog = self.is_in_backlog()
+        had_answerer = self.answerer_id is not None
+        updates = {}
+        if new_messages:
+            updates['messages_count'] = F('messages_count') + len(new_messages)
+            self.messages_count += len(new_messages)
+            answerers_ids = [msg.linked_user_id for msg in new_messages if msg.linked_user_id != self.opened_by_id]
+            if answerers_ids:
+                self.answerer_id = answerers_ids[-1]
+            last_message = new_messages[-1]
+            if last_message.linked_user_id == self.opened_by_id:
+                self.user_question_date = last_message.creation_date
                 self.is_answered = False
             else:
                 self.is_answered = True
-                self.answerer_id = message_obj.linked_user.id
                 self.user_question_date = None
         else:
             # the case when there were frauds with the deletion of messages
+            qrst = self.messages.all().order_by('-id')
+            self.messages_count = qrst.count()
+            updates['messages_count'] = self.messages_count
             if self.messages_count == 0:
                 self.is_answered = False
                 self.user_question_date = None
                 self.answerer_id = None
             else:
                 # rare situations below. Mostly administration (tester's) jokes
-                answerers_messages = qrst.exclude(id=self.opened_by.id)
+                answerers_messages = qrst.exclude(linked_user=self.opened_by_id)
                 if answerers_messages:
-                    self.answerer_id = answerers_messages[0].id
+                    self.answerer_id = answerers_messages[0].linked_user_id
                 else:
                     self.answerer_id = None
 
                 last_message = qrst[0]
-                if last_message.linked_user.id == self.opened_by.id:
+                if last_message.linked_user_id == self.opened_by_id:
                     self.is_answered = False
                     self.user_question_date = last_message.creation_date
                 else:
                     self.is_answered = True
                     self.user_question_date = None
 
-        self.save()
+        self.last_changes = timezone.now()
+        Ticket.objects.filter(id=self.id).update(
+            is_answered=self.is_answered,
+            answerer_id=self.answerer_id,
+            user_question_date=self.user_question_date,
+            last_changes=self.last_changes,
+            **updates,
+        )
+        response_cache.invalidate('tickets')
+
+        users_deltas = {self.opened_by_id: {
+            'new_question_date': self.user_question_date,
+            'dropped_question_date': dropped_question_date,
+        }}
+        for message in new_messages or []:
+            author_deltas = users_deltas.setdefault(message.linked_user_id, {})
+            author_deltas['messages'] = author_deltas.get('messages', 0) + 1
+        AppUser.apply_fields_deltas(users_deltas)
+
+        events = self.get_backlog_events(was_in_backlog, self.ticket_theme, self.last_changes)
+        events.extend(self.get_answers_events(new_messages or [], not had_answerer))
+        SupportRollup.apply_deltas(events)
+        self.remember_tracked_fields(['is_answered', 'user_question_date'])
 
 
 class Message(models.Model):
@@ -271,25 +661,38 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            # messages of a ticket in order (messages list, prefetch, chunked deletion)
+            models.Index(fields=['linked_ticket', 'id'], name='message_ticket_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         """
             After calling the default method, edits and saves the dependent Ticket fields.
+            Only a new message changes the ticket state, an edited one just touches last_changes.
         """
 
-        res = super().save(*args, **kwargs)  # call the actual save method
-        self.linked_ticket.update_related_ticket_fields(message_obj=self)
+        adding = self._state.adding
+        with transaction.atomic(savepoint=False):
+            res = super().save(*args, **kwargs)  # call the actual save method
+            if adding:
+                self.linked_ticket.update_related_ticket_fields(message_obj=self)
+            else:
+                Ticket.objects.filter(id=self.linked_ticket_id).update(last_changes=timezone.now())
+                response_cache.invalidate('tickets')
         return res
 
     def delete(self, *args, **kwargs):
         """
-            After calling the default method, edits and saves the dependent Ticket fields.
+            After calling the default method, edits and saves the dependent Ticket and User fields.
         """
 
         ticket = self.linked_ticket
-        res = super().delete(*args, **kwargs)
-        if ticket:  # If ticket was deleted?
-            ticket.update_related_ticket_fields()
+        with transaction.atomic(savepoint=False):
+            res = super().delete(*args, **kwargs)
+            AppUser.apply_fields_deltas({self.linked_user_id: {'messages': -1}})
+            if ticket:  # If ticket was deleted?
+                ticket.update_related_ticket_fields()
         return res
 
     def __str__(self):
@@ -298,3 +701,103 @@ class Message(models.Model):
             f' (written_by={self.linked_user.username})'
             f' body= {self.body[:40]}'
         )
+
+
+class SupportRollup(models.Model):
+    """
+        Support metrics of an hour or a day (bucket) for a ticket theme and an agent (agent_id=0 - no agent).
+        Rows are changed by deltas from the tickets and messages hooks (see apply_deltas),
+        so the stats are read without scanning tickets and messages.
+    """
+
+    PERIODS = ('hour', 'day')
+
+    period = models.CharField(max_length=4, choices=[(period, period) for period in PERIODS])
+    bucket = models.DateTimeField()  # start of the hour or the day (UTC)
+    ticket_theme = models.CharField(max_length=255, choices=models_const.TICKET_THEMES)
+    agent_id = models.PositiveIntegerField(default=0)  # answerer or closed_by_id, not a foreign key (history)
+    opened_tickets = models.IntegerField(default=0)
+    closed_tickets = models.IntegerField(default=0)
+    close_seconds = models.BigIntegerField(default=0)  # sum of the ticket lifetimes at closing
+    first_responses = models.IntegerField(default=0)
+    first_response_seconds = models.BigIntegerField(default=0)  # sum of the waits for the first answer
+    answers = models.IntegerField(default=0)  # messages of the agents
+    backlog_delta = models.IntegerField(default=0)  # change of the open tickets waiting for an answer
+    # backlog at the start of the day (daily rows without agent), see services/stats.snapshot_backlog()
+    backlog_start = models.IntegerField(blank=True, null=True)
+
+    # maintained by deltas only
+    counter_fields = [
+        'opened_tickets', 'closed_tickets', 'close_seconds',
+        'first_responses', 'first_response_seconds', 'answers', 'backlog_delta',
+    ]
+
+    class Meta:
+        ordering = ['period', 'bucket', 'ticket_theme', 'agent_id']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'bucket', 'ticket_theme', 'agent_id'], name='rollup_key'),
+        ]
+        indexes = [
+            # the latest backlog snapshot of a theme (see services/stats.get_backlog)
+            models.Index(
+                fields=['ticket_theme', 'bucket'],
+                condition=Q(backlog_start__isnull=False),
+                name='rollup_backlog_snapshot_idx',
+            ),
+        ]
+
+    @staticmethod
+    def get_bucket(moment, period):
+        """
+            Returns the start of the hour or the day (UTC) of the moment.
+        """
+
+        bucket = moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        return bucket.replace(hour=0) if period == 'day' else bucket
+
+    @classmethod
+    def apply_deltas(cls, events):
+        """
+            Adds the events to the hourly and daily rows with one INSERT ... ON CONFLICT DO UPDATE
+            (atomic increments, missing rows are created).
+            events: [(moment [datetime], ticket_theme [str], agent_id [int or None], {counter field: delta})]
+            Returns count of changed rows.
+        """
+
+        rows = {}
+        for moment, ticket_theme, agent_id, deltas in events:
+            deltas = {name: value for name, value in deltas.items() if value}
+            if not deltas:
+                continue
+            for period in cls.PERIODS:
+                key = (period, cls.get_bucket(moment, period), ticket_theme, agent_id or 0)
+                row = rows.setdefault(key, dict.fromkeys(cls.counter_fields, 0))
+                for name, value in deltas.items():
+                    row[name] += value
+        rows = {key: row for key, row in rows.items() if any(row.values())}  # e.g. -1 and +1 of the backlog
+        if not rows:
+            return 0
+
+        connection = transaction.get_connection()
+        quote = connection.ops.quote_name
+        key_fields = ['period', 'bucket', 'ticket_theme', 'agent_id']
+        columns = ', '.join(quote(name) for name in key_fields + cls.counter_fields)
+        placeholders = ', '.join(['%s'] * (len(key_fields) + len(cls.counter_fields)))
+        updates = ', '.join(
+            f'{quote(name)} = {quote(cls._meta.db_table)}.{quote(name)} + excluded.{quote(name)}'
+            for name in cls.counter_fields
+        )
+        bucket_field = cls._meta.get_field('bucket')
+        params = []
+        for key in sorted(rows):  # the same order of the row locks in all transactions
+            period, bucket, ticket_theme, agent_id = key
+            params.extend([period, bucket_field.get_db_prep_value(bucket, connection), ticket_theme, agent_id])
+            params.extend(rows[key][name] for name in cls.counter_fields)
+        sql = (
+            f'INSERT INTO {quote(cls._meta.db_table)} ({columns}) VALUES '
+            + ', '.join([f'({placeholders})'] * len(rows))
+            + f' ON CONFLICT ({", ".join(quote(name) for name in key_fields)}) DO UPDATE SET {updates}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+        return len(rows)
@@ -0,0 +1,14 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+        Plain compact JSON for internal clients: the data as it is, without JSON:API resource objects
+        (no per-field reflection of rest_framework_json_api.renderers.JSONRenderer).
+        Selected with '?format=json' (or '.json' suffix) or 'Accept: application/json'.
+        Encoded by the C accelerated encoder of the json module (compact separators, no indent).
+    """
+
+    media_type = 'application/json'
+    format = 'json'
+    compact = True
@@ -1,17 +1,78 @@
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from app_support import serializers_fields
-from app_support.models import Message, Ticket
+from app_support.models import Message, SupportRollup, Ticket
 from app_support.models_const import TICKET_THEMES
-from app_support.serializers_mixins import SerializerAdditionalMethodsMixin
-from app_support.services.generalized_funcs import find_a_match, merged
+from app_support.serializers_mixins import (FragmentCacheMixin,
+                                            SerializerAdditionalMethodsMixin)
+from app_support.services import (exports, messages_posting, request_cache,
+                                  stats)
+from app_support.services.generalized_funcs import (accurate_string_seconds,
+                                                    find_a_match, merged)
 
 User = get_user_model()
 
 
+class ProjectionRow(dict):
+    """
+        values() row with the primary key attribute, as a model instance has (used by the JSON:API renderer).
+    """
+
+    @property
+    def pk(self):
+        return self['id']
+
+
+class ProjectionListSerializer(serializers.ListSerializer):
+    """
+        Read-only representation of values() rows for the basic list modes: no model instances,
+        no fields machinery per row.
+        The child serializer declares projection_fields (the loaded columns, list orderings included)
+        and represent_rows(rows, now), which makes all representations in one pass.
+    """
+
+    def __init__(self, instance=None, *args, **kwargs):
+        if instance is not None:
+            instance = [ProjectionRow(row) for row in instance]
+        super().__init__(instance, *args, **kwargs)
+
+    def to_representation(self, data):
+        return self.child.represent_rows(data, timezone.now())
+
+
+class BulkMessageListSerializer(serializers.ListSerializer):
+    """
+        Creates a batch of messages at once (JSON array of messages in a request).
+    """
+
+    def validate(self, attrs):
+        """
+            Checks the size of the batch.
+        """
+
+        max_size = settings.APP_SUPPORT_DEFAULTS['MESSAGES_BATCH_MAX_SIZE']
+        if not attrs:
+            raise serializers.ValidationError('The list of messages can not be empty.')
+        if len(attrs) > max_size:
+            raise serializers.ValidationError(f'Too many messages in one request (max {max_size}).')
+        return attrs
+
+    def create(self, validated_data):
+        """
+            Сreates all MESSAGES with one insert, related fields are recalculated once per batch.
+        """
+
+        user_obj = self.context.get('request', None).user
+        ticket_obj = self.child.get_linked_ticket()
+        return messages_posting.post_messages(ticket_obj, user_obj, [item['body'] for item in validated_data])
+
+
 class BasicMessageSerializer(serializers.ModelSerializer, SerializerAdditionalMethodsMixin):
     written_by = serializers.CharField(source='linked_user.get_screen_name', read_only=True)
     creation_date = serializers_fields.SerializerMethodKwargsField(
@@ -28,6 +89,7 @@ class BasicMessageSerializer(serializers.ModelSerializer, SerializerAdditionalMe
             'creation_date',
             'message'
         ]
+        list_serializer_class = BulkMessageListSerializer
 
     def create(self, validated_data):
         """
@@ -35,18 +97,27 @@ class BasicMessageSerializer(serializers.ModelSerializer, SerializerAdditionalMe
         """
 
         user_obj = self.context.get('request', None).user
+        ticket_obj = self.get_linked_ticket()
+        return messages_posting.post_message(ticket_obj, user_obj, validated_data['body'])
+
+    def get_linked_ticket(self):
+        """
+            Returns a ticket, which id was given in the serializer context
+            (mostly already loaded by IsItemOwnerOrSupportPlus).
+        """
+
         ticket_number = self.context.get('ticket_id', None)
-        ticket_obj = Ticket.objects.get(id=ticket_number)
-        validated_data['linked_ticket'] = ticket_obj
-        validated_data['linked_user'] = user_obj
-        return super().create(validated_data)
+        return request_cache.get_object(self.context.get('request', None), Ticket.objects.all(), ticket_number)
 
 
-class BasicTicketSerializer(serializers.ModelSerializer, SerializerAdditionalMethodsMixin):
+class BasicTicketSerializer(FragmentCacheMixin, serializers.ModelSerializer, SerializerAdditionalMethodsMixin):
     """
         Contains the most necessary fields and methods for processing the Ticket instance.
+        Representations of unchanged tickets are reused (FragmentCacheMixin).
     """
 
+    volatile_fields = ['no_response_time']
+
     message = serializers.CharField(write_only=True, default='')
     ticket_theme = serializers_fields.AppChoiceField(choices=TICKET_THEMES)
     is_closed = serializers.BooleanField(default=False)
@@ -74,18 +145,24 @@ class BasicTicketSerializer(serializers.ModelSerializer, SerializerAdditionalMet
         validated_data['opened_by'] = user
         if validated_data.get('is_closed', None):
             validated_data['closed_by_id'] = user.id
-        instance = super().create(validated_data)
-        Message.objects.create(linked_ticket=instance, linked_user=user, body=validated_data['message'])
+        message_data = validated_data.pop('message')
+        with transaction.atomic():
+            instance = super().create(validated_data)
+            messages_posting.post_message(instance, user, message_data)
         return instance
 
     def update(self, instance, validated_data):
         """
-            Custom updating with message field involved and closed_by_id field processing
+            Custom updating with message field involved and closed_by_id field processing.
+            The ticket is locked (and its state re-read) for the whole update,
+            so save() does not write a stale answered state over the posted message.
         """
 
-        self.process_closed_by_id_data(instance, validated_data)
-        self.process_message_field(instance, validated_data)
-        return super().update(instance, validated_data)
+        with transaction.atomic():
+            messages_posting.lock_ticket(instance)
+            self.process_closed_by_id_data(instance, validated_data)
+            self.process_message_field(instance, validated_data)
+            return super().update(instance, validated_data)
 
     def process_closed_by_id_data(self, instance, validated_data):
         """
@@ -108,11 +185,7 @@ class BasicTicketSerializer(serializers.ModelSerializer, SerializerAdditionalMet
 
         message_data = validated_data.get('message', '')
         if message_data != '':
-            Message.objects.create(
-                linked_ticket=instance,
-                linked_user=self.context.get('request', None).user,
-                body=validated_data['message']
-            )
+            messages_posting.post_message(instance, self.context.get('request', None).user, message_data)
 
     def validate_ticket_theme(self, data):
         """
@@ -123,7 +196,7 @@ class BasicTicketSerializer(serializers.ModelSerializer, SerializerAdditionalMet
         new_data = find_a_match(
             subject=data,
             collection=TICKET_THEMES,
-            default=TICKET_THEMES[-1][0],
+            default_choice=TICKET_THEMES[-1][0],
         )
         return new_data
 
@@ -141,6 +214,98 @@ class BasicTicketSerializer(serializers.ModelSerializer, SerializerAdditionalMet
         return message_data
 
 
+class BasicTicketProjectionSerializer(BasicTicketSerializer):
+    """
+        BasicTicketSerializer for the lists of values() rows (see ProjectionListSerializer).
+        A single ticket (e.g. created one) is represented by BasicTicketSerializer.
+    """
+
+    projection_fields = ['id', 'ticket_theme', 'is_closed', 'is_answered', 'user_question_date']
+
+    class Meta(BasicTicketSerializer.Meta):
+        list_serializer_class = ProjectionListSerializer
+
+    def represent_rows(self, rows, now):
+        """
+            The same representations as BasicTicketSerializer makes (no_response_time - Ticket.not_answered_time).
+        """
+
+        theme_field = self.fields['ticket_theme']
+        return [
+            {
+                'id': row['id'],
+                'ticket_theme': theme_field.to_representation(row['ticket_theme']),
+                'is_closed': row['is_closed'],
+                'no_response_time': accurate_string_seconds(
+                    int((now - row['user_question_date']).total_seconds())
+                    if not row['is_answered'] and row['user_question_date'] else 0
+                ),
+            }
+            for row in rows
+        ]
+
+
+class BulkTicketStatusSerializer(serializers.Serializer):
+    """
+        Validates data of the tickets bulk status update (PATCH on tickets list).
+    """
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False)
+    is_closed = serializers.BooleanField(required=False)
+    is_frozen = serializers.BooleanField(required=False)
+
+    def validate(self, attrs):
+        """
+            At least one of the status fields must be entered.
+        """
+
+        if 'is_closed' not in attrs and 'is_frozen' not in attrs:
+            raise serializers.ValidationError('<is_closed> or <is_frozen> field must be entered.')
+        return attrs
+
+
+class ExportSerializer(serializers.Serializer):
+    """
+        Validates parameters of the tickets export (POST on exports).
+    """
+
+    format = serializers.ChoiceField(choices=exports.EXPORT_FORMATS, default='ndjson')
+    compress = serializers.BooleanField(default=False)
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+    user_id = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        if 'date_from' in attrs and 'date_to' in attrs and attrs['date_from'] >= attrs['date_to']:
+            raise serializers.ValidationError('<date_from> must be earlier than <date_to>.')
+        return attrs
+
+
+class StatsSerializer(serializers.Serializer):
+    """
+        Validates parameters of the support stats (GET on stats).
+        Without the range the last STATS_DEFAULT_BUCKETS buckets are given.
+    """
+
+    period = serializers.ChoiceField(choices=SupportRollup.PERIODS, default='day')
+    group_by = serializers.ChoiceField(choices=list(stats.GROUP_FIELDS), default='theme')
+    date_from = serializers.DateTimeField(required=False)
+    date_to = serializers.DateTimeField(required=False)
+
+    def validate(self, attrs):
+        app_settings = settings.APP_SUPPORT_DEFAULTS
+        period_length = stats.PERIOD_LENGTHS[attrs['period']]
+        attrs.setdefault('date_to', timezone.now())
+        attrs.setdefault('date_from', attrs['date_to'] - period_length * app_settings['STATS_DEFAULT_BUCKETS'])
+        if attrs['date_from'] >= attrs['date_to']:
+            raise serializers.ValidationError('<date_from> must be earlier than <date_to>.')
+        if attrs['date_to'] - attrs['date_from'] > period_length * app_settings['STATS_MAX_BUCKETS']:
+            raise serializers.ValidationError(
+                f'The range can not be longer than {app_settings["STATS_MAX_BUCKETS"]} buckets of the period.'
+            )
+        return attrs
+
+
 class DefaultTicketSerializer(BasicTicketSerializer):
     """
         Contains more fields than BasicTicketSerializer
@@ -158,6 +323,8 @@ class DefaultTicketSerializer(BasicTicketSerializer):
     )
     is_answered = serializers.BooleanField(read_only=True)
 
+    fragment_version_fields = ['last_changes', 'opened_by.last_changes']  # screen_name of the owner
+
     class Meta(BasicTicketSerializer.Meta):
         fields = merged(BasicTicketSerializer.Meta.fields, [
             'opened_by_id',
@@ -195,11 +362,16 @@ class FullTicketSerializer(ExpandedTicketSerializer):
         Contains all Ticket fields (mandatory and optional).
     """
 
+    # claim fields are changed without last_changes
+    fragment_version_fields = ExpandedTicketSerializer.fragment_version_fields + ['claimed_by_id', 'claimed_until']
+
     class Meta:
         model = Ticket
         # repeated for ordering (messages at the end)
         fields = merged(ExpandedTicketSerializer.Meta.fields, [
             'closed_by_id',
+            'claimed_by_id',
+            'claimed_until',
             'messages'
             ]
         )
@@ -239,11 +411,14 @@ class BaseUserSerializer(serializers.ModelSerializer, SerializerAdditionalMethod
         return make_password(password_data)
 
 
-class BasicUserListSerializer(BaseUserSerializer):
+class BasicUserListSerializer(FragmentCacheMixin, BaseUserSerializer):
     """
         Serializes the User model. Designed to view the list of Users.
+        Representations of unchanged users are reused (FragmentCacheMixin).
     """
 
+    volatile_fields = ['max_no_response_time']
+
     screen_name = serializers.CharField(source='get_screen_name', read_only=True)
     max_no_response_time = serializers_fields.SerializerMethodKwargsField(
         method_name='readable_time_seconds',
@@ -261,6 +436,40 @@ class BasicUserListSerializer(BaseUserSerializer):
         )
 
 
+class BasicUserListProjectionSerializer(BasicUserListSerializer):
+    """
+        BasicUserListSerializer for the lists of values() rows (see ProjectionListSerializer).
+    """
+
+    projection_fields = [
+        'id', 'username', 'screen_name', 'hide_private_info', 'is_staff', 'is_support',
+        'unanswered_since', 'opened_tickets_count', 'date_joined',
+    ]
+
+    class Meta(BasicUserListSerializer.Meta):
+        list_serializer_class = ProjectionListSerializer
+
+    def represent_rows(self, rows, now):
+        """
+            The same representations as BasicUserListSerializer makes
+            (max_no_response_time - AppUser.max_not_answered_seconds).
+        """
+
+        return [
+            {
+                'screen_name': User.build_screen_name(
+                    row['id'], row['username'], row['screen_name'], row['hide_private_info'],
+                    row['is_staff'], row['is_support'],
+                ),
+                'max_no_response_time': accurate_string_seconds(
+                    round((now - row['unanswered_since']).total_seconds()) if row['unanswered_since'] else 0
+                ),
+                'opened_tickets_count': str(row['opened_tickets_count']),
+            }
+            for row in rows
+        ]
+
+
 class ExpandedUserListSerializer(BasicUserListSerializer):
     """
         Serializes the User model.
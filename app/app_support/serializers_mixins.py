@@ -1,3 +1,10 @@
+from collections import OrderedDict
+
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.serializers import BaseSerializer
+
+from app_support.services import fragment_cache
 from app_support.services.generalized_funcs import (accurate_string_datetime,
                                                     accurate_string_seconds)
 
@@ -31,3 +38,78 @@ class SerializerAdditionalMethodsMixin:
         """
         for field in list_of_fields:
             representation.popitem(field)
+
+
+class FragmentCacheMixin:
+    """
+        Reuses the representation of an unchanged object (see services/fragment_cache.py).
+        Must be the first base class of the serializer (overrides to_representation).
+        Key: (serializer class (mode), object pk, values of fragment_version_fields).
+        Version fields may be dotted ('opened_by.last_changes'), if any of them is not loaded
+        (deferred field or not selected relation) the object is serialized without the cache.
+        Time-dependent volatile_fields and nested serializers are not cached, they are computed every time
+        (nested serializers can use their own fragments).
+    """
+
+    fragment_version_fields = ['last_changes']
+    volatile_fields = []
+
+    def get_fragment_version(self, instance):
+        """
+            Returns a tuple of version fields values or None (if some value is not loaded yet).
+        """
+
+        version = []
+        for path in self.fragment_version_fields:
+            value = instance
+            for name in path.split('.'):
+                field = value._meta.get_field(name)
+                if field.is_relation:
+                    if not field.is_cached(value):
+                        return None
+                elif field.attname in value.get_deferred_fields():
+                    return None
+                value = getattr(value, name)
+            version.append(value)
+        return tuple(version)
+
+    def is_fragment_field(self, field):
+        return field.field_name not in self.volatile_fields and not isinstance(field, BaseSerializer)
+
+    def to_field_representation(self, field, instance):
+        """
+            The same as Serializer.to_representation() does for a field, can raise SkipField.
+        """
+
+        attribute = field.get_attribute(instance)
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        if check_for_none is None:
+            return None
+        return field.to_representation(attribute)
+
+    def to_representation(self, instance):
+        version = None if getattr(instance, 'pk', None) is None else self.get_fragment_version(instance)
+        if version is None:
+            return super().to_representation(instance)
+
+        key = (self.__class__, instance.pk, version)
+        fragment = fragment_cache.get_fragment(key)
+        if fragment is None:
+            representation = super().to_representation(instance)
+            fields = self._readable_fields
+            fragment_names = [field.field_name for field in fields if self.is_fragment_field(field)]
+            fragment_cache.set_fragment(key, {
+                name: representation[name] for name in fragment_names if name in representation
+            })
+            return representation
+
+        representation = OrderedDict()
+        for field in self._readable_fields:
+            if field.field_name in fragment:
+                representation[field.field_name] = fragment[field.field_name]
+            elif not self.is_fragment_field(field):
+                try:
+                    representation[field.field_name] = self.to_field_representation(field, instance)
+                except SkipField:
+                    continue
+        return representation
@@ -0,0 +1,115 @@
+"""
+    Token claims of the stateless authentication (see app_support.authentication).
+    Role flags and the user's auth version are embedded in the tokens at 'obtainjwt/'.
+    The version is kept in Redis and bumped when the user's roles, password or activity are changed
+    (or the user is deleted), so the tokens issued before are not accepted any more.
+    Verified tokens are kept by every process for VERIFIED_TOKENS_TTL seconds (signature is not checked again).
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from app_support.services.redis_storage import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+ROLE_CLAIMS = ['is_superuser', 'is_staff', 'is_support']
+VERSION_CLAIM = 'auth_version'
+# verified tokens kept by every process
+VERIFIED_TOKENS_MAX_SIZE = 10000
+
+_verified_tokens = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_version_key(user_id):
+    return f'{settings.APP_SUPPORT_DEFAULTS["AUTH_VERSIONS_PREFIX"]}:{user_id}'
+
+
+def get_version(user_id):
+    """
+        Returns [int] auth version of the user. Can raise redis.RedisError.
+    """
+
+    return int(get_redis_connection().get(get_version_key(user_id)) or 0)
+
+
+def increment_version(user_id):
+    try:
+        get_redis_connection().incr(get_version_key(user_id))
+    except redis.RedisError as error:
+        logger.error('auth version of the user %s is not bumped: %s', user_id, error)
+
+
+def bump_version(user_id):
+    """
+        Makes all issued tokens of the user invalid after the commit of the current transaction
+        (tokens issued before the commit keep the old roles, they must not get the new version).
+    """
+
+    transaction.on_commit(lambda: increment_version(user_id))
+
+
+def add_claims(token, user):
+    """
+        Adds role flags and the auth version to the token (a refresh token passes them to access tokens).
+        If Redis is not available, the token is left without claims (the user is loaded from the database).
+    """
+
+    try:
+        version = get_version(user.id)
+    except redis.RedisError as error:
+        logger.warning('auth version is not available, token without claims: %s', error)
+        return token
+    for name in ROLE_CLAIMS:
+        token[name] = getattr(user, name)
+    token[VERSION_CLAIM] = version
+    return token
+
+
+def has_claims(token):
+    return all(name in token for name in ROLE_CLAIMS + [VERSION_CLAIM])
+
+
+def get_verified_token(raw_token):
+    """
+        Returns a cached validated token or None.
+    """
+
+    with _lock:
+        cached = _verified_tokens.get(raw_token)
+        if cached is None:
+            return None
+        token, cached_until = cached
+        if cached_until < time.time():
+            del _verified_tokens[raw_token]
+            return None
+        _verified_tokens.move_to_end(raw_token)
+        return token
+
+
+def set_verified_token(raw_token, token):
+    """
+        Caches the validated token, but not longer than it is valid.
+    """
+
+    ttl = settings.APP_SUPPORT_DEFAULTS['VERIFIED_TOKENS_TTL']
+    if not ttl:
+        return
+    cached_until = min(time.time() + ttl, token['exp'])
+    with _lock:
+        _verified_tokens[raw_token] = (token, cached_until)
+        _verified_tokens.move_to_end(raw_token)
+        while len(_verified_tokens) > VERIFIED_TOKENS_MAX_SIZE:
+            _verified_tokens.popitem(last=False)
+
+
+def clear_verified_tokens():
+    with _lock:
+        _verified_tokens.clear()
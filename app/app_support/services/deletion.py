@@ -0,0 +1,76 @@
+"""
+    Deletion pipeline for the background tasks.
+    Big objects are removed in bounded chunks, every chunk is a short transaction.
+"""
+
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from app_support.models import AppUser, Message, Ticket
+from app_support.services import response_cache
+
+
+def delete_ticket(ticket_id, chunk_size=None, on_progress=None):
+    """[Summary]
+        Deletes ticket messages chunk by chunk (one DELETE + one UPDATE of authors fields per chunk),
+        then deletes the ticket itself and updates the owner fields once.
+        Args:
+            ticket_id ([int])
+            chunk_size ([int]): messages per chunk, DELETION_CHUNK_SIZE by default
+            on_progress ([callable]): called with (deleted, total) after every chunk
+        Returns:
+            [bool]: whether the ticket was found and deleted
+    """
+
+    chunk_size = chunk_size or settings.APP_SUPPORT_DEFAULTS['DELETION_CHUNK_SIZE']
+    ticket = Ticket.objects.filter(id=ticket_id).first()
+    if ticket is None:
+        return False
+
+    total = ticket.messages_count
+    deleted = 0
+    messages = Message.objects.filter(linked_ticket_id=ticket_id).order_by('id')
+    while True:
+        chunk = list(messages.values_list('id', 'linked_user_id')[:chunk_size])
+        if not chunk:
+            break
+        with transaction.atomic():
+            Message.objects.filter(id__in=[message_id for message_id, _ in chunk]).delete()
+            response_cache.invalidate('tickets')
+            authors_counts = Counter(user_id for _, user_id in chunk)
+            AppUser.apply_fields_deltas({
+                user_id: {'messages': -count} for user_id, count in authors_counts.items()
+            })
+        deleted += len(chunk)
+        if on_progress:
+            on_progress(deleted, max(total, deleted))
+
+    with transaction.atomic():
+        ticket.delete()  # no messages left, only the owner fields are changed
+    return True
+
+
+def delete_message(message_id):
+    """
+        Deletes a message. Returns [bool]: whether the message was found and deleted.
+    """
+
+    message = Message.objects.filter(id=message_id).first()
+    if message is None:
+        return False
+    message.delete()
+    return True
+
+
+def delete_user(user_id):
+    """
+        Deletes a user. Returns [bool]: whether the user was found and deleted.
+    """
+
+    user = AppUser.objects.filter(id=user_id).first()
+    if user is None:
+        return False
+    user.delete()
+    return True
@@ -0,0 +1,64 @@
+"""
+    Deferred (coalesced) recalculation of the users fields.
+    Changes only mark user ids as dirty in a Redis set,
+    the periodic Celery task drains the set and recounts every user once.
+    If Redis is not available, the users are recounted at once.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from app_support.services.redis_storage import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+def is_deferred_mode():
+    """
+        Returns [bool]: whether the users fields are recalculated in background.
+    """
+
+    return settings.APP_SUPPORT_DEFAULTS['DEFERRED_USER_FIELDS']
+
+
+def mark_users_dirty(users_ids):
+    """
+        Adds users ids to the dirty set after the current transaction is committed
+        (so the task never recounts uncommitted data).
+    """
+
+    users_ids = [int(user_id) for user_id in users_ids if user_id is not None]
+    if users_ids:
+        key = settings.APP_SUPPORT_DEFAULTS['DIRTY_USERS_KEY']
+        transaction.on_commit(lambda: add_dirty_users(key, users_ids))
+
+
+def add_dirty_users(key, users_ids):
+    """
+        Adds users ids to the dirty set, recounts the users synchronously if Redis is not available.
+    """
+
+    try:
+        get_redis_connection().sadd(key, *users_ids)
+    except redis.RedisError as error:
+        logger.error('dirty users %s are recounted at once: %s', users_ids, error)
+        for user in get_user_model().objects.filter(id__in=users_ids):
+            user.update_user_fields()
+
+
+def pop_dirty_users():
+    """
+        Atomically drains the dirty set.
+        Returns [list] of users ids.
+    """
+
+    key = settings.APP_SUPPORT_DEFAULTS['DIRTY_USERS_KEY']
+    pipeline = get_redis_connection().pipeline(transaction=True)
+    pipeline.smembers(key)
+    pipeline.delete(key)
+    members, _ = pipeline.execute()
+    return [int(user_id) for user_id in members]
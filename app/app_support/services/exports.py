@@ -0,0 +1,140 @@
+"""
+    Bulk exports of tickets with messages (run by the celery task, never inside a request).
+    Tickets and messages are read in primary-key chunks, every chunk is a few short queries
+    (no long transaction), rows are written to a file in EXPORTS_DIR.
+    The file is written under a temporary name and renamed when the export is finished.
+"""
+
+import csv
+import gzip
+import json
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app_support.models import Message, Ticket
+
+EXPORT_FORMATS = ['ndjson', 'csv']
+
+TICKET_COLUMNS = [
+    'id', 'ticket_theme', 'opened_by_id', 'creation_date', 'is_closed', 'is_frozen',
+    'is_answered', 'answerer_id', 'closed_by_id', 'messages_count',
+]
+MESSAGE_COLUMNS = ['id', 'linked_user_id', 'creation_date', 'body']
+# csv: one row per message, ticket columns are repeated, a ticket without messages gives one row
+CSV_HEADER = [f'ticket_{name}' for name in TICKET_COLUMNS] + [f'message_{name}' for name in MESSAGE_COLUMNS]
+
+
+def get_exports_dir():
+    return Path(settings.APP_SUPPORT_DEFAULTS['EXPORTS_DIR'])
+
+
+def get_export_filename(export_id, export_format, compress):
+    return f'{export_id}.{export_format}{".gz" if compress else ""}'
+
+
+def get_tickets_queryset(date_from=None, date_to=None, user_id=None):
+    """
+        Returns queryset of the exported tickets (creation_date range and/or owner).
+    """
+
+    queryset = Ticket.objects.all()
+    if date_from is not None:
+        queryset = queryset.filter(creation_date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(creation_date__lt=date_to)
+    if user_id is not None:
+        queryset = queryset.filter(opened_by_id=user_id)
+    return queryset
+
+
+def iterate_chunks(queryset, chunk_size):
+    """
+        Yields lists of tickets rows (dicts) with 'messages' lists, chunk by chunk (id > last id).
+    """
+
+    queryset = queryset.order_by('id').values(*TICKET_COLUMNS)
+    last_id = 0
+    while True:
+        tickets = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not tickets:
+            return
+        last_id = tickets[-1]['id']
+        tickets_by_id = {ticket['id']: {**ticket, 'messages': []} for ticket in tickets}
+        messages = Message.objects.filter(
+            linked_ticket_id__in=tickets_by_id.keys()
+        ).order_by('id').values('linked_ticket_id', *MESSAGE_COLUMNS)
+        for message in messages:
+            tickets_by_id[message.pop('linked_ticket_id')]['messages'].append(message)
+        yield list(tickets_by_id.values())
+
+
+def write_ndjson(file, tickets):
+    for ticket in tickets:
+        file.write(json.dumps(ticket, cls=DjangoJSONEncoder, ensure_ascii=False))
+        file.write('\n')
+
+
+def write_csv(writer, tickets):
+    for ticket in tickets:
+        ticket_row = [ticket[name] for name in TICKET_COLUMNS]
+        for message in ticket['messages'] or [{}]:
+            writer.writerow(ticket_row + [message.get(name) for name in MESSAGE_COLUMNS])
+
+
+def export_tickets(export_id, export_format='ndjson', compress=False, chunk_size=None, on_progress=None, **filters):
+    """[Summary]
+        Writes the tickets with messages to a file in EXPORTS_DIR.
+        NDJSON: one ticket (with 'messages' list) per line. CSV: one message per row.
+        Args:
+            export_id ([str]): name of the file (the task id)
+            export_format ([str]): one of EXPORT_FORMATS
+            compress ([bool]): gzip the file
+            chunk_size ([int]): tickets per chunk, EXPORT_CHUNK_SIZE by default
+            on_progress ([callable]): called with (exported, total) after every chunk
+            filters: date_from, date_to, user_id (see get_tickets_queryset)
+        Returns:
+            [dict]: file name, exported tickets and messages counts
+    """
+
+    chunk_size = chunk_size or settings.APP_SUPPORT_DEFAULTS['EXPORT_CHUNK_SIZE']
+    queryset = get_tickets_queryset(**filters)
+    total = queryset.count()
+    exports_dir = get_exports_dir()
+    exports_dir.mkdir(parents=True, exist_ok=True)
+    filename = get_export_filename(export_id, export_format, compress)
+    temp_path = exports_dir / f'{filename}.part'
+
+    exported_tickets = exported_messages = 0
+    opener = gzip.open if compress else open
+    try:
+        with opener(temp_path, 'wt', encoding='utf-8', newline='') as file:
+            writer = None
+            if export_format == 'csv':
+                writer = csv.writer(file)
+                writer.writerow(CSV_HEADER)
+            for tickets in iterate_chunks(queryset, chunk_size):
+                if writer:
+                    write_csv(writer, tickets)
+                else:
+                    write_ndjson(file, tickets)
+                exported_tickets += len(tickets)
+                exported_messages += sum(len(ticket['messages']) for ticket in tickets)
+                if on_progress:
+                    on_progress(exported_tickets, max(total, exported_tickets))
+        os.replace(temp_path, exports_dir / filename)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return {'file': filename, 'tickets': exported_tickets, 'messages': exported_messages}
+
+
+def get_export_path(filename):
+    """
+        Returns [Path] of the finished export file or None.
+    """
+
+    path = get_exports_dir() / Path(filename).name
+    return path if path.is_file() else None
@@ -0,0 +1,45 @@
+"""
+    Process-local LRU cache of serialized objects (fragments).
+    A key contains the object version (e.g. last_changes), so a changed object gets a new key
+    and old fragments are just pushed out, no invalidation is needed.
+"""
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+_fragments = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_fragment(key):
+    """
+        Returns a cached fragment [dict] or None.
+    """
+
+    with _lock:
+        fragment = _fragments.get(key)
+        if fragment is not None:
+            _fragments.move_to_end(key)
+        return fragment
+
+
+def set_fragment(key, fragment):
+    """
+        Saves the fragment, the least recently used ones are removed above FRAGMENT_CACHE_SIZE.
+    """
+
+    max_size = settings.APP_SUPPORT_DEFAULTS['FRAGMENT_CACHE_SIZE']
+    if not max_size:
+        return
+    with _lock:
+        _fragments[key] = fragment
+        _fragments.move_to_end(key)
+        while len(_fragments) > max_size:
+            _fragments.popitem(last=False)
+
+
+def clear():
+    with _lock:
+        _fragments.clear()
@@ -0,0 +1,69 @@
+"""
+    Message write path.
+    A message, the ticket state and the users fields are written in one transaction.
+    The ticket row is locked first: the new state and the users/rollups deltas are derived
+    from the current ticket state, concurrent posts to one ticket are applied one after another.
+"""
+
+from django.db import transaction
+
+from app_support.models import Message, Ticket
+
+# the ticket state used by Ticket.update_related_ticket_fields(), re-read under the lock
+TICKET_STATE_FIELDS = [
+    'opened_by_id', 'ticket_theme', 'is_closed', 'is_answered', 'answerer_id', 'user_question_date', 'messages_count',
+]
+
+
+def lock_ticket(ticket):
+    """
+        Locks the ticket row (SELECT ... FOR UPDATE) and refreshes the state fields of the loaded ticket.
+        Must be called inside an atomic block.
+    """
+
+    state = Ticket.objects.select_for_update().filter(id=ticket.id).values(*TICKET_STATE_FIELDS).get()
+    for name, value in state.items():
+        setattr(ticket, name, value)
+    ticket.remember_tracked_fields([name for name in ticket.tracked_fields if name in state])
+
+
+def post_message(ticket, user, body):
+    """[Summary]
+        Creates a new message in the ticket inside one atomic block.
+        Uses a fixed count of statements:
+            SELECT (lock) ticket, INSERT message, UPDATE ticket (state and messages_count),
+            UPDATE author and ticket owner fields (one statement for both).
+        Args:
+            ticket ([Ticket]): already loaded ticket
+            user ([AppUser]): author of the message
+            body ([str])
+        Returns:
+            [Message]
+    """
+
+    with transaction.atomic():
+        lock_ticket(ticket)
+        return Message.objects.create(linked_ticket=ticket, linked_user=user, body=body)
+
+
+def post_messages(ticket, user, bodies):
+    """[Summary]
+        Creates a batch of new messages in the ticket inside one atomic block.
+        Messages are inserted with bulk_create, the ticket and users fields
+        are recalculated once per batch (the ticket state is derived from the last message).
+        Args:
+            ticket ([Ticket]): already loaded ticket
+            user ([AppUser]): author of the messages
+            bodies ([list]): list of messages bodies [str]
+        Returns:
+            [list]: created messages
+    """
+
+    with transaction.atomic():
+        lock_ticket(ticket)
+        messages = Message.objects.bulk_create(
+            [Message(linked_ticket=ticket, linked_user=user, body=body) for body in bodies]
+        )
+        if messages:
+            ticket.update_related_ticket_fields(new_messages=messages)
+        return messages
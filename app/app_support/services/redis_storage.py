@@ -0,0 +1,19 @@
+"""
+    Access to the Redis which is already used by Celery (CELERY_BROKER_URL).
+"""
+
+import redis
+from django.conf import settings
+
+_connection = None
+
+
+def get_redis_connection():
+    """
+        Returns a shared Redis client (one connection pool per process).
+    """
+
+    global _connection
+    if _connection is None:
+        _connection = redis.Redis.from_url(settings.APP_SUPPORT_DEFAULTS['REDIS_URL'])
+    return _connection
@@ -0,0 +1,39 @@
+"""
+    Request-local identity map.
+    Objects loaded by permission classes are reused by views and serializers of the same request.
+"""
+
+
+def get_objects_cache(request):
+    """
+        Returns a dict {(model, id): object} which lives as long as the request.
+    """
+
+    if not hasattr(request, 'objects_cache'):
+        request.objects_cache = {}
+    return request.objects_cache
+
+
+def get_object(request, queryset, object_id):
+    """[Summary]
+        Returns an object from the request cache or loads it with queryset.
+        The authenticated user is never loaded again.
+        Args:
+            request ([Request])
+            queryset ([QuerySet]): used if the object is not cached yet
+            object_id ([int])
+        Returns:
+            [Model]: can raise queryset.model.DoesNotExist
+    """
+
+    object_id = int(object_id)
+    key = (queryset.model, object_id)
+    cache = get_objects_cache(request)
+    if key not in cache:
+        user = getattr(request, 'user', None)
+        # the id is compared first: a lazy user (authentication.ClaimsUser) is loaded by isinstance()
+        if getattr(user, 'id', None) == object_id and isinstance(user, queryset.model):
+            cache[key] = user
+        else:
+            cache[key] = queryset.get(id=object_id)
+    return cache[key]
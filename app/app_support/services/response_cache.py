@@ -0,0 +1,122 @@
+"""
+    Cache of the rendered list responses (tickets and users lists) in Redis.
+    Every entry is saved with the current generations of the cached data ('tickets', 'users'),
+    the write paths bump the generations (see invalidate()), so old entries are never returned.
+    Entry and generations are read by one MGET. Redis errors are not raised (the cache is skipped).
+"""
+
+import hashlib
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from app_support.services.redis_storage import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+GENERATIONS = ['tickets', 'users']
+
+
+def is_enabled():
+    """
+        Returns [bool]: whether the list responses are cached.
+    """
+
+    return settings.APP_SUPPORT_DEFAULTS['RESPONSE_CACHE']
+
+
+def get_key(*parts):
+    return ':'.join([settings.APP_SUPPORT_DEFAULTS['RESPONSE_CACHE_PREFIX'], *parts])
+
+
+def get_response_key(view_name, user_scope, url, media_type):
+    """
+        Returns a key of the response entry.
+        user_scope - the user type (and user id, if the user sees only own items).
+    """
+
+    url_hash = hashlib.md5(f'{url}|{media_type}'.encode()).hexdigest()
+    return get_key('entry', view_name, user_scope, url_hash)
+
+
+def get_response(key, generations):
+    """[Summary]
+        Returns the cached response and the current generations.
+        Args:
+            key ([str]): entry key (from get_response_key)
+            generations ([list]): names of the generations the response depends on
+        Returns:
+            [tuple]: (content_type [str], content [bytes]) or None, current generations [str]
+    """
+
+    connection = get_redis_connection()
+    try:
+        *values, entry = connection.mget([get_key('generation', name) for name in generations] + [key])
+        current_generations = ','.join((value or b'0').decode() for value in values)
+        cached = None
+        if entry is not None:
+            entry_generations, content_type, content = entry.split(b'\n', 2)
+            if entry_generations.decode() == current_generations:
+                cached = (content_type.decode(), content)
+        connection.incr(get_key('stats', 'hits' if cached else 'misses'))
+    except redis.RedisError as error:
+        logger.warning('response cache is not available: %s', error)
+        return None, None
+    return cached, current_generations
+
+
+def set_response(key, current_generations, content_type, content):
+    """
+        Saves the rendered response with the generations which were actual before it was made
+        (a change made meanwhile bumps them, so the entry is never returned).
+    """
+
+    if current_generations is None:
+        return
+    entry = b'\n'.join([current_generations.encode(), content_type.encode(), content])
+    try:
+        get_redis_connection().set(key, entry, ex=settings.APP_SUPPORT_DEFAULTS['RESPONSE_CACHE_TTL'])
+    except redis.RedisError as error:
+        logger.warning('response cache is not available: %s', error)
+
+
+def bump_generations(names):
+    pipeline = get_redis_connection().pipeline(transaction=False)
+    for name in names:
+        pipeline.incr(get_key('generation', name))
+        pipeline.incr(get_key('stats', 'invalidations', name))
+    try:
+        pipeline.execute()
+    except redis.RedisError as error:
+        logger.warning('response cache generations are not bumped: %s', error)
+
+
+def invalidate(*names):
+    """
+        Bumps the generations after the current transaction is committed.
+        Called by the write paths: models save()/delete() and the queryset.update() services.
+    """
+
+    if is_enabled():
+        transaction.on_commit(lambda: bump_generations(names))
+
+
+def get_stats():
+    """
+        Returns [dict] of counters for tuning: hits, misses, hit rate, invalidations of every generation.
+    """
+
+    names = ['hits', 'misses'] + [f'invalidations:{name}' for name in GENERATIONS]
+    values = get_redis_connection().mget([get_key('stats', name) for name in names])
+    stats = {name: int(value or 0) for name, value in zip(names, values)}
+    requests_count = stats['hits'] + stats['misses']
+    stats['hit_rate'] = round(stats['hits'] / requests_count, 3) if requests_count else None
+    return stats
+
+
+def reset_stats():
+    connection = get_redis_connection()
+    connection.delete(*[get_key('stats', name) for name in ['hits', 'misses']])
+    connection.delete(*[get_key('stats', 'invalidations', name) for name in GENERATIONS])
@@ -0,0 +1,187 @@
+"""
+    Index of the url patterns for the 404 page suggestions.
+    The patterns are compiled once per process into a trie of path segments:
+    literal segments are dict keys, parameters ('<int:ticket_id>') are regexes of their converters.
+    The suggestion for a near-miss path walks the trie segment by segment and takes
+    the route with the least total edit distance of the literal segments (parameters must match).
+"""
+
+import re
+from functools import lru_cache
+
+from django.urls import get_resolver
+from django.urls.converters import PathConverter
+
+MAX_SUGGESTION_DISTANCE = 2  # edits of the literal segments (e.g. 'ticket/' -> 'tickets/' is 1)
+PARAMETER_PATTERN = re.compile(r'%\((\w+)\)s')
+
+
+class RouteNode:
+    __slots__ = ('children', 'literals', 'parameters', 'route')
+
+    def __init__(self):
+        self.children = {}  # literal segment: node
+        self.literals = []  # (literal segment, set of its characters, node) for the suggestions
+        self.parameters = []  # (compiled regex of the segment, node)
+        self.route = None  # the pattern, if a route ends here
+
+
+def get_distance(first, second, limit):
+    """
+        Returns Levenshtein distance of two strings or None if it is greater than the limit.
+        Only the diagonal band of the matrix (|i - j| <= limit) is computed.
+    """
+
+    if first == second:
+        return 0
+    if abs(len(first) - len(second)) > limit:
+        return None
+    too_far = limit + 1
+    previous_row = [j if j <= limit else too_far for j in range(len(second) + 1)]
+    for i in range(1, len(first) + 1):
+        row = [i if i <= limit else too_far] + [too_far] * len(second)
+        for j in range(max(1, i - limit), min(len(second), i + limit) + 1):
+            row[j] = min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (first[i - 1] != second[j - 1]),
+                too_far,
+            )
+        if min(row) > limit:
+            return None
+        previous_row = row
+    return previous_row[-1] if previous_row[-1] <= limit else None
+
+
+def split_path(path):
+    """
+        Returns segments of the path without the leading and trailing slashes.
+    """
+
+    path = path.strip('/')
+    return path.split('/') if path else []
+
+
+class RoutesIndex:
+    """
+        Trie of the url patterns, see the module docstring.
+    """
+
+    def __init__(self, routes):
+        """
+            routes - (pattern [str], regexes of the parameters [dict]) pairs,
+            e.g. ('api/v1/tickets/%(ticket_id)s/', {'ticket_id': '[0-9]+'}).
+        """
+
+        self.root = RouteNode()
+        for pattern, regexes in routes:
+            self.add(pattern, regexes)
+
+    @classmethod
+    def from_resolver(cls, resolver):
+        """
+            Takes the patterns of the resolver, except the format suffix variants
+            and the patterns with 'path' parameters (catch-all pages like the 404 page itself).
+        """
+
+        routes = set()
+        for key in list(resolver.reverse_dict.keys()):
+            for possibilities, _, _, converters in resolver.reverse_dict.getlist(key):
+                for pattern, parameters in possibilities:
+                    if 'format' in parameters:
+                        continue
+                    if any(isinstance(converters[name], PathConverter) for name in parameters):
+                        continue
+                    routes.add((pattern, tuple((name, converters[name].regex) for name in parameters)))
+        return cls((pattern, dict(regexes)) for pattern, regexes in sorted(routes))
+
+    def add(self, pattern, regexes):
+        node = self.root
+        for segment in split_path(pattern):
+            if PARAMETER_PATTERN.search(segment) is None:
+                if segment not in node.children:
+                    node.children[segment] = RouteNode()
+                    node.literals.append((segment, frozenset(segment), node.children[segment]))
+                node = node.children[segment]
+                continue
+            literal_parts = PARAMETER_PATTERN.split(segment)
+            # split() gives literal parts at even and parameter names at odd positions
+            regex = re.compile(''.join(
+                f'(?:{regexes[part]})' if i % 2 else re.escape(part) for i, part in enumerate(literal_parts)
+            ))
+            for parameter_regex, child in node.parameters:
+                if parameter_regex.pattern == regex.pattern:
+                    node = child
+                    break
+            else:
+                child = RouteNode()
+                node.parameters.append((regex, child))
+                node = child
+        node.route = pattern
+
+    def suggest(self, path, max_distance=MAX_SUGGESTION_DISTANCE):
+        """
+            Returns the closest existing path [str] (with the values of the parameters from the path)
+            or None if there is no route within max_distance.
+        """
+
+        segments = split_path(path)
+        best = self._suggest(self.root, segments, 0, 0, max_distance, [])
+        if best is None:
+            return None
+        return '/' + ''.join(f'{part}/' for part in best[1])
+
+    def _suggest(self, node, segments, i, distance, max_distance, parts):
+        """
+            Returns (distance, parts) of the closest route below the node or None.
+        """
+
+        if i == len(segments):
+            return (distance, list(parts)) if node.route is not None else None
+        best = None
+        segment = segments[i]
+        for regex, child in node.parameters:
+            if regex.fullmatch(segment):
+                found = self._suggest(child, segments, i + 1, distance, max_distance, parts + [segment])
+                best = self._choose(best, found)
+        if distance == max_distance:  # only the exact segment is possible
+            child = node.children.get(segment)
+            if child is not None:
+                found = self._suggest(child, segments, i + 1, distance, max_distance, parts + [segment])
+                best = self._choose(best, found)
+            return best
+        limit = max_distance - distance
+        characters = set(segment)
+        for literal, literal_characters, child in node.literals:
+            # every edit adds or removes at most one distinct character, the cheap check rejects most segments
+            if len(literal_characters - characters) > limit or len(characters - literal_characters) > limit:
+                continue
+            segment_distance = get_distance(segment, literal, limit)
+            if segment_distance is None:
+                continue
+            found = self._suggest(child, segments, i + 1, distance + segment_distance, max_distance, parts + [literal])
+            best = self._choose(best, found)
+            if best is not None and best[0] == distance:  # can not be better
+                break
+        return best
+
+    @staticmethod
+    def _choose(best, found):
+        if found is None:
+            return best
+        if best is None or found[0] < best[0]:
+            return found
+        return best
+
+
+@lru_cache(maxsize=None)
+def _get_index(resolver):
+    return RoutesIndex.from_resolver(resolver)
+
+
+def get_routes_index():
+    """
+        Returns the RoutesIndex of the current urlconf (built once per process).
+    """
+
+    return _get_index(get_resolver())
@@ -0,0 +1,105 @@
+"""
+    Full-text search of tickets by messages bodies, staff notes and themes.
+    The index is made by migration 0004_search_index:
+    postgresql - generated tsvector columns with GIN indexes, sqlite - FTS5 tables with triggers.
+    Every word of the query must be found (in one message or in the ticket itself).
+    Staff notes are searched only for support+ users, for the others the ticket is matched by its theme only.
+"""
+
+from django.conf import settings
+from django.db import NotSupportedError, connection
+
+from app_support.models_const import TICKET_THEMES
+
+POSTGRESQL_SEARCH_SQL = """
+    SELECT ticket_id, max(rank) AS best_rank FROM (
+        SELECT ticket.id AS ticket_id, ts_rank({ticket_vector}, query) AS rank
+        FROM app_support_ticket ticket, plainto_tsquery('simple', %s) query
+        WHERE {ticket_vector} @@ query {ticket_owner_filter}
+        UNION ALL
+        SELECT message.linked_ticket_id, ts_rank(message.search_vector, query)
+        FROM app_support_message message {message_owner_join}, plainto_tsquery('simple', %s) query
+        WHERE message.search_vector @@ query {message_owner_filter}
+    ) matches
+    GROUP BY ticket_id ORDER BY best_rank DESC, ticket_id DESC LIMIT %s
+"""
+
+# bm25() is negative, the best match has the smallest value, so -bm25() is the rank
+SQLITE_SEARCH_SQL = """
+    SELECT ticket_id, max(rank) AS best_rank FROM (
+        SELECT fts.rowid AS ticket_id, -bm25(app_support_ticket_fts) AS rank
+        FROM app_support_ticket_fts fts {ticket_owner_join}
+        WHERE app_support_ticket_fts MATCH %s {ticket_owner_filter}
+        UNION ALL
+        SELECT message.linked_ticket_id, -bm25(app_support_message_fts)
+        FROM app_support_message_fts fts
+        JOIN app_support_message message ON message.id = fts.rowid {message_owner_join}
+        WHERE app_support_message_fts MATCH %s {message_owner_filter}
+    ) matches
+    GROUP BY ticket_id ORDER BY best_rank DESC, ticket_id DESC LIMIT %s
+"""
+
+OWNER_JOIN = 'JOIN app_support_ticket ticket ON ticket.id = {}'
+OWNER_FILTER = 'AND ticket.opened_by_id = %s'
+# postgresql: the theme label vector without staff_note (not indexed, computed for the filtered tickets)
+THEME_LABEL_SQL = 'CASE ticket.ticket_theme {} ELSE \'\' END'.format(
+    ' '.join(f"WHEN '{value}' THEN '{label}'" for value, label in TICKET_THEMES)
+)
+POSTGRESQL_THEME_VECTOR = f"to_tsvector('simple', {THEME_LABEL_SQL})"
+
+
+def get_fts5_query(query):
+    """
+        Returns FTS5 query of the words as phrases (operators and special characters are not parsed).
+    """
+
+    return ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+
+def get_search_sql(owner_id, staff_notes):
+    vendor = connection.vendor
+    owner_filter = OWNER_FILTER if owner_id is not None else ''
+    if vendor == 'postgresql':
+        return POSTGRESQL_SEARCH_SQL.format(
+            ticket_vector='ticket.search_vector' if staff_notes else POSTGRESQL_THEME_VECTOR,
+            ticket_owner_filter=owner_filter,
+            message_owner_join=OWNER_JOIN.format('message.linked_ticket_id') if owner_id is not None else '',
+            message_owner_filter=owner_filter,
+        )
+    if vendor == 'sqlite':
+        return SQLITE_SEARCH_SQL.format(
+            ticket_owner_join=OWNER_JOIN.format('fts.rowid') if owner_id is not None else '',
+            ticket_owner_filter=owner_filter,
+            message_owner_join=OWNER_JOIN.format('message.linked_ticket_id') if owner_id is not None else '',
+            message_owner_filter=owner_filter,
+        )
+    raise NotSupportedError(f'Full-text search is not supported by <{vendor}> database.')
+
+
+def search_tickets(query, owner_id=None, limit=None, staff_notes=True):
+    """[Summary]
+        Finds tickets by all words of the query, the best matches first.
+        Args:
+            query ([str]): words to find
+            owner_id ([int]): search only in tickets of this user
+            limit ([int]): max count of tickets, SEARCH_RESULTS_LIMIT by default
+            staff_notes ([bool]): False - tickets are matched by messages and themes only (not support+ users)
+        Returns:
+            [list]: (ticket_id, rank) tuples
+    """
+
+    if not query.split():
+        return []
+    ticket_query = query
+    if connection.vendor == 'sqlite':
+        query = get_fts5_query(query)
+        ticket_query = query if staff_notes else f'ticket_theme : ({query})'  # FTS5 column filter
+    owner_params = [] if owner_id is None else [owner_id]
+    params = [
+        ticket_query, *owner_params,
+        query, *owner_params,
+        limit or settings.APP_SUPPORT_DEFAULTS['SEARCH_RESULTS_LIMIT'],
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(get_search_sql(owner_id, staff_notes), params)
+        return cursor.fetchall()
@@ -0,0 +1,216 @@
+"""
+    Support metrics (stats/ endpoint): first response time, time to close and backlog
+    by ticket theme or by agent, per hour or per day.
+    Only the rollups (models.SupportRollup) are read, the cost depends on the count of buckets,
+    not on the count of tickets and messages. The rollups are changed by the tickets and messages hooks,
+    rebuild_rollups() recounts them from the tickets and messages (e.g. for the data created before them).
+    The backlog of a moment is the latest daily snapshot (backlog_start, saved by the periodic task)
+    plus the deltas after it, so its cost does not grow with the history.
+"""
+
+from datetime import timedelta, timezone
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone as django_timezone
+
+from app_support.models import Message, SupportRollup, Ticket
+from app_support.models_const import TICKET_THEMES
+
+GROUP_FIELDS = {'theme': 'ticket_theme', 'agent': 'agent_id'}
+PERIOD_LENGTHS = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+# events per statement while rebuilding: up to 2 rows of 11 params each, SQLite allows 999 params
+REBUILD_BATCH_SIZE = 40
+
+
+def get_backlog(moment):
+    """
+        Returns {ticket_theme: open tickets waiting for an answer} at the moment (the start of an hour):
+        the latest snapshot of every theme (one indexed lookup), daily rows from the snapshot
+        to the day of the moment (one day if the snapshots are taken daily) and hourly rows of that day.
+        A theme without snapshots sums the deltas of the whole history.
+    """
+
+    day = SupportRollup.get_bucket(moment, 'day')
+    backlog = {}
+    ranges = Q(period='hour', bucket__gte=day, bucket__lt=moment)
+    for theme, _ in TICKET_THEMES:
+        snapshot = SupportRollup.objects.filter(
+            ticket_theme=theme, bucket__lte=day, backlog_start__isnull=False,
+        ).order_by('-bucket').values_list('bucket', 'backlog_start').first()
+        days = Q(period='day', ticket_theme=theme, bucket__lt=day)
+        if snapshot is not None:
+            backlog[theme] = snapshot[1]
+            days &= Q(bucket__gte=snapshot[0])
+        ranges |= days
+    rows = SupportRollup.objects.filter(ranges).order_by().values('ticket_theme').annotate(
+        backlog=Sum('backlog_delta'),
+    )
+    for row in rows:
+        backlog[row['ticket_theme']] = backlog.get(row['ticket_theme'], 0) + row['backlog']
+    return backlog
+
+
+def get_backlog_counts():
+    """
+        Returns {ticket_theme: open tickets waiting for an answer} counted by the tickets
+        (served by the partial index 'ticket_queue_idx').
+    """
+
+    return dict(
+        Ticket.objects.filter(
+            is_closed=False, is_answered=False, user_question_date__isnull=False,
+        ).order_by().values('ticket_theme').annotate(count=Count('id')).values_list('ticket_theme', 'count')
+    )
+
+
+def snapshot_backlog():
+    """[Summary]
+        Saves the backlog at the start of the current day (backlog_start of its daily rows without agent):
+        the current count of the backlog tickets minus the deltas of the day.
+        The daily rows are locked before the count, concurrent deltas wait and are added after the snapshot.
+        Can be repeated within the day (the periodic task).
+        Returns:
+            [dict]: {ticket_theme: backlog_start}
+    """
+
+    day = SupportRollup.get_bucket(django_timezone.now(), 'day')
+    with transaction.atomic():
+        for theme, _ in TICKET_THEMES:
+            SupportRollup.objects.get_or_create(period='day', bucket=day, ticket_theme=theme, agent_id=0)
+        rows = list(SupportRollup.objects.select_for_update().filter(
+            period='day', bucket=day, agent_id=0,
+        ).order_by('ticket_theme'))
+        counts = get_backlog_counts()
+        for row in rows:
+            row.backlog_start = counts.get(row.ticket_theme, 0) - row.backlog_delta
+        SupportRollup.objects.bulk_update(rows, ['backlog_start'])
+    return {row.ticket_theme: row.backlog_start for row in rows}
+
+
+def get_average(total, count):
+    return round(total / count) if count else None
+
+
+def get_stats(period, date_from, date_to, group_by='theme'):
+    """[Summary]
+        Returns support metrics of the buckets from the rollups.
+        Args:
+            period ([str]): 'hour' or 'day'
+            date_from ([datetime]): the start of the range (rounded down to the start of its bucket)
+            date_to ([datetime]): the end of the range (not included)
+            group_by ([str]): 'theme' - buckets by ticket themes (with the backlog),
+                'agent' - buckets by agents (answerers and closers)
+        Returns:
+            [list]: dicts of the buckets with metrics, ordered by bucket and group
+    """
+
+    group_field = GROUP_FIELDS[group_by]
+    date_from = SupportRollup.get_bucket(date_from, period)
+    queryset = SupportRollup.objects.filter(period=period, bucket__gte=date_from, bucket__lt=date_to)
+    if group_by == 'agent':
+        queryset = queryset.exclude(agent_id=0)
+    rows = queryset.order_by('bucket', group_field).values('bucket', group_field).annotate(
+        **{name: Sum(name) for name in SupportRollup.counter_fields}
+    )
+    backlog = get_backlog(date_from) if group_by == 'theme' else None
+
+    buckets = []
+    for row in rows:
+        bucket = {
+            'bucket': row['bucket'],
+            group_field: row[group_field],
+            'opened_tickets': row['opened_tickets'],
+            'closed_tickets': row['closed_tickets'],
+            'first_responses': row['first_responses'],
+            'answers': row['answers'],
+            'avg_first_response_seconds': get_average(row['first_response_seconds'], row['first_responses']),
+            'avg_close_seconds': get_average(row['close_seconds'], row['closed_tickets']),
+        }
+        if backlog is not None:
+            # open tickets waiting for an answer at the end of the bucket
+            backlog[row['ticket_theme']] = backlog.get(row['ticket_theme'], 0) + row['backlog_delta']
+            bucket['backlog'] = backlog[row['ticket_theme']]
+        buckets.append(bucket)
+    return buckets
+
+
+def iterate_rebuild_events():
+    """
+        Yields SupportRollup.apply_deltas() events of the current tickets and messages.
+        The closing moment is not stored, last_changes of a closed ticket is taken instead.
+    """
+
+    first_answer = Message.objects.filter(
+        linked_ticket=OuterRef('pk'),
+    ).exclude(
+        linked_user=OuterRef('opened_by'),
+    ).order_by('id')[:1]
+    tickets = Ticket.objects.order_by().annotate(
+        first_answer_date=Subquery(first_answer.values('creation_date')),
+        first_answerer_id=Subquery(first_answer.values('linked_user')),
+    ).values_list(
+        'ticket_theme', 'creation_date', 'is_closed', 'closed_by_id', 'last_changes',
+        'is_answered', 'user_question_date', 'first_answer_date', 'first_answerer_id',
+    )
+    for (theme, creation_date, is_closed, closed_by_id, last_changes,
+         is_answered, question_date, first_answer_date, first_answerer_id) in tickets.iterator():
+        yield creation_date, theme, None, {'opened_tickets': 1}
+        if is_closed:
+            yield last_changes, theme, closed_by_id, {
+                'closed_tickets': 1,
+                'close_seconds': int((last_changes - creation_date).total_seconds()),
+            }
+        elif not is_answered and question_date is not None:
+            yield question_date, theme, None, {'backlog_delta': 1}
+        if first_answer_date is not None:
+            yield first_answer_date, theme, first_answerer_id, {
+                'first_responses': 1,
+                'first_response_seconds': int((first_answer_date - creation_date).total_seconds()),
+            }
+
+    answers = Message.objects.exclude(
+        linked_user=F('linked_ticket__opened_by'),
+    ).order_by().values(
+        'linked_user', 'linked_ticket__ticket_theme', hour=TruncHour('creation_date', tzinfo=timezone.utc),
+    ).annotate(answers=Count('id'))
+    for row in answers.iterator():
+        yield row['hour'], row['linked_ticket__ticket_theme'], row['linked_user'], {'answers': row['answers']}
+
+
+def save_backlog_snapshots():
+    """
+        Saves backlog_start of all daily rows without agent by the running sums of the deltas (rebuilding).
+    """
+
+    rows = list(SupportRollup.objects.filter(period='day', agent_id=0).order_by('ticket_theme', 'bucket'))
+    backlog = {}
+    for row in rows:
+        row.backlog_start = backlog.get(row.ticket_theme, 0)
+        backlog[row.ticket_theme] = row.backlog_start + row.backlog_delta
+    SupportRollup.objects.bulk_update(rows, ['backlog_start'], batch_size=REBUILD_BATCH_SIZE)
+
+
+def rebuild_rollups():
+    """[Summary]
+        Recounts all rollups from the tickets and messages (one transaction),
+        the daily rows get the backlog snapshots.
+        Returns:
+            [int]: count of the applied events
+    """
+
+    events_count = 0
+    with transaction.atomic():
+        SupportRollup.objects.all().delete()
+        batch = []
+        for event in iterate_rebuild_events():
+            batch.append(event)
+            if len(batch) == REBUILD_BATCH_SIZE:
+                SupportRollup.apply_deltas(batch)
+                events_count += len(batch)
+                batch = []
+        SupportRollup.apply_deltas(batch)
+        events_count += len(batch)
+        save_backlog_snapshots()
+    return events_count
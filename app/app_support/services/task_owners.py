@@ -0,0 +1,56 @@
+"""
+    Requesters of the background tasks: tasks/<uuid>/ shows a task to its requester and support+ only
+    (tasks of the staff-only views - to staff+ only).
+    Kept in Redis as long as the celery results (TASK_OWNERS_TTL seconds).
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+
+from app_support.services.redis_storage import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+def get_owner_key(task_id):
+    return f'{settings.APP_SUPPORT_DEFAULTS["TASK_OWNERS_PREFIX"]}:{task_id}'
+
+
+def is_staff_plus(user):
+    return user.is_staff or user.is_superuser
+
+
+def remember_task_owner(task_id, user, staff_only=False):
+    """
+        Saves the requester of the started task.
+    """
+
+    try:
+        get_redis_connection().set(
+            get_owner_key(task_id),
+            f'{user.id}:{int(staff_only)}',
+            ex=settings.APP_SUPPORT_DEFAULTS['TASK_OWNERS_TTL'],
+        )
+    except redis.RedisError as error:
+        logger.error('the owner of the task %s is not saved: %s', task_id, error)
+
+
+def can_view_task(task_id, user):
+    """
+        Returns True if the user is the requester of the task or support+ (staff+ for staff-only tasks).
+        Tasks without a known requester (or if Redis is not available) are shown to staff+ only.
+    """
+
+    try:
+        value = get_redis_connection().get(get_owner_key(task_id))
+    except redis.RedisError as error:
+        logger.warning('the owner of the task %s is not available: %s', task_id, error)
+        value = None
+    if value is None:
+        return is_staff_plus(user)
+    owner_id, staff_only = (int(part) for part in value.decode().split(':'))
+    if owner_id == user.id or is_staff_plus(user):
+        return True
+    return not staff_only and user.is_support
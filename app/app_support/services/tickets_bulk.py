@@ -0,0 +1,71 @@
+"""
+    Bulk operations with tickets.
+    Tickets are changed with one UPDATE, owners fields are recalculated once per user,
+    support rollups are changed with one statement.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils import timezone
+
+from app_support.models import AppUser, SupportRollup, Ticket
+from app_support.services import response_cache
+
+
+def update_tickets_status(queryset, user, is_closed=None, is_frozen=None):
+    """[Summary]
+        Sets new is_closed/is_frozen values for all tickets from queryset.
+        Uses a fixed count of statements inside one atomic block:
+            SELECT (lock) tickets, UPDATE tickets, UPDATE owners fields, UPSERT rollups.
+        closed_by_id is set to user.id for the tickets which are closed now
+        and is cleared for the reopened ones.
+        Args:
+            queryset ([QuerySet]): tickets to update (not sliced)
+            user ([AppUser]): the user who changes tickets
+            is_closed ([bool] or None): None - do not change
+            is_frozen ([bool] or None): None - do not change
+        Returns:
+            [int]: count of updated tickets
+    """
+
+    with transaction.atomic():
+        rows = list(queryset.select_for_update().order_by().values_list(
+            'id', 'opened_by_id', 'is_closed', 'ticket_theme', 'creation_date', 'is_answered', 'user_question_date',
+        ))
+        if not rows:
+            return 0
+
+        now = timezone.now()
+        updates = {'last_changes': now}
+        if is_frozen is not None:
+            updates['is_frozen'] = is_frozen
+        users_deltas = {}
+        events = []
+        if is_closed is not None:
+            updates['is_closed'] = is_closed
+            if is_closed:
+                updates['closed_by_id'] = Case(
+                    When(is_closed=False, then=Value(user.id)),
+                    default=F('closed_by_id'),
+                    output_field=PositiveIntegerField(),
+                )
+            else:
+                updates['closed_by_id'] = None
+            for _, owner_id, old_is_closed, theme, creation_date, is_answered, question_date in rows:
+                owner_deltas = users_deltas.setdefault(owner_id, {'opened_tickets': 0})
+                if old_is_closed == is_closed:
+                    continue
+                owner_deltas['opened_tickets'] += -1 if is_closed else 1
+                if not is_answered and question_date is not None:
+                    events.append((now, theme, None, {'backlog_delta': -1 if is_closed else 1}))
+                if is_closed:
+                    close_seconds = int((now - creation_date).total_seconds())
+                    events.append((now, theme, user.id, {'closed_tickets': 1, 'close_seconds': close_seconds}))
+        else:
+            users_deltas = {row[1]: {} for row in rows}  # last_changes only
+
+        updated_count = Ticket.objects.filter(id__in=[row[0] for row in rows]).update(**updates)
+        response_cache.invalidate('tickets')
+        AppUser.apply_fields_deltas(users_deltas)
+        SupportRollup.apply_deltas(events)
+    return updated_count
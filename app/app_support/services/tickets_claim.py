@@ -0,0 +1,97 @@
+"""
+    Queue of unanswered tickets for support users.
+    Every support user claims the oldest free ticket, so concurrent agents get distinct tickets.
+    A claim expires after APP_SUPPORT_DEFAULTS['TICKET_CLAIM_TIMEOUT'] seconds.
+    Tickets of a support user are found by the partial index 'ticket_claimed_by_idx' (claimed tickets only).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from app_support.models import Ticket
+from app_support.services import response_cache
+
+# attempts of the compare-and-set fallback (without SKIP LOCKED) before giving up
+CLAIM_ATTEMPTS = 5
+
+
+def get_queue_queryset():
+    """
+        Returns queryset of the tickets which are waiting for an answer, the oldest question first.
+        Served by the partial index 'ticket_queue_idx'.
+    """
+
+    return Ticket.objects.filter(
+        is_answered=False,
+        is_closed=False,
+        is_frozen=False,
+        user_question_date__isnull=False,
+    ).order_by('user_question_date', 'id')
+
+
+def get_free_queryset(now):
+    """
+        Returns queue queryset without the tickets claimed by anybody (and not expired yet).
+    """
+
+    return get_queue_queryset().filter(Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+
+
+def claim_next_ticket(user, timeout=None):
+    """[Summary]
+        Claims the oldest free ticket of the queue for the user.
+        If the user already has a claimed ticket in the queue, it is returned again (the claim is extended),
+        so repeated requests do not take more tickets.
+        Postgresql: the free ticket is locked by SELECT ... FOR UPDATE SKIP LOCKED,
+        tickets locked by the concurrent transactions are skipped (no waiting).
+        Sqlite (no SKIP LOCKED): compare-and-set UPDATE, a ticket taken by somebody else is retried.
+        Args:
+            user ([AppUser]): support user
+            timeout ([int]): claim duration in seconds (TICKET_CLAIM_TIMEOUT by default)
+        Returns:
+            [int] or None: id of the claimed ticket, None if the queue is empty
+    """
+
+    if timeout is None:
+        timeout = settings.APP_SUPPORT_DEFAULTS['TICKET_CLAIM_TIMEOUT']
+    now = timezone.now()
+    claim = {'claimed_by_id': user.id, 'claimed_until': now + timedelta(seconds=timeout)}
+
+    with transaction.atomic():
+        response_cache.invalidate('tickets')  # claim fields are shown in full mode
+        own_queryset = get_queue_queryset().filter(claimed_by_id=user.id, claimed_until__gte=now)
+        if own_queryset.update(**claim):
+            return own_queryset.values_list('id', flat=True).first()
+
+        free_queryset = get_free_queryset(now)
+        if connection.features.has_select_for_update_skip_locked:
+            ticket_id = free_queryset.select_for_update(skip_locked=True).values_list('id', flat=True).first()
+            if ticket_id is not None:
+                Ticket.objects.filter(id=ticket_id).update(**claim)
+            return ticket_id
+
+        for _ in range(CLAIM_ATTEMPTS):
+            ticket_id = free_queryset.values_list('id', flat=True).first()
+            if ticket_id is None:
+                return None
+            # the free condition is checked again, 0 rows - the ticket was claimed by somebody else
+            if free_queryset.filter(id=ticket_id).update(**claim):
+                return ticket_id
+    return None
+
+
+def release_claims(user):
+    """[Summary]
+        Returns the tickets claimed by the user to the queue.
+        Args:
+            user ([AppUser]): support user
+        Returns:
+            [int]: count of released tickets
+    """
+
+    response_cache.invalidate('tickets')
+    return Ticket.objects.filter(claimed_by_id=user.id).update(claimed_by_id=None, claimed_until=None)
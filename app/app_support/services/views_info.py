@@ -47,6 +47,11 @@ ROOT_PAGE_INFO = {
                 }
             },
             'tickets/': 'to view tickets (if have credentials for) or create new',
+            'tickets/next/': 'to claim the next ticket to answer (auth support+)',
+            'tickets/search/': 'to find tickets by words of messages, staff notes and themes. Args: [q, user_id]',
+            'tasks/<uuid>/': 'to view status of a background task (e.g. deletion)',
+            'exports/': 'to start an export of tickets with messages (auth staff+)',
+            'stats/': 'to view support metrics (auth staff+). Args: [period, group_by, date_from, date_to]',
         }
     }
 
@@ -57,3 +62,15 @@ def get_delete_process_msg(obj_name, user_id):
         Returns [str].
     """
     return f'The process of deletion the {obj_name} with id {user_id} has been started.'
+
+
+def get_task_started_info(detail, task_id):
+    """
+        Returns a response data for a started background task.
+        Returns [dict].
+    """
+    return {
+        'detail': detail,
+        'task_id': task_id,
+        'status_url': f'tasks/{task_id}/',
+    }
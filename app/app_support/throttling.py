@@ -0,0 +1,110 @@
+"""
+    Token bucket throttling in Redis (the limits are shared by all worker processes).
+    Budgets are set per scope (auth, list, detail, write) and user type (see views_mixins.get_user_type)
+    in APP_SUPPORT_DEFAULTS['THROTTLE_RATES'], e.g. '60/m': a bucket of 60 requests refilled in a minute.
+"""
+
+import logging
+
+import redis
+from django.conf import settings
+from rest_framework.mixins import ListModelMixin
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+from app_support.services.redis_storage import get_redis_connection
+from app_support.views_mixins import get_user_type
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+# KEYS[1] - bucket, ARGV - capacity, refill rate (tokens per second).
+# Returns {1 if allowed else 0, seconds to wait for a token [str]}.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+_script = None
+
+
+def get_token_bucket_script():
+    global _script
+    if _script is None:
+        _script = get_redis_connection().register_script(TOKEN_BUCKET_SCRIPT)
+    return _script
+
+
+def parse_rate(rate):
+    """
+        Returns (capacity, refill rate per second) of the rate like '60/m' or None (no limit).
+    """
+
+    if rate is None:
+        return None
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+        Scope of the request: view.throttle_scope if set (e.g. 'auth' for the token views),
+        'write' for unsafe methods, 'list' for the list views and 'detail' for the rest.
+        If Redis is not available, requests are not throttled.
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        if request.method not in SAFE_METHODS:
+            return 'write'
+        if isinstance(view, ListModelMixin):
+            return 'list'
+        return 'detail'
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        app_settings = settings.APP_SUPPORT_DEFAULTS
+        if not app_settings['THROTTLING']:
+            return True
+        scope = self.get_scope(request, view)
+        user_type = get_user_type(request.user)
+        rate = parse_rate(app_settings['THROTTLE_RATES'].get(scope, {}).get(user_type))
+        if rate is None:
+            return True
+
+        ident = request.user.id if user_type != 'Anonimous' else self.get_ident(request)
+        key = f'{app_settings["THROTTLE_PREFIX"]}:{scope}:{user_type}:{ident}'
+        try:
+            allowed, wait = get_token_bucket_script()(keys=[key], args=list(rate))
+        except redis.RedisError as error:
+            logger.warning('throttling is not available: %s', error)
+            return True
+        self.wait_seconds = float(wait)
+        return bool(allowed)
+
+    def wait(self):
+        """
+            Seconds till the next token, used for the Retry-After header.
+        """
+
+        return self.wait_seconds
@@ -1,21 +1,26 @@
 
 from django.urls import path
 from rest_framework.urlpatterns import format_suffix_patterns
-from rest_framework_simplejwt.views import (TokenObtainPairView,
-                                            TokenRefreshView)
 
 from app_support import views
 
 urlpatterns = [
     path('', views.home_page_info_view, name='home_page'),
-    path('obtainjwt/', TokenObtainPairView.as_view(), name='obtain_token'),  # simpleJWT
-    path('refreshjwt/', TokenRefreshView.as_view(), name='refresh_token'),  # simpleJWT
+    path('obtainjwt/', views.ObtainTokenView.as_view(), name='obtain_token'),  # simpleJWT
+    path('refreshjwt/', views.RefreshTokenView.as_view(), name='refresh_token'),  # simpleJWT
     path('users/', views.UsersListView.as_view(), name='users_list'),
     path('users/<int:pk>/', views.UserProfileView.as_view(), name='user_profile'),
     path('tickets/', views.TicketsListView.as_view(), name='tickets_list'),  # participated too
+    path('tickets/next/', views.NextTicketView.as_view(), name='next_ticket'),  # support queue
+    path('tickets/search/', views.TicketsSearchView.as_view(), name='tickets_search'),  # ?q=
     path('tickets/<int:ticket_id>/', views.TicketView.as_view(), name='specific_ticket'),
     path('tickets/<int:ticket_id>/messages/', views.MessagesView.as_view(), name='specific_ticket_messages'),
     path('tickets/<int:ticket_id>/messages/<int:message_id>/', views.MessageView.as_view(), name='specific_message'),
+    path('tasks/<uuid:task_id>/', views.TaskStatusView.as_view(), name='task_status'),
+    path('exports/', views.ExportsView.as_view(), name='exports'),  # staff+
+    path('exports/<uuid:task_id>/', views.ExportStatusView.as_view(), name='export_status'),
+    path('exports/<uuid:task_id>/download/', views.ExportDownloadView.as_view(), name='export_download'),
+    path('stats/', views.StatsView.as_view(), name='stats'),  # staff+
 
     # unnecessary, but perhaps convenient urls:
     path('users/me/', views.UserProfileView.as_view(), {'pk': 0}, name='user_profile2'),
@@ -1,34 +1,79 @@
+from celery.result import AsyncResult
 from django.contrib.auth import get_user_model
-from django.urls import get_resolver
+from django.db.models import Prefetch
+from django.http import FileResponse
 from django_filters.rest_framework.backends import DjangoFilterBackend
-from rest_framework import generics, status
+from rest_framework import exceptions, generics, status
 from rest_framework.decorators import api_view
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.views import (TokenObtainPairView,
+                                            TokenRefreshView)
 
 from app_support import celery_tasks
+from app_support.authentication import (ClaimsTokenObtainPairSerializer,
+                                        ClaimsTokenRefreshSerializer)
 from app_support.models import Message, Ticket
 from app_support.serializers import (BasicMessageSerializer,
+                                     BasicTicketProjectionSerializer,
                                      BasicTicketSerializer,
+                                     BasicUserListProjectionSerializer,
                                      BasicUserListSerializer,
+                                     BulkTicketStatusSerializer,
                                      DefaultTicketSerializer,
                                      DefaultUserProfileSerializer,
                                      ExpandedTicketSerializer,
                                      ExpandedUserListSerializer,
                                      ExpandedUserProfileSerializer,
+                                     ExportSerializer,
                                      FullTicketSerializer,
-                                     FullUserProfileSerializer)
-from app_support.services import views_info
+                                     FullUserProfileSerializer,
+                                     StatsSerializer)
+from app_support.services import (exports, request_cache, routes_index,
+                                  search, stats, task_owners, tickets_bulk,
+                                  tickets_claim, views_info)
 from app_support.services.generalized_funcs import popped_dict
-from app_support.views_mixins import ViewArgsMixin, ViewModesMixin
+from app_support.views_mixins import (ConditionalGetMixin,
+                                      ListResponseCacheMixin,
+                                      StreamingListMixin, ViewArgsMixin,
+                                      ViewModesMixin)
+from app_support.views_pagination import ListPagination
 from app_support.views_permissions import (IsIdOwnerOrSupportPlus,
                                            IsItemOwnerOrSupportPlus,
-                                           MethodsPermissions)
+                                           IsSupportPlus, MethodsPermissions)
 
 User = get_user_model()
 
+# columns used by the basic serializers (and the list orderings), last_changes - for the fragments cache
+BASIC_TICKET_COLUMNS = [
+    'id', 'opened_by', 'ticket_theme', 'is_closed', 'is_answered', 'user_question_date', 'last_changes',
+]
+BASIC_USER_COLUMNS = [
+    'id', 'username', 'screen_name', 'hide_private_info', 'is_staff', 'is_support',
+    'unanswered_since', 'opened_tickets_count', 'date_joined', 'last_changes',
+]
+BASIC_TICKETS_PREFETCH = Prefetch('tickets', queryset=Ticket.objects.only(*BASIC_TICKET_COLUMNS))
+MESSAGES_PREFETCH = Prefetch('messages', queryset=Message.objects.select_related('linked_user'))
 
-class UsersListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin):
+
+class ObtainTokenView(TokenObtainPairView):
+    """
+        simpleJWT tokens with role claims (see authentication.ClaimsJWTAuthentication).
+    """
+
+    serializer_class = ClaimsTokenObtainPairSerializer
+    throttle_scope = 'auth'  # password hashing is expensive
+
+
+class RefreshTokenView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer
+    throttle_scope = 'auth'
+
+
+class UsersListView(
+    StreamingListMixin, ListResponseCacheMixin, generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin
+):
     """
         Responces with:
             1. info-page (if there are not enough credentials)
@@ -44,19 +89,31 @@ class UsersListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin):
         AllowAny,
     )
 
-    queryset = User.objects.prefetch_related("tickets").all()
+    queryset = User.objects.all()
     # serializer_class will be provided later, depending on mode
 
     filter_backends = [DjangoFilterBackend]
     filter_fields = ['id', 'is_staff', 'is_superuser', 'is_support', 'opened_tickets_count']
+    pagination_class = ListPagination
 
     serializer_modes = {
-        'basic': BasicUserListSerializer,
-        'expanded': ExpandedUserListSerializer,
-        'default': DefaultUserProfileSerializer,  # for create
-        'full': FullUserProfileSerializer,  # for staff+ only
+        'basic': {
+            'serializer': BasicUserListProjectionSerializer,  # values() rows
+            'only': BASIC_USER_COLUMNS,
+        },
+        'expanded': {
+            'serializer': ExpandedUserListSerializer,
+            'prefetch_related': [BASIC_TICKETS_PREFETCH],
+            'only': BASIC_USER_COLUMNS,
+        },
+        'default': {'serializer': DefaultUserProfileSerializer},  # for create
+        'full': {  # for staff+ only
+            'serializer': FullUserProfileSerializer,
+            'prefetch_related': [BASIC_TICKETS_PREFETCH],
+        },
     }
     serializer_mode = 'default'
+    cache_view_name = 'users_list'
     list_ordering = ('unanswered_since', 'id', 'date_joined')  # not filled yet
     list_limit = 10**6
 
@@ -65,8 +122,17 @@ class UsersListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin):
             Uses additional filters before returning.
         """
 
-        queryset = super().filter_queryset(queryset)
-        return queryset.order_by(*list(self.list_ordering))[:self.list_limit]
+        queryset = super().filter_queryset(queryset).order_by(*list(self.list_ordering))
+        if ListPagination.is_cursor_requested(self.request):
+            return queryset  # pages are limited by the keyset pagination
+        return queryset[:self.list_limit]
+
+    def get_queryset(self):
+        """
+            Applies queryset options of the current mode.
+        """
+
+        return self.get_mode_queryset(super().get_queryset())
 
     def list(self, request, *args, **kwargs):
         """
@@ -121,10 +187,11 @@ class UsersListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin):
         return super().get_serializer_class()
 
 
-class UserProfileView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModesMixin):
+class UserProfileView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModesMixin):
     """
         Viewing of concrete User instance.
         Contains custom 'modes' mechanics.
+        GET supports conditional requests (ETag / Last-Modified).
     """
 
     permission_classes = (
@@ -133,17 +200,26 @@ class UserProfileView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, View
         IsIdOwnerOrSupportPlus,
     )
 
-    queryset = User.objects.prefetch_related("tickets").all()
+    queryset = User.objects.all()
     # serializer_class will be provided later, depending on mode
 
     serializer_modes = {
-        'basic': BasicUserListSerializer,  # for support+
-        'default': DefaultUserProfileSerializer,  # for user
-        'expanded': ExpandedUserProfileSerializer,  # for support+
-        'full': FullUserProfileSerializer,  # (for staff+ ?)
+        'basic': {'serializer': BasicUserListSerializer},  # for support+
+        'default': {'serializer': DefaultUserProfileSerializer},  # for user
+        'expanded': {  # for support+
+            'serializer': ExpandedUserProfileSerializer,
+            'prefetch_related': [BASIC_TICKETS_PREFETCH],
+        },
+        'full': {  # (for staff+ ?)
+            'serializer': FullUserProfileSerializer,
+            'prefetch_related': [BASIC_TICKETS_PREFETCH],
+        },
     }
     serializer_mode = 'default'
 
+    def get_conditional_object_id(self):
+        return self.kwargs.get('pk') or self.request.user.id  # 0 means current user
+
     def get_object(self):
         """
             If 'pk' kwarg wasn't set -> set it (the url like '.../users/me/'),
@@ -151,7 +227,19 @@ class UserProfileView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, View
         """
 
         self.set_as_pk_in_kwargs(self.request.user.id)
-        return super().get_object()
+        try:
+            user = request_cache.get_object(self.request, self.get_queryset(), self.kwargs['pk'])
+        except User.DoesNotExist:
+            raise exceptions.NotFound(f'User with id=({self.kwargs["pk"]}) does not exist.')
+        self.check_object_permissions(self.request, user)
+        return user
+
+    def get_queryset(self):
+        """
+            Applies queryset options of the current mode.
+        """
+
+        return self.get_mode_queryset(super().get_queryset())
 
     def set_available_modes(self):
         """
@@ -189,18 +277,25 @@ class UserProfileView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, View
             Async delete with response status 202
         """
 
-        id_to_delete = self.kwargs['pk']
-        celery_tasks.delete_object(
+        id_to_delete = self.kwargs['pk'] or request.user.id  # 0 means current user
+        task = celery_tasks.delete_object.delay(
             class_name='User',
             id_to_delete=id_to_delete
         )
-        return Response(views_info.get_delete_process_msg('user', id_to_delete), status=status.HTTP_202_ACCEPTED)
+        task_owners.remember_task_owner(task.id, request.user)
+        return Response(
+            views_info.get_task_started_info(views_info.get_delete_process_msg('user', id_to_delete), task.id),
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
-class TicketsListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin):
+class TicketsListView(
+    StreamingListMixin, ListResponseCacheMixin, generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin
+):
     """
         Viewing a list of tickets.
         Contains custom 'modes' mechanics.
+        PATCH changes is_closed/is_frozen of many tickets at once (by ids and/or filters).
     """
 
     permission_classes = (
@@ -213,16 +308,32 @@ class TicketsListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin)
 
     filter_backends = [DjangoFilterBackend]
     filter_fields = ['id', 'opened_by', 'is_closed', 'is_frozen', 'is_answered', 'answerer_id']
+    pagination_class = ListPagination
     # defaults:
     list_ordering = ('user_question_date', 'id', 'ticket_theme')
     list_limit = 10**6
     serializer_modes = {
-        'basic': BasicTicketSerializer,  # view list
-        'default': DefaultTicketSerializer,  # view list/create
-        'expanded': ExpandedTicketSerializer,  # view list/create
-        'full': FullTicketSerializer,  # view list/create
+        'basic': {  # view list (values() rows)
+            'serializer': BasicTicketProjectionSerializer,
+            'only': BASIC_TICKET_COLUMNS,
+        },
+        'default': {  # view list/create
+            'serializer': DefaultTicketSerializer,
+            'select_related': ['opened_by'],
+        },
+        'expanded': {  # view list/create
+            'serializer': ExpandedTicketSerializer,
+            'select_related': ['opened_by'],
+            'prefetch_related': [MESSAGES_PREFETCH],
+        },
+        'full': {  # view list/create
+            'serializer': FullTicketSerializer,
+            'select_related': ['opened_by'],
+            'prefetch_related': [MESSAGES_PREFETCH],
+        },
     }
     serializer_mode = 'basic'
+    cache_view_name = 'tickets_list'
     asked_user_id = None
 
     def set_available_modes(self):
@@ -257,13 +368,23 @@ class TicketsListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin)
         queryset = super().filter_queryset(queryset)
 
         if self.asked_user_id:
-            queryset = queryset.filter(
-                opened_by=User.objects.get(
-                    id=self.asked_user_id)
-            )
-        queryset = queryset.order_by(*list(self.list_ordering))[:self.list_limit]
+            try:
+                asked_user = request_cache.get_object(self.request, User.objects.all(), self.asked_user_id)
+            except User.DoesNotExist:
+                raise exceptions.NotFound(f'User with id=({self.asked_user_id}) does not exist.')
+            queryset = queryset.filter(opened_by=asked_user)
+        queryset = queryset.order_by(*list(self.list_ordering))
+        if not ListPagination.is_cursor_requested(self.request):  # keyset pages are limited anyway
+            queryset = queryset[:self.list_limit]
         return queryset
 
+    def get_queryset(self):
+        """
+            Applies queryset options of the current mode.
+        """
+
+        return self.get_mode_queryset(super().get_queryset())
+
     def get_serializer_class(self):
         """
             Set serializer class depending on mode, then
@@ -273,13 +394,119 @@ class TicketsListView(generics.ListCreateAPIView, ViewArgsMixin, ViewModesMixin)
         self.set_serializer_class()
         return super().get_serializer_class()
 
+    def get_permissions(self):
+        """
+            Bulk PATCH is also restricted by MethodsPermissions.
+        """
+
+        permissions = super().get_permissions()
+        if self.request.method == 'PATCH':
+            permissions.insert(0, MethodsPermissions())
+        return permissions
+
+    def patch(self, request, *args, **kwargs):
+        """
+            Bulk status update. Tickets are selected by 'ids' list and/or url filters,
+            then updated with one query.
+        """
+
+        serializer = BulkTicketStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data.get('ids', None)
+        if ids is None and not set(request.GET.keys()) & set(self.filter_fields):
+            raise exceptions.ValidationError('<ids> list or url filters must be entered to update tickets.')
+        queryset = super().filter_queryset(self.get_queryset())
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        updated_count = tickets_bulk.update_tickets_status(
+            queryset,
+            request.user,
+            is_closed=serializer.validated_data.get('is_closed', None),
+            is_frozen=serializer.validated_data.get('is_frozen', None),
+        )
+        return Response({'updated_tickets': updated_count}, status=status.HTTP_200_OK)
+
     # perhaps setup() is the best place to process all kwargs?
 
 
-class TicketView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModesMixin):
+class NextTicketView(generics.GenericAPIView):
+    """
+        Queue of unanswered tickets for support users.
+        POST claims the oldest free ticket (or extends the current claim) and returns it with messages.
+        DELETE returns the claimed tickets to the queue.
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsSupportPlus,
+    )
+
+    queryset = Ticket.objects.select_related('opened_by').prefetch_related(MESSAGES_PREFETCH)
+    serializer_class = ExpandedTicketSerializer
+
+    def post(self, request, *args, **kwargs):
+        ticket_id = tickets_claim.claim_next_ticket(request.user)
+        if ticket_id is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)  # nothing to answer
+        serializer = self.get_serializer(self.get_queryset().get(id=ticket_id))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        tickets_claim.release_claims(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class TicketsSearchView(generics.GenericAPIView):
+    """
+        Full-text search of tickets by messages bodies, staff notes and themes ('?q='), the best matches first.
+        Users can search only in own tickets ('?user_id=<own id>' or '?user_id=0'), like in the tickets list,
+        staff notes are searched for support+ only.
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsIdOwnerOrSupportPlus,
+    )
+
+    queryset = Ticket.objects.select_related('opened_by')
+    serializer_class = DefaultTicketSerializer
+    throttle_scope = 'list'
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '')
+        if not query.strip():
+            raise exceptions.ValidationError('<q> must be entered to search tickets.')
+        user = request.user
+        found = search.search_tickets(
+            query,
+            owner_id=self.get_owner_id(),
+            staff_notes=user.is_support or user.is_staff or user.is_superuser,  # staff_note is support+ only
+        )
+        ranked_ids = [ticket_id for ticket_id, _ in found]
+        tickets = self.get_queryset().in_bulk(ranked_ids)
+        serializer = self.get_serializer([tickets[ticket_id] for ticket_id in ranked_ids], many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    def get_owner_id(self):
+        """
+            Returns id of the user whose tickets are searched (None - all tickets).
+        """
+
+        user_id = self.request.GET.get('user_id', None)
+        if user_id is None:
+            return None
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            raise exceptions.ValidationError(f'Can not handle user_id({user_id}). Please enter a valid user_id.')
+        return user_id or self.request.user.id
+
+
+class TicketView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModesMixin):
     """
         Viewing of concrete Ticket instance.
         Contains custom 'modes' mechanics.
+        GET supports conditional requests (ETag / Last-Modified), messages are not loaded for 304.
     """
 
     permission_classes = (
@@ -293,14 +520,31 @@ class TicketView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModes
     # serializer_class will be provided later, depending on mode
 
     serializer_modes = {
-        'basic': BasicTicketSerializer,
-        'default': DefaultTicketSerializer,
-        'expanded': ExpandedTicketSerializer,
-        'full': FullTicketSerializer,
+        'basic': {
+            'serializer': BasicTicketSerializer,
+            'select_related': ['opened_by'],  # opened_by__last_changes of the validators
+        },
+        'default': {
+            'serializer': DefaultTicketSerializer,
+            'select_related': ['opened_by'],
+        },
+        'expanded': {
+            'serializer': ExpandedTicketSerializer,
+            'select_related': ['opened_by'],
+            'prefetch_related': [MESSAGES_PREFETCH],
+        },
+        'full': {
+            'serializer': FullTicketSerializer,
+            'select_related': ['opened_by'],
+            'prefetch_related': [MESSAGES_PREFETCH],
+        },
     }
     serializer_mode = 'default'
 
     lookup_url_kwarg = 'ticket_id'
+    # claim fields are shown in full mode, the owner's screen name - in default and higher modes
+    conditional_fields = ['last_changes', 'claimed_by_id', 'claimed_until', 'opened_by__last_changes']
+    conditional_owner_field = 'opened_by_id'
 
     def set_available_modes(self):
         usertype = self.get_current_user_type()
@@ -318,21 +562,38 @@ class TicketView(generics.RetrieveUpdateDestroyAPIView, ViewArgsMixin, ViewModes
         self.set_serializer_class()
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        return self.get_mode_queryset(super().get_queryset())
+
+    def get_object(self):
+        """
+            The ticket was already loaded (with the same queryset) by IsItemOwnerOrSupportPlus.
+        """
+
+        ticket = request_cache.get_object(self.request, self.get_queryset(), self.kwargs['ticket_id'])
+        self.check_object_permissions(self.request, ticket)
+        return ticket
+
     def delete(self, request, *args, **kwargs):
         """
             Async delete with response status 202
         """
         id_to_delete = self.kwargs['ticket_id']
-        celery_tasks.delete_object(
+        task = celery_tasks.delete_object.delay(
             class_name='Ticket',
             id_to_delete=id_to_delete
         )
-        return Response(views_info.get_delete_process_msg('ticket', id_to_delete), status=status.HTTP_202_ACCEPTED)
+        task_owners.remember_task_owner(task.id, request.user)
+        return Response(
+            views_info.get_task_started_info(views_info.get_delete_process_msg('ticket', id_to_delete), task.id),
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
 class MessagesView(generics.ListCreateAPIView):
     """
-        Viewing a list of messages related to a specific ticket
+        Viewing a list of messages related to a specific ticket.
+        POST accepts one message or a JSON array of messages (bulk ingestion).
     """
 
     serializer_class = BasicMessageSerializer
@@ -345,7 +606,7 @@ class MessagesView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         asked_ticket_id = int(self.kwargs.get('ticket_id'))
-        return Message.objects.filter(linked_ticket__id=asked_ticket_id)
+        return Message.objects.select_related('linked_user').filter(linked_ticket_id=asked_ticket_id)
 
     def get_serializer_context(self):
         """
@@ -357,6 +618,15 @@ class MessagesView(generics.ListCreateAPIView):
         context['ticket_id'] = self.kwargs['ticket_id']
         return context
 
+    def get_serializer(self, *args, **kwargs):
+        """
+            A list of messages in request data is processed by BulkMessageListSerializer.
+        """
+
+        if isinstance(kwargs.get('data', None), list):
+            kwargs['many'] = True
+        return super().get_serializer(*args, **kwargs)
+
 
 class MessageView(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -369,7 +639,7 @@ class MessageView(generics.RetrieveUpdateDestroyAPIView):
         IsAuthenticated,
     )
     lookup_url_kwarg = 'message_id'
-    queryset = Message.objects.all()
+    queryset = Message.objects.select_related('linked_user').all()
 
     def delete(self, request, *args, **kwargs):
         """
@@ -377,29 +647,151 @@ class MessageView(generics.RetrieveUpdateDestroyAPIView):
         """
 
         id_to_delete = self.kwargs['message_id']
-        celery_tasks.delete_object(
+        task = celery_tasks.delete_object.delay(
             class_name='Message',
             id_to_delete=id_to_delete
         )
-        return Response(views_info.get_delete_process_msg('message', id_to_delete), status=status.HTTP_202_ACCEPTED)
+        task_owners.remember_task_owner(task.id, request.user)
+        return Response(
+            views_info.get_task_started_info(views_info.get_delete_process_msg('message', id_to_delete), task.id),
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+class TaskStatusView(APIView):
+    """
+        Status (and progress) of a background task, e.g. started by DELETE.
+        Tasks are shown to their requesters and support+ (see services/task_owners.py).
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+    )
+
+    def get(self, request, task_id, *args, **kwargs):
+        if not task_owners.can_view_task(task_id, request.user):
+            raise exceptions.NotFound('Task not found.')
+        task = AsyncResult(str(task_id))
+        return Response(self.get_task_data(task), status=status.HTTP_200_OK)
+
+    def get_task_data(self, task):
+        data = {
+            'task_id': task.id,
+            'status': task.status,
+        }
+        if task.status == 'PROGRESS':
+            data['progress'] = task.info
+        elif task.status == 'SUCCESS':
+            data['result'] = task.result
+        elif task.status == 'FAILURE':
+            data['error'] = str(task.result)
+        return data
+
+
+class ExportsView(APIView):
+    """
+        POST starts a background export of tickets with messages (NDJSON or CSV, optionally gzipped).
+        Args: format, compress, date_from, date_to (ticket creation date), user_id (ticket owner).
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsAdminUser,
+    )
+
+    def post(self, request, *args, **kwargs):
+        serializer = ExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        task = celery_tasks.export_tickets.delay(
+            export_format=data['format'],
+            compress=data['compress'],
+            date_from=data['date_from'].isoformat() if 'date_from' in data else None,
+            date_to=data['date_to'].isoformat() if 'date_to' in data else None,
+            user_id=data.get('user_id', None),
+        )
+        task_owners.remember_task_owner(task.id, request.user, staff_only=True)
+        info = views_info.get_task_started_info('The export of tickets has been started.', task.id)
+        info['status_url'] = f'exports/{task.id}/'
+        return Response(info, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportStatusView(TaskStatusView):
+    """
+        Status (and progress) of an export, 'download_url' is given when the file is ready.
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsAdminUser,
+    )
+
+    def get_task_data(self, task):
+        data = super().get_task_data(task)
+        if task.status == 'SUCCESS':
+            data['download_url'] = f'exports/{task.id}/download/'
+        return data
+
+
+class ExportDownloadView(APIView):
+    """
+        Gives the file of a finished export.
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsAdminUser,
+    )
+
+    def get(self, request, task_id, *args, **kwargs):
+        task = AsyncResult(str(task_id))
+        path = None
+        if task.status == 'SUCCESS' and isinstance(task.result, dict):
+            path = exports.get_export_path(task.result['file'])
+        if path is None:
+            raise exceptions.NotFound('The export is not finished or its file has been removed.')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
+class StatsView(APIView):
+    """
+        Support metrics per hour or day by ticket themes or agents, read from the rollups only.
+        Args: period (hour, day), group_by (theme, agent), date_from, date_to.
+    """
+
+    permission_classes = (
+        IsAuthenticated,
+        IsAdminUser,
+    )
+    throttle_scope = 'list'
+
+    def get(self, request, *args, **kwargs):
+        serializer = StatsSerializer(data=request.GET)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        buckets = stats.get_stats(data['period'], data['date_from'], data['date_to'], data['group_by'])
+        return Response({
+            'period': data['period'],
+            'group_by': data['group_by'],
+            'buckets': buckets,
+        }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET', 'POST', 'PATCH', 'PUT', 'DELETE'])
 def error404_view(request, some_path=''):
     """
         A custom 404-page.
-        Can give advice if the link was entered incorrectly, but close to the correct one.
+        Can give advice if the link was entered incorrectly, but close to the correct one
+        (see services.routes_index, the url patterns are indexed once per process).
     """
 
-    # unfinished (the input parameters have not been processed yet)
-
     requested_path = request.path
     data = f'path {requested_path} does not exists.'
-    if some_path[-1] != '/':
-        requested_path = f'{requested_path[1:]}/'
-        urls_list = [value[0][0][0].split('%')[0] for value in get_resolver().reverse_dict.values()]
-        if requested_path in urls_list:
-            data += ' Could you have forgotten to add a slash?'
+    suggested_path = routes_index.get_routes_index().suggest(requested_path)
+    if suggested_path == f'{requested_path.rstrip("/")}/':
+        data += ' Could you have forgotten to add a slash?'
+    elif suggested_path is not None:
+        data += f' Did you mean {suggested_path}?'
     resp = Response(
         data={'detail': data},
         status=404
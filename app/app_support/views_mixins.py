@@ -1,4 +1,30 @@
-from rest_framework import exceptions
+import hashlib
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import exceptions, status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from app_support.services import response_cache
+
+
+def get_user_type(user):
+    """
+        Returns simple readable status of the user [str]: Anonimous, User, Support, Staff or Superuser.
+    """
+    if user.id is None:
+        return 'Anonimous'
+    if user.is_superuser:
+        return 'Superuser'
+    if user.is_staff:
+        return 'Staff'
+    if user.is_support:
+        return 'Support'
+    return 'User'
 
 
 class ViewModesMixin:
@@ -7,6 +33,12 @@ class ViewModesMixin:
         Client can choose a view mode.
         Modes can be usefull, when support-authenticated user wants to view larger tickets list on a page,
         with no unnesessary information included.
+        Every item of serializer_modes is a dict:
+            'serializer' - serializer class (required),
+            'select_related', 'prefetch_related' - lists of lookups for the queryset,
+            'only' - list of loaded columns (all columns if not set).
+        If the serializer has projection_fields (see ProjectionListSerializer),
+        GET and HEAD requests (the list rendering) load values() rows of these columns instead of model instances.
     """
 
     def set_serializer_mode(self):
@@ -20,7 +52,7 @@ class ViewModesMixin:
                 self.serializer_mode = mode
             else:
                 # we need a serializer to render exception ^)
-                self.serializer_class = self.serializer_modes[self.__class__.serializer_mode]
+                self.serializer_class = self.serializer_modes[self.__class__.serializer_mode]['serializer']
                 raise exceptions.ValidationError(
                     f'Mode value <{mode}> is not in available choices for this type of user:'
                     f' {list(self.serializer_modes.keys())}'
@@ -34,23 +66,32 @@ class ViewModesMixin:
             self.set_default_mode()
             self.set_available_modes()
             self.set_serializer_mode()
-            self.serializer_class = self.serializer_modes[self.serializer_mode]
+            self.serializer_class = self.serializer_modes[self.serializer_mode]['serializer']
+
+    def get_mode_queryset(self, queryset):
+        """
+            Applies select_related, prefetch_related and only() options of the current mode.
+            The number of queries will not depend on the number of rows.
+        """
+        self.set_serializer_class()
+        mode = self.serializer_modes[self.serializer_mode]
+        if mode.get('select_related'):
+            queryset = queryset.select_related(*mode['select_related'])
+        if mode.get('prefetch_related'):
+            queryset = queryset.prefetch_related(*mode['prefetch_related'])
+        if mode.get('only'):
+            queryset = queryset.only(*mode['only'])
+        projection_fields = getattr(mode['serializer'], 'projection_fields', None)
+        if projection_fields and self.request.method in ('GET', 'HEAD'):
+            queryset = queryset.values(*projection_fields)
+        return queryset
 
     def get_current_user_type(self):
         """
             Returns simple readable user's status for current User object.
             Can be used if developer don't want to ask self.request.user.is_superuser everytime.
         """
-        user = self.request.user
-        if user.id is None:
-            return 'Anonimous'
-        if user.is_superuser:
-            return 'Superuser'
-        if user.is_staff:
-            return 'Staff'
-        if user.is_support:
-            return 'Support'
-        return 'User'
+        return get_user_type(self.request.user)
 
 
 class ViewArgsMixin:
@@ -110,3 +151,228 @@ class ViewArgsMixin:
         self.set_asked_user_id()
         self.set_list_limit()
         self.set_list_ordering()
+
+
+class ConditionalGetMixin:
+    """
+        Conditional GET (ETag / Last-Modified) of a single object.
+        Must be the first base class of the view (overrides check_permissions and retrieve).
+        Validators are made of conditional_fields of the object ('last_changes' first, related fields
+        as lookups, e.g. 'opened_by__last_changes'), the mode, the user type and the media type of the response.
+        Last-Modified is the latest of the '*last_changes' fields.
+        If the request has If-None-Match or If-Modified-Since, one cheap query (conditional_fields only)
+        is made before the permissions: 304 is returned without loading the object and its nested items.
+        The access is checked by the same row (owner or support+, as the views permissions do),
+        otherwise the request goes the usual way (and gets 403/404).
+        Time-dependent values (like no_response_time) are not the part of the validators.
+    """
+
+    conditional_fields = ['last_changes']
+    conditional_owner_field = 'id'
+    not_modified_response = None
+
+    def get_conditional_object_id(self):
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def has_conditional_access(self, owner_id):
+        user = self.request.user
+        return user.is_superuser or user.is_support or owner_id == user.id
+
+    def get_etag(self, object_id, values):
+        """
+            Returns quoted strong ETag of the object representation.
+        """
+
+        self.set_serializer_class()
+        key = '|'.join(str(item) for item in [
+            self.queryset.model._meta.label, object_id, self.serializer_mode, self.get_current_user_type(),
+            self.request.accepted_media_type, *values,
+        ])
+        return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+    def get_last_modified(self, values):
+        return max(
+            value for name, value in zip(self.conditional_fields, values)
+            if name.endswith('last_changes') and value is not None
+        )
+
+    def get_conditional_value(self, instance, name):
+        """
+            Returns the value of a conditional field of the loaded object (lookups follow the relations).
+        """
+
+        for attribute in name.split('__'):
+            instance = getattr(instance, attribute)
+        return instance
+
+    def set_validators_headers(self, response, etag, last_changes):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_changes.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def get_not_modified_response(self, request):
+        """
+            Returns 304 response if the client has the actual representation, else None.
+        """
+
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if not etags and modified_since is None:
+            return None
+
+        object_id = self.get_conditional_object_id()
+        row = self.queryset.model.objects.filter(pk=object_id).values_list(
+            self.conditional_owner_field, *self.conditional_fields
+        ).first()
+        if row is None or not self.has_conditional_access(row[0]):
+            return None
+
+        etag = self.get_etag(object_id, row[1:])
+        last_changes = self.get_last_modified(row[1:])
+        if etags:  # If-None-Match has priority over If-Modified-Since
+            is_not_modified = '*' in etags or etag in etags
+        else:
+            is_not_modified = int(last_changes.timestamp()) <= modified_since
+        if not is_not_modified:
+            return None
+        return self.set_validators_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_changes)
+
+    def check_permissions(self, request):
+        """
+            The conditional precheck goes before the permissions (they load the whole object).
+        """
+
+        self.not_modified_response = None
+        if request.method in ('GET', 'HEAD') and request.user.is_authenticated:
+            self.not_modified_response = self.get_not_modified_response(request)
+            if self.not_modified_response is not None:
+                return
+        super().check_permissions(request)
+
+    def retrieve(self, request, *args, **kwargs):
+        """
+            Default retrieve() with the validators headers.
+        """
+
+        if self.not_modified_response is not None:
+            return self.not_modified_response
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        values = [self.get_conditional_value(instance, name) for name in self.conditional_fields]
+        etag = self.get_etag(instance.pk, values)
+        return self.set_validators_headers(Response(serializer.data), etag, self.get_last_modified(values))
+
+
+class ListResponseCacheMixin:
+    """
+        Caches rendered list responses in Redis (see services/response_cache.py), if RESPONSE_CACHE is set.
+        Must be the first base class of the view (before generics.ListAPIView).
+        Entries are separated by the user type and the full url (filters, order, limit, mode, page),
+        users which see only their own items and the requests relative to the user ('?user_id=0')
+        have their own entries.
+        Only successful responses are cached.
+    """
+
+    cache_view_name = None
+    cache_generations = response_cache.GENERATIONS
+    response_cache_entry = None
+
+    def is_user_relative_request(self):
+        """
+            '?user_id=0' means the current user (see ViewArgsMixin.set_asked_user_id).
+        """
+
+        try:
+            return int(self.request.GET.get('user_id', '')) == 0
+        except ValueError:
+            return False
+
+    def get_cache_user_scope(self):
+        usertype = self.get_current_user_type()
+        if usertype in ['Superuser', 'Staff', 'Support'] and not self.is_user_relative_request():
+            return usertype
+        return f'{usertype}-{self.request.user.id}'
+
+    def list(self, request, *args, **kwargs):
+        if not response_cache.is_enabled():
+            return super().list(request, *args, **kwargs)
+
+        key = response_cache.get_response_key(
+            self.cache_view_name, self.get_cache_user_scope(), request.build_absolute_uri(),
+            request.accepted_media_type,
+        )
+        cached, generations = response_cache.get_response(key, self.cache_generations)
+        if cached is not None:
+            content_type, content = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            self.response_cache_entry = (key, generations)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """
+            The response is rendered here to be saved in the cache.
+        """
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.response_cache_entry is not None and isinstance(response, Response):
+            key, generations = self.response_cache_entry
+            response.render()
+            response_cache.set_response(key, generations, response['Content-Type'], response.content)
+        return response
+
+
+class StreamingListMixin:
+    """
+        '?stream=true' - the whole list (up to 'limit') is written to the response row by row
+        as a plain JSON array (the same items as '?format=json' gives), without pagination.
+        The queryset is iterated by chunks with .iterator() (a server-side cursor on postgresql),
+        prefetch lookups of the mode are made for every chunk, so the memory does not depend on 'limit'.
+        Must be the first base class of the view (streamed responses are not cached).
+    """
+
+    stream_query_param = 'stream'
+
+    def is_stream_requested(self):
+        return self.request.GET.get(self.stream_query_param, '').lower() in ['true', '1']
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_stream_requested():
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(self.stream_list(queryset), content_type='application/json')
+
+    def iterate_chunks(self, queryset):
+        """
+            Yields lists of STREAM_CHUNK_SIZE objects (rows) with the prefetched related objects.
+        """
+
+        chunk_size = settings.APP_SUPPORT_DEFAULTS['STREAM_CHUNK_SIZE']
+        prefetch_lookups = self.serializer_modes[self.serializer_mode].get('prefetch_related', [])
+        chunk = []
+        for item in queryset.prefetch_related(None).iterator(chunk_size=chunk_size):
+            chunk.append(item)
+            if len(chunk) == chunk_size:
+                prefetch_related_objects(chunk, *prefetch_lookups)
+                yield chunk
+                chunk = []
+        if chunk:
+            prefetch_related_objects(chunk, *prefetch_lookups)
+            yield chunk
+
+    def stream_list(self, queryset):
+        """
+            Yields the JSON array by parts, one part per chunk.
+        """
+
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        separator = ''
+        yield '['
+        for chunk in self.iterate_chunks(queryset):
+            data = self.get_serializer(chunk, many=True).data
+            yield separator + ','.join(encoder.encode(item) for item in data)
+            separator = ','
+        yield ']'
@@ -0,0 +1,255 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import BooleanField, Expression, F, Q, Value
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class RowComparison(Expression):
+    """
+        Row values comparison: (field1, field2, ...) <operator> (value1, value2, ...).
+        Unlike the equivalent OR of the fields comparisons, it is a range bound of a multicolumn index.
+    """
+
+    conditional = True
+
+    def __init__(self, fields, operator, values):
+        super().__init__(output_field=BooleanField())
+        self.fields = [F(name) for name in fields]
+        self.operator = operator
+        self.values = list(values)
+
+    def get_source_expressions(self):
+        return self.fields + self.values
+
+    def set_source_expressions(self, exprs):
+        self.fields, self.values = exprs[:len(self.fields)], exprs[len(self.fields):]
+
+    def as_sql(self, compiler, connection):
+        parts, params = [], []
+        for expressions in [self.fields, self.values]:
+            sqls = []
+            for expression in expressions:
+                sql, expression_params = compiler.compile(expression)
+                sqls.append(sql)
+                params.extend(expression_params)
+            parts.append(f'({", ".join(sqls)})')
+        return f'{parts[0]} {self.operator} {parts[1]}', params
+
+
+class KeysetPagination(BasePagination):
+    """
+        Keyset (cursor) pagination over view.list_ordering (signed 'order=' variants included).
+        Every page is "WHERE (row is after the cursor) ... LIMIT", no COUNT(*) and no OFFSET,
+        so a deep page costs the same as the first one.
+        Ordering fields after the unique 'id' are not used. NULLs are the last in ascending order
+        and the first in descending one - as a btree index keeps them, so both directions of
+        an order are served by the same index (see Meta.indexes of the models).
+        The position is a row values comparison where possible (see get_after_position_filter),
+        the NULLs of a nullable first field are read by one more query on the page where its values are over.
+        Only the 'next' link is provided (the queue is read forward).
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page[size]'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    unique_field = 'id'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+            Returns a list of rows after the cursor position (page_size + 1 rows are loaded to find the next page).
+        """
+
+        self.request = request
+        self.model = queryset.model
+        self.key_fields = self.get_key_fields(view.list_ordering)
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.get_order_by())
+        position = self.decode_cursor(request.GET.get(self.cursor_query_param, ''))
+        rows_queryset = queryset
+        if position is not None:
+            rows_queryset = queryset.filter(self.get_after_position_filter(position))
+
+        rows = list(rows_queryset[:page_size + 1])
+        nulls_tail_filter = self.get_nulls_tail_filter(position)
+        if len(rows) <= page_size and nulls_tail_filter is not None:
+            rows.extend(queryset.filter(nulls_tail_filter)[:page_size + 1 - len(rows)])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last_row = rows[-1]
+            if isinstance(last_row, dict):  # values() rows of the projection serializers
+                self.next_position = [last_row[name] for name, _ in self.key_fields]
+            else:
+                self.next_position = [getattr(last_row, name) for name, _ in self.key_fields]
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'links': OrderedDict([
+                ('next', self.get_next_link()),
+                ('prev', None),
+            ]),
+        })
+
+    def get_page_size(self, request):
+        """
+            Returns page size from 'page[size]' query param (limited by max_page_size).
+        """
+
+        try:
+            page_size = int(request.GET.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise exceptions.ValidationError(f'invalid <{self.page_size_query_param}> kwarg')
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_key_fields(self, list_ordering):
+        """
+            Returns [(field name, descending)] of the ordering up to the unique field.
+        """
+
+        key_fields = []
+        for item in list_ordering:
+            name = item.lstrip('-')
+            key_fields.append((name, item.startswith('-')))
+            if name == self.unique_field:
+                break
+        else:
+            key_fields.append((self.unique_field, False))
+        return key_fields
+
+    def get_order_by(self):
+        return [
+            F(name).desc(nulls_first=True) if descending else F(name).asc(nulls_last=True)
+            for name, descending in self.key_fields
+        ]
+
+    def is_row_comparison_used(self, position):
+        """
+            The row values comparison is used if all key fields have the same direction,
+            the position has no NULLs and only the first field is nullable in ascending order
+            (NULLs of an inner ascending field are in the middle of the range).
+        """
+
+        directions = {descending for _, descending in self.key_fields}
+        if len(directions) != 1 or None in position:
+            return False
+        return directions.pop() or not any(self.model._meta.get_field(name).null for name, _ in self.key_fields[1:])
+
+    def get_after_position_filter(self, position):
+        """
+            Returns Q of rows which are after the position.
+            See is_row_comparison_used(): (k1, k2, ...) > (v1, v2, ...) - an index range bound,
+            NULLs of a nullable first ascending field are read after the range (get_nulls_tail_filter).
+            Otherwise (mixed directions, NULLs in the position) it is expanded, which is not an index bound:
+            (k1 after v1) OR (k1 = v1 AND k2 after v2) OR ...
+        """
+
+        if self.is_row_comparison_used(position):
+            descending = self.key_fields[0][1]
+            names = [name for name, _ in self.key_fields]
+            values = [
+                Value(value, output_field=self.model._meta.get_field(name)) for name, value in zip(names, position)
+            ]
+            return Q(RowComparison(names, '<' if descending else '>', values))
+
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.key_fields, position):
+            nullable = self.model._meta.get_field(name).null
+            if value is None:
+                # NULLs are the first in descending order (all values are after them) and the last in ascending
+                if descending:
+                    condition |= equal & Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                after = Q(**{f'{name}__lt' if descending else f'{name}__gt': value})
+                if nullable and not descending:
+                    after |= Q(**{f'{name}__isnull': True})
+                condition |= equal & after
+                same = Q(**{name: value})
+            equal &= same
+        return condition
+
+    def get_nulls_tail_filter(self, position):
+        """
+            Returns Q of the NULLs rows of the first key field which follow the row comparison range
+            (they are read by one more query, when the range is over) or None.
+        """
+
+        name, descending = self.key_fields[0]
+        if position is None or descending or not self.model._meta.get_field(name).null:
+            return None
+        if not self.is_row_comparison_used(position):
+            return None
+        return Q(**{f'{name}__isnull': True})
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position):
+        data = {
+            'ordering': [[name, descending] for name, descending in self.key_fields],
+            'position': position,
+        }
+        # str() keeps microseconds of datetimes (DjangoJSONEncoder would truncate them)
+        return base64.urlsafe_b64encode(json.dumps(data, default=str).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+            Returns a list of key fields values or None (first page).
+            Can raise error with helpful message.
+        """
+
+        if not cursor:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if [tuple(item) for item in data['ordering']] != self.key_fields:
+                raise ValueError
+            return [
+                None if value is None else self.model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.key_fields, data['position'])
+            ]
+        except (ValueError, TypeError, KeyError, binascii.Error, DjangoValidationError):
+            raise exceptions.ValidationError(
+                'invalid <cursor> kwarg (the ordering must be the same as for the first page)'
+            )
+
+
+class ListPagination(PageNumberPagination):
+    """
+        Page number pagination by default.
+        Keyset pagination is used if 'cursor' query param was given (empty value - the first page).
+    """
+
+    keyset_pagination_class = KeysetPagination
+
+    @classmethod
+    def is_cursor_requested(cls, request):
+        return cls.keyset_pagination_class.cursor_query_param in request.GET
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        if self.is_cursor_requested(request):
+            self.keyset_paginator = self.keyset_pagination_class()
+            return self.keyset_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -3,6 +3,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from rest_framework import exceptions
 from rest_framework.permissions import BasePermission
 
+from app_support.services import request_cache
+
 User = get_user_model()
 
 
@@ -31,7 +33,7 @@ class IsIdOwnerOrSupportPlus(BasePermission):
                 if asked_user_id_int == 0:
                     asked_user_id_int = request.user.id
                 # print(f'    asked_user_id_int = {asked_user_id_int}')
-                asked_user = User.objects.get(id=asked_user_id_int)
+                asked_user = request_cache.get_object(request, User.objects.all(), asked_user_id_int)
             except ObjectDoesNotExist:
                 raise exceptions.NotFound(f'User with id=({asked_user_id_int}) does not exist.')
 
@@ -58,16 +60,20 @@ class IsItemOwnerOrSupportPlus(BasePermission):
             Return `True` if permission is granted, raise an exception otherwise.
             self.restricted_class must be set.
             restricted_class - Ticket in support_app.
+            The ticket is saved in the request cache (reused by the view).
             User can't view tickets owned by another users.
             Can raise error with helpful message.
         """
 
         asked_ticket_id = request.parser_context["kwargs"].get('ticket_id', None)
         restricted_class = view.restricted_class
+        queryset = restricted_class.objects.all()
+        if getattr(view, 'queryset', None) is not None and view.queryset.model is restricted_class:
+            queryset = view.get_queryset()  # the view will get the same (cached) object
 
         try:
             asked_ticket_id = int(asked_ticket_id)
-            ticket = restricted_class.objects.get(id=asked_ticket_id)
+            ticket = request_cache.get_object(request, queryset, asked_ticket_id)
 
         except ObjectDoesNotExist:
             raise exceptions.NotFound('Ticket with this id does not exist')
@@ -79,7 +85,7 @@ class IsItemOwnerOrSupportPlus(BasePermission):
 
         if request.user.is_superuser or request.user.is_support:
             return True
-        if ticket.opened_by.id == request.user.id:
+        if ticket.opened_by_id == request.user.id:
             return True
         else:
             raise exceptions.PermissionDenied(
@@ -112,3 +118,17 @@ class MethodsPermissions(BasePermission):
                 f'Permission denied. Insufficient permissions to use the method {request.method}.'
             )
         raise exceptions.MethodNotAllowed(method=request.method)
+
+
+class IsSupportPlus(BasePermission):
+
+    def has_permission(self, request, view):
+        """
+            Return `True` if permission is granted, raise an exception otherwise.
+            Only support, staff and superusers are allowed.
+        """
+
+        user = request.user
+        if user.is_support or user.is_staff or user.is_superuser:
+            return True
+        raise exceptions.PermissionDenied('Permission denied. Only support users can use this page.')
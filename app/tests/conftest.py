@@ -50,3 +50,12 @@ def create_user():
 @pytest.fixture
 def api_client():
     return APIClient()
+
+
+@pytest.fixture(autouse=True)
+def no_throttling(settings):
+    """
+        Requests of the tests are not throttled (except the throttling tests).
+    """
+
+    settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'THROTTLING': False}
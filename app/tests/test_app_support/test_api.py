@@ -1,4 +1,10 @@
+import json
+
 import pytest
+from app_support.models import Ticket
+from app_support.services import auth_claims, messages_posting
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from .services import ServiceClass
@@ -22,6 +28,24 @@ class TestApiGET:
             response = api_client.get(url)
             assert response.status_code == 404
 
+    def test_unknown_page_suggestions(self, api_client):
+        """
+            The 404 page advises the missing slash and the closest existing path.
+        """
+
+        cases = {
+            'tickets/12': 'Could you have forgotten to add a slash?',
+            'ticket/12/': f'Did you mean {URL_PREFIX}tickets/12/?',
+            'tickets/12/mesages/': f'Did you mean {URL_PREFIX}tickets/12/messages/?',
+            'usres/me/': f'Did you mean {URL_PREFIX}users/me/?',
+        }
+        for url_postfix, advice in cases.items():
+            response = api_client.get(URL_PREFIX + url_postfix)
+            assert response.status_code == 404
+            assert response.json()['errors']['detail'].endswith(advice)
+        response = api_client.get(URL_PREFIX + 'tickets/abc/')
+        assert response.json()['errors']['detail'].endswith('does not exists.')
+
     def test_home_page(self, create_user, api_client):
         url = reverse('home_page')
         responses = ServiceClass.make_responses(
@@ -112,5 +136,233 @@ class TestApiGET:
         pass
 
 
+@pytest.mark.django_db
 class TestApiPOST:
-    pass
+
+    def test_ticket_messages_bulk(self, create_user, api_client):
+        """
+            A JSON array of messages is accepted by the ticket messages url.
+        """
+
+        user = create_user(username='owner')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        api_client.force_authenticate(user=user)
+        url = reverse('specific_ticket_messages', kwargs={'ticket_id': ticket.id})
+
+        response = api_client.post(url, [{'message': f'line {i}'} for i in range(5)], format='json')
+        assert response.status_code == 201
+        assert len(response.json()['data']) == 5
+        ticket.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered) == (5, False)
+
+        response = api_client.post(url, [], format='json')
+        assert response.status_code == 400
+        response = api_client.post(url, {'message': 'single'}, format='json')
+        assert response.status_code == 201
+
+    def test_ticket_update_with_message(self, create_user, api_client):
+        """
+            PATCH with a message and a field change keeps the answered state set by the message.
+        """
+
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        url = reverse('specific_ticket', kwargs={'ticket_id': ticket.id})
+        messages_posting.post_message(ticket, user, 'question')
+        api_client.force_authenticate(user=support)
+
+        response = api_client.patch(url, {'message': 'answer', 'ticket_theme': 'other'}, format='json')
+        assert response.status_code == 200
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.ticket_theme, ticket.is_answered, ticket.answerer_id) == ('4', True, support.id)
+        assert (ticket.user_question_date, ticket.messages_count, user.unanswered_since) == (None, 2, None)
+
+        messages_posting.post_message(ticket, user, 'one more question')
+        response = api_client.patch(url, {'message': 'last answer', 'is_closed': True}, format='json')
+        assert response.status_code == 200
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.is_closed, ticket.closed_by_id, ticket.is_answered) == (True, support.id, True)
+        assert (ticket.user_question_date, ticket.messages_count) == (None, 4)
+        assert (user.unanswered_since, user.opened_tickets_count) == (None, 0)
+
+    def test_tickets_bulk_status(self, create_user, api_client):
+        """
+            Bulk PATCH closes tickets and changes the owners fields once.
+        """
+
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        tickets = [Ticket.objects.create(opened_by=user, ticket_theme='1') for _ in range(4)]
+        url = reverse('tickets_list')
+
+        api_client.force_authenticate(user=user)
+        response = api_client.patch(url, {'ids': [tickets[0].id], 'is_closed': True}, format='json')
+        assert response.status_code == 403
+
+        api_client.force_authenticate(user=support)
+        response = api_client.patch(url, {'is_closed': True}, format='json')
+        assert response.status_code == 400
+        response = api_client.patch(url, {'ids': [t.id for t in tickets[:3]], 'is_closed': True}, format='json')
+        assert response.status_code == 200
+        response = api_client.patch(f'{url}?is_closed=false', {'is_frozen': True}, format='json')
+        assert response.status_code == 200
+
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 1
+        assert Ticket.objects.filter(is_closed=True, closed_by_id=support.id).count() == 3
+        assert list(Ticket.objects.filter(is_frozen=True).values_list('id', flat=True)) == [tickets[3].id]
+
+    def test_next_ticket(self, create_user, api_client):
+        """
+            The support queue gives the oldest unanswered ticket, users are not allowed.
+        """
+
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        url = reverse('next_ticket')
+
+        api_client.force_authenticate(user=user)
+        assert api_client.post(url).status_code == 403
+
+        api_client.force_authenticate(user=support)
+        assert api_client.post(url).status_code == 204
+        messages_posting.post_message(ticket, user, 'question')
+        response = api_client.post(url)
+        assert response.status_code == 200
+        assert int(response.json()['data']['id']) == ticket.id
+        assert api_client.delete(url).status_code == 204
+        ticket.refresh_from_db()
+        assert ticket.claimed_by_id is None
+
+
+@pytest.mark.django_db
+class TestFastRenderer:
+
+    def test_plain_json_format(self, create_user, api_client):
+        """
+            '?format=json' and 'Accept: application/json' give plain JSON (no JSON:API resource objects).
+        """
+
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        Ticket.objects.create(opened_by=user, ticket_theme='1')
+        api_client.force_authenticate(user=support)
+        url = reverse('tickets_list')
+
+        assert 'data' in api_client.get(url).json()
+        for response in [api_client.get(f'{url}?format=json'), api_client.get(url, HTTP_ACCEPT='application/json')]:
+            assert response.status_code == 200
+            assert response['Content-Type'] == 'application/json'
+            content = response.json()
+            assert content['count'] == 1
+            assert set(content['results'][0].keys()) == {'id', 'ticket_theme', 'is_closed', 'no_response_time'}
+
+
+@pytest.mark.django_db
+class TestStreamingList:
+
+    def test_stream_tickets(self, create_user, api_client, settings, django_assert_num_queries):
+        """
+            '?stream=true' gives all the rows as a JSON array, the queries are made by chunks.
+        """
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'STREAM_CHUNK_SIZE': 3}
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        for i in range(7):
+            Ticket.objects.create(opened_by=user, ticket_theme=str(i))
+        api_client.force_authenticate(user=support)
+
+        response = api_client.get(f"{reverse('tickets_list')}?stream=true&mode=expanded")
+        assert response.status_code == 200
+        assert response.streaming
+        assert response['Content-Type'] == 'application/json'
+        # tickets with opened_by (iterator) + messages prefetch of every chunk
+        with django_assert_num_queries(1 + 3):
+            content = json.loads(b''.join(response.streaming_content))
+        assert sorted(item['ticket_theme'] for item in content) == [str(i) for i in range(7)]
+        assert all(item['messages'] == [] for item in content)
+
+        response = api_client.get(f"{reverse('tickets_list')}?stream=true&limit=2")
+        assert len(json.loads(b''.join(response.streaming_content))) == 2
+
+
+@pytest.mark.django_db
+class TestTicketsSearch:
+
+    def test_search_tickets(self, create_user, api_client):
+        """
+            Tickets are found by messages, staff notes and themes, the index follows edits and deletions.
+        """
+
+        user = create_user(username='owner')
+        other_user = create_user(username='other')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        other_ticket = Ticket.objects.create(opened_by=other_user, ticket_theme='3', staff_note='ERR-42 again')
+        message = messages_posting.post_message(ticket, user, 'the app fails with ERR-42 on start')
+        messages_posting.post_message(other_ticket, other_user, 'nothing works')
+        url = reverse('tickets_search')
+
+        api_client.force_authenticate(user=support)
+        assert api_client.get(url).status_code == 400
+        response = api_client.get(f'{url}?q=err-42')
+        assert response.status_code == 200
+        assert {int(item['id']) for item in response.json()['data']} == {ticket.id, other_ticket.id}
+        assert len(api_client.get(f'{url}?q=security').json()['data']) == 1  # theme label
+        assert api_client.get(f'{url}?q=fails+start').json()['data'][0]['id'] == str(ticket.id)
+
+        api_client.force_authenticate(user=user)
+        assert api_client.get(f'{url}?q=err-42').status_code == 403
+        response = api_client.get(f'{url}?q=err-42&user_id=0')
+        assert [int(item['id']) for item in response.json()['data']] == [ticket.id]
+        ticket.staff_note = 'suspected fraudster'
+        ticket.save()
+        assert api_client.get(f'{url}?q=fraudster&user_id=0').json()['data'] == []  # staff notes are support+ only
+        assert len(api_client.get(f'{url}?q=product&user_id=0').json()['data']) == 1  # theme label
+        api_client.force_authenticate(user=support)
+        assert len(api_client.get(f'{url}?q=fraudster&user_id={user.id}').json()['data']) == 1
+        api_client.force_authenticate(user=user)
+
+        message.body = 'fixed'
+        message.save()
+        assert api_client.get(f'{url}?q=err-42&user_id=0').json()['data'] == []
+        assert len(api_client.get(f'{url}?q=fixed&user_id=0').json()['data']) == 1
+        message.delete()
+        assert api_client.get(f'{url}?q=fixed&user_id=0').json()['data'] == []
+
+
+@pytest.mark.django_db
+class TestClaimsAuthentication:
+
+    def test_claims_user(self, create_user, api_client, settings, django_capture_on_commit_callbacks):
+        """
+            The user of the token is not loaded, changed roles revoke the tokens.
+        """
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'JWT_CLAIMS_USER': True}
+        auth_claims.clear_verified_tokens()
+        support = create_user(username='support', is_support=True)
+        credentials = {'email': 'support@aa.aa', 'password': 'testtest'}
+        response = api_client.post(reverse('obtain_token'), credentials, format='json')
+        tokens = response.json()['data']
+        api_client.credentials(HTTP_AUTHORIZATION=f"JWT {tokens['access']}")
+
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(reverse('tickets_list'))
+        assert response.status_code == 200
+        assert not any('FROM "app_support_appuser"' in query['sql'] for query in context.captured_queries)
+
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            support.is_support = False
+            support.save()
+        assert api_client.get(reverse('tickets_list')).status_code == 200  # not committed yet
+        for callback in callbacks:
+            callback()
+        assert api_client.get(reverse('tickets_list')).status_code == 401
+        response = api_client.post(reverse('refresh_token'), {'refresh': tokens['refresh']}, format='json')
+        assert response.status_code == 401
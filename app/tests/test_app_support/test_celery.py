@@ -2,7 +2,11 @@
 from time import sleep
 
 import pytest
+import redis
+from app_support.celery_tasks import recount_dirty_users
 from app_support.celery_test_tasks import create_user_test, delete_user_test
+from app_support.models import Ticket
+from app_support.services import dirty_users
 from django.contrib.auth import get_user_model
 
 from .services import TestMixin
@@ -29,3 +33,35 @@ class TestCelery(TestMixin):
         self.delete_tmp_users(celery_task=delete_user_test)
         sleep(self.wait_for_celery_sec)
         assert User.objects.count() == starting_users_count
+
+    def test_deferred_user_fields(self, create_user, settings, django_capture_on_commit_callbacks):
+        """
+            In the deferred mode users fields are changed by recount_dirty_users task only.
+        """
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'DEFERRED_USER_FIELDS': True}
+        user = create_user(username='owner')
+        with django_capture_on_commit_callbacks(execute=True):
+            Ticket.objects.create(opened_by=user, ticket_theme='1')
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 0
+        assert recount_dirty_users() == 1
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 1
+
+    def test_deferred_user_fields_without_redis(self, create_user, settings, monkeypatch,
+                                                django_capture_on_commit_callbacks):
+        """
+            If Redis is not available, dirty users are recounted at once (the write does not fail).
+        """
+
+        def get_broken_connection():
+            raise redis.ConnectionError('Redis is down')
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'DEFERRED_USER_FIELDS': True}
+        monkeypatch.setattr(dirty_users, 'get_redis_connection', get_broken_connection)
+        user = create_user(username='owner')
+        with django_capture_on_commit_callbacks(execute=True):
+            Ticket.objects.create(opened_by=user, ticket_theme='1')
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 1
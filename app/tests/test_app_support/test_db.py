@@ -1,5 +1,8 @@
+from io import StringIO
+
 import pytest
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from SUPPORT_API.settings import DATABASES
 
 # from django.test import TestCase
@@ -24,3 +27,9 @@ class TestPrepareDB(TestMixin):
         assert len(self.users) == self.manipulated_items
         self.delete_tmp_users()
         assert User.objects.count() == starting_users_count
+
+    def test_explain_list_queries(self, create_user):
+        create_user(username='owner')
+        out = StringIO()
+        call_command('explain_list_queries', '--view', 'users', stdout=out)
+        assert 'query shapes explained' in out.getvalue()
@@ -0,0 +1,123 @@
+import pytest
+from app_support.models import Message, Ticket, get_tickets_collector_id, tickets_collector_id_cache
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestCountersDeltas:
+    """
+        Checks that the denormalized counters are equal to the full recount after every change.
+    """
+
+    def assert_user_fields_recounted(self, user):
+        user.refresh_from_db()
+        deltas_values = [getattr(user, name) for name in User.counter_fields]
+        user.update_user_fields()
+        user.refresh_from_db()
+        assert deltas_values == [getattr(user, name) for name in User.counter_fields]
+
+    def test_ticket_open_close(self, create_user):
+        user = create_user(username='owner')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 1
+
+        ticket = Ticket.objects.get(id=ticket.id)
+        ticket.is_closed = True
+        ticket.save()
+        user.refresh_from_db()
+        assert user.opened_tickets_count == 0
+        self.assert_user_fields_recounted(user)
+
+    def test_ticket_answered_state_save(self, create_user):
+        """
+            is_answered changed by save() (e.g. by the admin) changes the owner's unanswered_since.
+        """
+
+        user = create_user(username='owner')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        question = Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+
+        ticket = Ticket.objects.get(id=ticket.id)
+        ticket.is_answered = True
+        ticket.save()
+        user.refresh_from_db()
+        assert user.unanswered_since is None
+        self.assert_user_fields_recounted(user)
+
+        ticket.is_answered = False
+        ticket.save()
+        user.refresh_from_db()
+        assert user.unanswered_since == question.creation_date
+        self.assert_user_fields_recounted(user)
+
+    def test_messages_create_delete(self, create_user):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+
+        question = Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered) == (1, False)
+        assert user.unanswered_since == question.creation_date
+        assert user.tickets_messages == 1
+
+        answer = Message.objects.create(linked_ticket=ticket, linked_user=support, body='answer')
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered, ticket.answerer_id) == (2, True, support.id)
+        assert user.unanswered_since is None
+        self.assert_user_fields_recounted(support)
+
+        Message.objects.get(id=answer.id).delete()
+        ticket.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered) == (1, False)
+        self.assert_user_fields_recounted(user)
+        self.assert_user_fields_recounted(support)
+
+    def test_ticket_delete(self, create_user):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        tickets = [Ticket.objects.create(opened_by=user, ticket_theme='1') for _ in range(2)]
+        for ticket in tickets:
+            Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        Message.objects.create(linked_ticket=tickets[1], linked_user=support, body='answer')
+
+        Ticket.objects.get(id=tickets[0].id).delete()
+        self.assert_user_fields_recounted(user)
+        self.assert_user_fields_recounted(support)
+        Ticket.objects.get(id=tickets[1].id).delete()
+        self.assert_user_fields_recounted(user)
+        self.assert_user_fields_recounted(support)
+
+    def test_user_delete_hand_over(self, create_user, django_assert_max_num_queries):
+        tickets_collector_id_cache.clear()
+        collector = User.objects.get(id=get_tickets_collector_id())
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        for i in range(5):
+            ticket = Ticket.objects.create(opened_by=user, ticket_theme='1', is_closed=bool(i % 2))
+            Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        Message.objects.create(linked_ticket=ticket, linked_user=support, body='answer')
+
+        with django_assert_max_num_queries(15):  # does not depend on tickets count
+            user.delete()
+        assert Ticket.objects.filter(opened_by=collector).count() == 5
+        assert Message.objects.filter(linked_user=collector).count() == 5
+        self.assert_user_fields_recounted(collector)
+        collector.refresh_from_db()
+        assert collector.opened_tickets_count == 3
+
+        # the cached id of a deleted collector is not used
+        Ticket.objects.filter(opened_by=collector).delete()
+        collector.delete()
+        user = create_user(username='owner2')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        last_changes = ticket.last_changes
+        user.delete()
+        ticket.refresh_from_db()
+        assert ticket.opened_by_id == get_tickets_collector_id() != collector.id
+        assert ticket.last_changes > last_changes
@@ -0,0 +1,81 @@
+import pytest
+from app_support.models import Message, Ticket
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+    """
+        Walks through all cursor pages and compares them with the whole ordered list.
+    """
+
+    tickets_count = 13
+    page_size = 4
+    orders = ['', 'user_question_date', '-user_question_date', '-id', 'ticket_theme', '-ticket_theme']
+
+    def fill_db(self, create_user):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        for i in range(self.tickets_count):
+            ticket = Ticket.objects.create(opened_by=user, ticket_theme=str(i % 3 + 1))
+            if i % 4:  # some tickets have no questions (user_question_date is NULL)
+                Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        return support
+
+    def get_expected_ids(self, ordering):
+        order_by = []
+        for item in ordering:
+            name = item.lstrip('-')
+            order_by.append(F(name).desc(nulls_first=True) if item[0] == '-' else F(name).asc(nulls_last=True))
+            if name == 'id':
+                break
+        return list(Ticket.objects.order_by(*order_by).values_list('id', flat=True))
+
+    def test_tickets_cursor_pages(self, create_user, api_client):
+        support = self.fill_db(create_user)
+        api_client.force_authenticate(user=support)
+        url = reverse('tickets_list')
+
+        for order in self.orders:
+            ordering = ('user_question_date', 'id', 'ticket_theme')
+            if order:
+                ordering = self.get_view_ordering(order)
+            next_url = f'{url}?cursor=&page[size]={self.page_size}' + (f'&order={order}' if order else '')
+            ids, queries_counts = [], []
+            while next_url:
+                with CaptureQueriesContext(connection) as context:  # no COUNT(*), no OFFSET
+                    response = api_client.get(next_url)
+                queries_counts.append(len(context.captured_queries))
+                assert response.status_code == 200
+                content = response.json()
+                assert len(content['data']) <= self.page_size
+                ids.extend(int(item['id']) for item in content['data'])
+                next_url = content['links']['next']
+            assert ids == self.get_expected_ids(ordering)
+            # one query per page, the NULLs of ascending user_question_date are read by one more query once
+            assert sum(queries_counts) == len(queries_counts) + (ordering[0] == 'user_question_date')
+
+    def get_view_ordering(self, order):
+        """
+            The same reordering as ViewArgsMixin.choice_arg_validator does.
+        """
+
+        choices = ['user_question_date', 'id', 'ticket_theme']
+        idx = choices.index(order.lstrip('-'))
+        choices[idx] = choices[0]
+        choices[0] = order
+        return tuple(choices)
+
+    def test_invalid_cursor(self, create_user, api_client):
+        support = self.fill_db(create_user)
+        api_client.force_authenticate(user=support)
+        url = reverse('tickets_list')
+        response = api_client.get(f'{url}?cursor=&page[size]=2')
+        next_url = response.json()['links']['next']
+        response = api_client.get(f'{next_url}&order=-id')
+        assert response.status_code == 400
+        response = api_client.get(f'{url}?cursor=garbage')
+        assert response.status_code == 400
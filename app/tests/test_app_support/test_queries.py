@@ -0,0 +1,173 @@
+import pytest
+from app_support.models import Message, Ticket
+from app_support.services import response_cache
+from django.urls import reverse
+
+
+@pytest.mark.django_db
+class TestQueriesCount:
+    """
+        Every view and mode must run a fixed count of queries, whatever the number of rows.
+        Support user is authenticated with force_authenticate (no auth queries).
+    """
+
+    rows_counts = [2, 6]  # both are less than PAGE_SIZE
+    expected_queries_matrix = {
+        # url name: {mode: queries count}
+        'tickets_list': {'basic': 2, 'default': 2, 'expanded': 3, 'full': 3},
+        'users_list': {'basic': 2, 'default': 2, 'expanded': 3, 'full': 3},
+        'specific_ticket': {'basic': 1, 'default': 1, 'expanded': 2, 'full': 2},
+        'user_profile': {'basic': 1, 'default': 1, 'expanded': 2, 'full': 2},
+        'specific_ticket_messages': {None: 3},
+    }
+
+    def fill_db(self, create_user, rows_count, postfix):
+        """
+            Creates users, every user has rows_count tickets, the last ticket has rows_count*2 messages.
+        """
+
+        support = create_user(username=f'support{postfix}', is_support=True, is_staff=True)
+        users = [create_user(username=f'user{postfix}_{i}') for i in range(rows_count)]
+        for user in users:
+            tickets = [Ticket.objects.create(opened_by=user, ticket_theme='1') for _ in range(rows_count)]
+        for _ in range(rows_count):
+            Message.objects.create(linked_ticket=tickets[-1], linked_user=user, body='question')
+            Message.objects.create(linked_ticket=tickets[-1], linked_user=support, body='answer')
+        return support, user, tickets[-1]
+
+    def get_url(self, url_name, user, ticket):
+        kwargs = {
+            'users_list': {},
+            'tickets_list': {},
+            'user_profile': {'pk': user.id},
+            'specific_ticket': {'ticket_id': ticket.id},
+            'specific_ticket_messages': {'ticket_id': ticket.id},
+        }[url_name]
+        return reverse(url_name, kwargs=kwargs)
+
+    def test_views_modes_queries(self, create_user, api_client, django_assert_num_queries):
+        for rows_count in self.rows_counts:
+            support, user, ticket = self.fill_db(create_user, rows_count, postfix=rows_count)
+            api_client.force_authenticate(user=support)
+            for url_name, modes in self.expected_queries_matrix.items():
+                url = self.get_url(url_name, user, ticket)
+                for mode, queries_count in modes.items():
+                    with django_assert_num_queries(queries_count):
+                        response = api_client.get(f'{url}?mode={mode}' if mode else url)
+                    assert response.status_code == 200
+
+    def test_owner_requests_reuse_objects(self, create_user, api_client, django_assert_num_queries):
+        """
+            Objects loaded by permission classes are not loaded again by views and serializers.
+        """
+
+        support, user, ticket = self.fill_db(create_user, rows_count=2, postfix='owner')
+        api_client.force_authenticate(user=user)
+        with django_assert_num_queries(1):
+            response = api_client.get(self.get_url('specific_ticket', user, ticket))
+        assert response.status_code == 200
+        with django_assert_num_queries(2):  # count + select, asked user is the authenticated one
+            response = api_client.get(f"{self.get_url('tickets_list', user, ticket)}?user_id={user.id}")
+        assert response.status_code == 200
+        with django_assert_num_queries(0):
+            response = api_client.get(self.get_url('user_profile', user, ticket))
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    """
+        Unchanged objects are answered with 304 by one query (nested items are not loaded).
+    """
+
+    def test_ticket_etag(self, create_user, api_client, django_assert_num_queries):
+        user = create_user(username='owner')
+        other_user = create_user(username='other')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        url = reverse('specific_ticket', kwargs={'ticket_id': ticket.id})
+
+        api_client.force_authenticate(user=support)
+        response = api_client.get(f'{url}?mode=full')
+        etag = response['ETag']
+        with django_assert_num_queries(1):
+            response = api_client.get(f'{url}?mode=full', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+        # another mode has another representation
+        assert api_client.get(f'{url}?mode=basic', HTTP_IF_NONE_MATCH=etag).status_code == 200
+        assert api_client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code == 304
+
+        Message.objects.create(linked_ticket=ticket, linked_user=support, body='answer')
+        response = api_client.get(f'{url}?mode=full', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+        # the owner's screen name is a part of the representation
+        etag = response['ETag']
+        user.screen_name = 'renamed'
+        user.save()
+        response = api_client.get(f'{url}?mode=full', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+        # validators do not bypass the permissions
+        api_client.force_authenticate(user=other_user)
+        assert api_client.get(url, HTTP_IF_NONE_MATCH='*').status_code == 403
+
+    def test_user_profile_etag(self, create_user, api_client):
+        user = create_user(username='owner')
+        api_client.force_authenticate(user=user)
+        url = reverse('user_profile', kwargs={'pk': user.id})
+
+        etag = api_client.get(url)['ETag']
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        Ticket.objects.create(opened_by=user, ticket_theme='1')
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+class TestListResponseCache:
+    """
+        Repeated list requests are answered from Redis without queries until the data is changed.
+    """
+
+    def test_tickets_list_cache(self, create_user, api_client, settings, django_assert_num_queries,
+                                django_capture_on_commit_callbacks):
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'RESPONSE_CACHE': True}
+        response_cache.bump_generations(response_cache.GENERATIONS)  # entries of the previous runs
+        response_cache.reset_stats()
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        api_client.force_authenticate(user=support)
+        url = f'{reverse("tickets_list")}?mode=default'
+
+        content = api_client.get(url).content
+        with django_assert_num_queries(0):
+            response = api_client.get(url)
+        assert response.content == content
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        assert api_client.get(url).content != content
+        stats = response_cache.get_stats()
+        assert (stats['hits'], stats['misses']) == (1, 2)
+        assert stats['invalidations:tickets'] > 0
+
+    def test_user_relative_list_cache(self, create_user, api_client, settings):
+        """
+            '?user_id=0' lists of different support users are not shared.
+        """
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'RESPONSE_CACHE': True}
+        response_cache.bump_generations(response_cache.GENERATIONS)
+        supports = [create_user(username=f'support{i}', is_support=True) for i in range(2)]
+        tickets = [Ticket.objects.create(opened_by=support, ticket_theme='1') for support in supports]
+        url = f'{reverse("tickets_list")}?user_id=0&mode=default'
+
+        for support, ticket in zip(supports, tickets):
+            api_client.force_authenticate(user=support)
+            response = api_client.get(url)
+            assert [item['id'] for item in response.json()['data']] == [str(ticket.id)]
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import pytest
+from app_support.models import Message, Ticket
+from app_support.serializers import (BasicTicketProjectionSerializer, BasicTicketSerializer,
+                                     BasicUserListProjectionSerializer, BasicUserListSerializer,
+                                     DefaultTicketSerializer)
+from app_support.services import fragment_cache
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestFragmentCache:
+    """
+        Unchanged objects are represented by the cached fragments, time-dependent fields are recomputed.
+    """
+
+    def test_ticket_fragment(self, create_user):
+        fragment_cache.clear()
+        user = create_user(username='owner')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        Message.objects.create(linked_ticket=ticket, linked_user=user, body='question')
+        ticket = Ticket.objects.get(id=ticket.id)
+        data = BasicTicketSerializer(ticket).data
+
+        # the same last_changes - the cached fragment is used, but no_response_time is recomputed
+        ticket.is_closed = True
+        ticket.user_question_date -= timedelta(days=2)
+        cached_data = BasicTicketSerializer(ticket).data
+        assert cached_data['is_closed'] == data['is_closed']
+        assert cached_data['no_response_time'] != data['no_response_time']
+        assert list(cached_data.keys()) == list(data.keys())
+
+        ticket.save()
+        assert BasicTicketSerializer(ticket).data['is_closed'] is True
+
+    def test_not_loaded_version(self, create_user, django_assert_num_queries):
+        fragment_cache.clear()
+        user = create_user(username='owner')
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        ticket = Ticket.objects.get(id=ticket.id)  # the owner is not selected
+        with django_assert_num_queries(1):  # the owner only, the version is not loaded and not asked
+            DefaultTicketSerializer(ticket).data
+        assert fragment_cache.get_fragment(
+            (DefaultTicketSerializer, ticket.id, (ticket.last_changes, user.last_changes))
+        ) is None
+
+
+@pytest.mark.django_db
+class TestProjectionSerializers:
+    """
+        values() projections give the same representations as the model serializers.
+    """
+
+    def fill_db(self, create_user):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True, screen_name='Support')
+        create_user(username='private', hide_private_info=True)
+        tickets = [Ticket.objects.create(opened_by=user, ticket_theme=str(i % 3 + 1)) for i in range(3)]
+        Message.objects.create(linked_ticket=tickets[0], linked_user=user, body='question')
+        Message.objects.create(linked_ticket=tickets[1], linked_user=user, body='question')
+        Message.objects.create(linked_ticket=tickets[1], linked_user=support, body='answer')
+        # days only (seconds are not shown), so the time of serialization does not matter
+        two_days_ago = timezone.now() - timedelta(days=2)
+        Ticket.objects.filter(id=tickets[0].id).update(user_question_date=two_days_ago)
+        User.objects.filter(id=user.id).update(unanswered_since=two_days_ago)
+        return support
+
+    def test_same_representations(self, create_user):
+        self.fill_db(create_user)
+        for model, serializer_class, projection_class in [
+            (Ticket, BasicTicketSerializer, BasicTicketProjectionSerializer),
+            (User, BasicUserListSerializer, BasicUserListProjectionSerializer),
+        ]:
+            queryset = model.objects.order_by('id')
+            rows = queryset.values(*projection_class.projection_fields)
+            expected = [dict(item) for item in serializer_class(queryset, many=True).data]
+            assert [dict(item) for item in projection_class(rows, many=True).data] == expected
+
+    def test_basic_list_response(self, create_user, api_client):
+        support = self.fill_db(create_user)
+        api_client.force_authenticate(user=support)
+        response = api_client.get(f'{reverse("tickets_list")}?mode=basic&order=id')
+        assert response.status_code == 200
+        data = response.json()['data']
+        expected_ids = [str(ticket_id) for ticket_id in Ticket.objects.order_by('id').values_list('id', flat=True)]
+        assert [item['id'] for item in data] == expected_ids
+        assert data[0]['attributes']['no_response_time'] == '2 day(s)'
+        assert api_client.head(f'{reverse("tickets_list")}?mode=basic').status_code == 200  # HEAD is GET
@@ -0,0 +1,318 @@
+import csv
+import gzip
+import json
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from app_support import celery_tasks, views
+from app_support.models import Ticket
+from app_support.models_const import TICKET_THEMES
+from datetime import timedelta
+
+from app_support.services import (deletion, exports, messages_posting, stats,
+                                  task_owners, tickets_bulk, tickets_claim)
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestMessagesPosting:
+    """
+        The message write path must use a fixed count of statements.
+        SAVEPOINT + SELECT (lock) ticket + INSERT message + UPDATE ticket + UPDATE users + UPSERT rollups
+        + RELEASE SAVEPOINT, rollups are not changed by a question added to the waiting one.
+    """
+
+    post_message_queries = 7
+
+    def test_post_message_queries_count(self, create_user, django_assert_num_queries):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+
+        for author, queries in [(user, 7), (support, 7), (user, 7), (user, 6), (support, 7)]:
+            with django_assert_num_queries(queries):
+                messages_posting.post_message(ticket, author, 'body')
+
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered, ticket.answerer_id) == (5, True, support.id)
+        assert (user.tickets_messages, user.unanswered_since) == (3, None)
+
+    def test_post_messages_batch(self, create_user, django_assert_num_queries):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        messages_posting.post_message(ticket, user, 'question')
+
+        with django_assert_num_queries(self.post_message_queries):
+            messages = messages_posting.post_messages(ticket, support, [f'answer {i}' for i in range(30)])
+
+        assert len(messages) == 30
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        support.refresh_from_db()
+        assert (ticket.messages_count, ticket.is_answered, ticket.answerer_id) == (31, True, support.id)
+        assert (user.unanswered_since, support.tickets_messages) == (None, 30)
+
+    def test_post_message_stale_ticket(self, create_user):
+        """
+            The ticket state is re-read under the lock, a ticket loaded before a concurrent post is not trusted.
+        """
+
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        messages_posting.post_message(ticket, user, 'question')
+        stale_ticket = Ticket.objects.get(id=ticket.id)
+        messages_posting.post_message(ticket, support, 'answer')
+
+        messages_posting.post_message(stale_ticket, user, 'one more question')
+        ticket.refresh_from_db()
+        user.refresh_from_db()
+        assert (ticket.messages_count, ticket.answerer_id) == (3, support.id)
+        assert user.unanswered_since == ticket.user_question_date
+        assert stats.get_backlog(timezone.now() + timedelta(hours=1)) == {'1': 1}
+
+
+@pytest.mark.django_db
+class TestDeletion:
+
+    def test_delete_ticket_chunked(self, create_user):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+        messages_posting.post_messages(ticket, user, ['question'] * 3)
+        messages_posting.post_messages(ticket, support, ['answer'] * 4)
+        messages_posting.post_message(ticket, user, 'one more question')
+
+        progress = []
+        assert deletion.delete_ticket(ticket.id, chunk_size=3, on_progress=lambda *args: progress.append(args))
+        assert progress == [(3, 8), (6, 8), (8, 8)]
+        assert not Ticket.objects.filter(id=ticket.id).exists()
+        user.refresh_from_db()
+        support.refresh_from_db()
+        assert (user.tickets_messages, user.opened_tickets_count, user.unanswered_since) == (0, 0, None)
+        assert support.tickets_messages == 0
+        assert not deletion.delete_ticket(ticket.id)
+
+
+@pytest.mark.django_db
+class TestExports:
+
+    def test_export_tickets(self, create_user, settings, tmp_path):
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'EXPORTS_DIR': tmp_path}
+        user = create_user(username='owner')
+        other_user = create_user(username='other')
+        tickets = [Ticket.objects.create(opened_by=user, ticket_theme='1') for _ in range(3)]
+        Ticket.objects.create(opened_by=other_user, ticket_theme='1')
+        messages_posting.post_messages(tickets[0], user, ['first', 'second'])
+        messages_posting.post_message(tickets[2], user, 'third')
+
+        progress = []
+        result = exports.export_tickets(
+            'ndjson-export', chunk_size=2, on_progress=lambda *args: progress.append(args), user_id=user.id,
+        )
+        assert result == {'file': 'ndjson-export.ndjson', 'tickets': 3, 'messages': 3}
+        assert progress == [(2, 3), (3, 3)]
+        with open(tmp_path / result['file']) as file:
+            rows = [json.loads(line) for line in file]
+        assert [row['id'] for row in rows] == [ticket.id for ticket in tickets]
+        assert [message['body'] for message in rows[0]['messages']] == ['first', 'second']
+        assert rows[1]['messages'] == []
+
+        result = exports.export_tickets('csv-export', export_format='csv', compress=True)
+        assert result == {'file': 'csv-export.csv.gz', 'tickets': 4, 'messages': 3}
+        with gzip.open(tmp_path / result['file'], 'rt') as file:
+            rows = list(csv.reader(file))
+        assert rows[0] == exports.CSV_HEADER
+        assert len(rows) == 1 + 3 + 2  # header, messages, tickets without messages
+        assert exports.get_export_path(result['file']) == tmp_path / result['file']
+        assert not list(tmp_path.glob('*.part'))
+
+    def test_exports_api(self, create_user, api_client, settings, tmp_path, monkeypatch):
+        """
+            The task is run at once by the patched delay(), its states are given by the patched AsyncResult.
+        """
+
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'EXPORTS_DIR': tmp_path}
+        user = create_user(username='owner')
+        messages_posting.post_message(Ticket.objects.create(opened_by=user, ticket_theme='1'), user, 'question')
+        task_id = str(uuid4())
+        task_states = {}
+
+        def run_export(**kwargs):
+            task_states[task_id] = ('PROGRESS', {'exported_tickets': 0, 'total_tickets': 1})
+            exports.export_tickets(task_id, **kwargs)
+            return SimpleNamespace(id=task_id)
+
+        def get_task_result(result_id):
+            state, info = task_states.get(result_id, ('PENDING', None))
+            return SimpleNamespace(id=result_id, status=state, info=info, result=info)
+
+        monkeypatch.setattr(celery_tasks.export_tickets, 'delay', run_export)
+        monkeypatch.setattr(views, 'AsyncResult', get_task_result)
+        status_url = reverse('export_status', kwargs={'task_id': task_id})
+        download_url = reverse('export_download', kwargs={'task_id': task_id})
+
+        api_client.force_authenticate(user=create_user(username='support', is_support=True))
+        assert api_client.post(reverse('exports'), {'format': 'csv'}, format='json').status_code == 403
+        assert api_client.get(status_url).status_code == 403
+        assert api_client.get(download_url).status_code == 403
+
+        api_client.force_authenticate(user=create_user(username='admin', is_staff=True))
+        response = api_client.post(reverse('exports'), {'format': 'csv'}, format='json')
+        assert response.status_code == 202
+        assert response.json()['data']['status_url'] == f'exports/{task_id}/'
+        response = api_client.get(status_url)
+        assert response.status_code == 200
+        assert response.json()['data']['status'] == 'PROGRESS'
+        assert response.json()['data']['progress'] == {'exported_tickets': 0, 'total_tickets': 1}
+        assert 'download_url' not in response.json()['data']
+        assert api_client.get(download_url).status_code == 404
+
+        task_states[task_id] = ('SUCCESS', {'file': f'{task_id}.csv', 'tickets': 1, 'messages': 1})
+        response = api_client.get(status_url)
+        assert response.json()['data']['download_url'] == f'exports/{task_id}/download/'
+        response = api_client.get(download_url)
+        assert response.status_code == 200
+        rows = list(csv.reader(response.getvalue().decode().splitlines()))
+        response.close()
+        assert rows[0] == exports.CSV_HEADER
+        assert len(rows) == 2
+
+
+@pytest.mark.django_db
+class TestTaskOwners:
+
+    def test_task_access(self, create_user, api_client):
+        user = create_user(username='owner')
+        other_user = create_user(username='other')
+        support = create_user(username='support', is_support=True)
+        staff = create_user(username='admin', is_staff=True)
+        task_owners.remember_task_owner('deletion-task', user)
+        task_owners.remember_task_owner('export-task', staff, staff_only=True)
+
+        assert [task_owners.can_view_task('deletion-task', item) for item in [user, other_user, support, staff]] == [
+            True, False, True, True,
+        ]
+        assert [task_owners.can_view_task('export-task', item) for item in [user, support, staff]] == [
+            False, False, True,
+        ]
+        assert not task_owners.can_view_task('unknown-task', support)
+
+        api_client.force_authenticate(user=other_user)
+        url = reverse('task_status', kwargs={'task_id': '2d1c1d2c-3a8b-4c2e-9a53-5f0b1e7c9d10'})
+        task_owners.remember_task_owner('2d1c1d2c-3a8b-4c2e-9a53-5f0b1e7c9d10', user)
+        assert api_client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+class TestSupportRollups:
+    """
+        The rollups are changed by the tickets and messages hooks, stats are read from them only.
+    """
+
+    def get_day_stats(self, group_by):
+        now = timezone.now()
+        buckets = stats.get_stats('day', now - timedelta(days=1), now + timedelta(days=1), group_by)
+        key = stats.GROUP_FIELDS[group_by]
+        return {bucket[key]: bucket for bucket in buckets}
+
+    def test_rollups(self, create_user, api_client, django_assert_max_num_queries):
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        first, second = [Ticket.objects.create(opened_by=user, ticket_theme=theme) for theme in ['1', '2']]
+        messages_posting.post_message(first, user, 'question')
+        messages_posting.post_message(second, user, 'question')
+        messages_posting.post_message(first, support, 'answer')
+        messages_posting.post_message(first, user, 'one more question')
+        tickets_bulk.update_tickets_status(Ticket.objects.filter(id=first.id), support, is_closed=True)
+        second.ticket_theme = '3'
+        second.save()
+
+        # the range, the latest snapshot of every theme and the deltas after them
+        with django_assert_max_num_queries(len(TICKET_THEMES) + 2):
+            by_theme = self.get_day_stats('theme')
+        assert {theme: bucket['backlog'] for theme, bucket in by_theme.items()} == {'1': 0, '2': 0, '3': 1}
+        assert stats.snapshot_backlog() == {'1': 0, '2': 0, '3': 0, '4': 0}  # the start of the day
+        assert {theme: bucket['backlog'] for theme, bucket in self.get_day_stats('theme').items()} == {
+            '1': 0, '2': 0, '3': 1, '4': 0,
+        }
+        assert (by_theme['1']['opened_tickets'], by_theme['1']['closed_tickets']) == (1, 1)
+        assert (by_theme['1']['first_responses'], by_theme['1']['answers']) == (1, 1)
+        by_agent = self.get_day_stats('agent')
+        assert list(by_agent) == [support.id]
+        assert by_agent[support.id]['avg_first_response_seconds'] is not None
+        assert by_agent[support.id]['avg_close_seconds'] is not None
+
+        stats.rebuild_rollups()  # current themes are taken, the second ticket was opened with '3'
+        rebuilt = self.get_day_stats('theme')
+        assert {theme: bucket['backlog'] for theme, bucket in rebuilt.items()} == {'1': 0, '3': 1}
+        # the snapshots of the rebuilt daily rows
+        assert stats.get_backlog(timezone.now() + timedelta(days=2)) == {'1': 0, '3': 1}
+        assert stats.get_backlog_counts() == {'3': 1}
+        assert self.get_day_stats('agent')[support.id]['answers'] == 1
+
+        url = reverse('stats')
+        api_client.force_authenticate(user=support)
+        assert api_client.get(url).status_code == 403
+        api_client.force_authenticate(user=create_user(username='admin', is_staff=True))
+        response = api_client.get(url, {'period': 'hour', 'group_by': 'agent'})
+        assert response.status_code == 200
+        assert response.json()['data']['buckets'][0]['agent_id'] == support.id
+        assert api_client.get(url, {'period': 'hour', 'date_from': '2000-01-01T00:00'}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestTicketsClaim:
+    """
+        Support users get distinct tickets from the queue, the oldest question first.
+    """
+
+    def fill_queue(self, user, count):
+        tickets = []
+        for _ in range(count):
+            ticket = Ticket.objects.create(opened_by=user, ticket_theme='1')
+            messages_posting.post_message(ticket, user, 'question')
+            tickets.append(ticket)
+        return tickets
+
+    def test_distinct_claims(self, create_user):
+        user = create_user(username='owner')
+        supports = [create_user(username=f'support{i}', is_support=True) for i in range(3)]
+        tickets = self.fill_queue(user, 4)
+        Ticket.objects.filter(id=tickets[0].id).update(is_frozen=True)
+
+        claimed = [tickets_claim.claim_next_ticket(support) for support in supports]
+        assert claimed == [ticket.id for ticket in tickets[1:]]
+        # a repeated claim returns the same ticket
+        assert tickets_claim.claim_next_ticket(supports[0]) == tickets[1].id
+        assert tickets_claim.claim_next_ticket(create_user(username='support3', is_support=True)) is None
+
+        # the claim is not rewritten by save() of a loaded ticket
+        ticket = Ticket.objects.get(id=tickets[1].id)
+        ticket.staff_note = 'note'
+        ticket.save()
+        ticket.refresh_from_db()
+        assert ticket.claimed_by_id == supports[0].id
+
+    def test_expired_and_released_claims(self, create_user, settings):
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'TICKET_CLAIM_TIMEOUT': -1}
+        user = create_user(username='owner')
+        support = create_user(username='support', is_support=True)
+        other_support = create_user(username='other', is_support=True)
+        tickets = self.fill_queue(user, 2)
+
+        assert tickets_claim.claim_next_ticket(support) == tickets[0].id  # already expired (the setting)
+        settings.APP_SUPPORT_DEFAULTS = {**settings.APP_SUPPORT_DEFAULTS, 'TICKET_CLAIM_TIMEOUT': 60}
+        assert tickets_claim.claim_next_ticket(other_support) == tickets[0].id
+
+        messages_posting.post_message(tickets[0], other_support, 'answer')
+        assert tickets_claim.claim_next_ticket(other_support) == tickets[1].id  # the answered one left the queue
+        assert tickets_claim.release_claims(other_support) == 2
+        assert tickets_claim.claim_next_ticket(support) == tickets[1].id
@@ -0,0 +1,45 @@
+import pytest
+import redis
+from app_support import throttling
+from django.urls import reverse
+
+
+@pytest.mark.django_db
+class TestThrottling:
+
+    def test_token_bucket(self, create_user, api_client, settings):
+        """
+            A bucket is kept per scope and user, rejected requests get Retry-After.
+        """
+
+        rates = {'auth': {'Anonimous': '2/m'}, 'list': {'User': '3/m', 'Superuser': None}}
+        settings.APP_SUPPORT_DEFAULTS = {
+            **settings.APP_SUPPORT_DEFAULTS,
+            'THROTTLING': True,
+            'THROTTLE_PREFIX': f'{settings.APP_SUPPORT_DEFAULTS["THROTTLE_PREFIX"]}:test',
+            'THROTTLE_RATES': rates,
+        }
+        redis_connection = throttling.get_redis_connection()
+        try:
+            redis_connection.eval('return 1', 0)
+        except redis.ResponseError:
+            pytest.skip('Redis without Lua scripting')
+        keys = redis_connection.keys(f'{settings.APP_SUPPORT_DEFAULTS["THROTTLE_PREFIX"]}:*')
+        if keys:
+            redis_connection.delete(*keys)
+
+        url = reverse('obtain_token')
+        statuses = [api_client.post(url, {}, format='json').status_code for _ in range(3)]
+        assert statuses == [400, 400, 429]
+
+        user = create_user(username='owner')
+        api_client.force_authenticate(user=user)
+        url = f"{reverse('tickets_list')}?user_id={user.id}"
+        responses = [api_client.get(url) for _ in range(4)]
+        assert [response.status_code for response in responses] == [200, 200, 200, 429]
+        assert 1 <= int(responses[-1]['Retry-After']) <= 20
+        assert api_client.get(reverse('specific_ticket', args=[1])).status_code != 429  # another scope
+
+        superuser = create_user(username='admin', is_superuser=True, is_staff=True)
+        api_client.force_authenticate(user=superuser)
+        assert all(api_client.get(url).status_code == 200 for _ in range(5))